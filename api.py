@@ -1,9 +1,13 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from database import get_db
 from models import ProcessingJob
-from workers import process_video, fetch_metadata_and_process
-from typing import Dict, Optional
+from workers import process_video, enqueue_video_jobs
+from job_repository import validate_batch_urls, create_jobs
+from job_status import load_job_status, stream_job_status
+from typing import Dict, List, Optional
 import logging
 
 # Configure logging
@@ -33,6 +37,42 @@ async def process_video_endpoint(video_url: str, db: Session = Depends(get_db)):
         logger.error(f"Error creating job: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchProcessRequest(BaseModel):
+    video_urls: List[str]
+    webhook_url: Optional[str] = None
+
+@app.post("/process/batch")
+async def process_video_batch_endpoint(batch: BatchProcessRequest, db: Session = Depends(get_db)):
+    """
+    Submit many video URLs for processing in one request.
+    Jobs are created with one bulk insert and commit, and the job IDs are returned in the order
+    of the URLs. Jobs that could not be enqueued are marked as failed and listed in failed_job_ids.
+    """
+    try:
+        video_urls = validate_batch_urls(batch.video_urls)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        job_ids = create_jobs(db, video_urls, batch.webhook_url)
+
+        # Enqueue processing tasks
+        enqueued = enqueue_video_jobs(job_ids, video_urls, batch.webhook_url)
+        if not enqueued["enqueued"]:
+            raise Exception(enqueued["error"])
+
+        return {
+            "job_ids": job_ids,
+            "status": "pending",
+            "count": len(job_ids),
+            "enqueued_job_ids": enqueued["enqueued"],
+            "failed_job_ids": enqueued["failed"],
+            "error": enqueued["error"]
+        }
+    except Exception as e:
+        logger.error(f"Error creating batch of jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: int, db: Session = Depends(get_db)):
     """Get the status of a processing job"""
@@ -42,6 +82,18 @@ async def get_job_status(job_id: int, db: Session = Depends(get_db)):
     
     return {"job_id": job.id, "status": job.status}
 
+@app.get("/status/{job_id}/stream")
+def stream_job_status_endpoint(job_id: int):
+    """Stream the status changes of a processing job as Server-Sent Events"""
+    # No session dependency, it would stay checked out for as long as the stream is open
+    if load_job_status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        stream_job_status(job_id, load_job_status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/results/{job_id}")
 async def get_job_results(job_id: int, db: Session = Depends(get_db)):
     """Get the results of a completed processing job"""
@@ -61,17 +113,3 @@ async def get_job_results(job_id: int, db: Session = Depends(get_db)):
         "transcription": job.transcription,
         "action_points": job.action_points
     }
-
-@app.post("/fetch-and-process")
-async def fetch_and_process_endpoint():
-    """
-    Fetch metadata from configured API endpoint and process the video URL found in it.
-    This endpoint triggers the metadata fetching process.
-    """
-    try:
-        # Enqueue metadata fetching task
-        fetch_metadata_and_process.send()
-        return {"status": "Task enqueued successfully"}
-    except Exception as e:
-        logger.error(f"Error enqueueing task: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,14 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import dramatiq
 from dramatiq.brokers.redis import RedisBroker
-from workers import process_video
+from workers import process_video, enqueue_video_jobs
 from database import SessionLocal, init_db
 from models import ProcessingJob
+from job_repository import validate_batch_urls, create_jobs
+from job_status import load_job_status, stream_job_status
 import logging
 from dotenv import load_dotenv
 import os
-from mongodb_utils import get_video_metadata, get_all_video_metadata, save_metadata_locally
+from mongodb_utils import get_video_metadata, get_video_metadata_page, stream_video_metadata_ndjson, DEFAULT_METADATA_PAGE_SIZE
 from datetime import datetime
 
 # Load environment variables
@@ -60,6 +62,42 @@ def create_job():
         logger.error(f"Error creating job: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/process/batch', methods=['POST'])
+def create_jobs_batch():
+    try:
+        data = request.get_json() or {}
+        webhook_url = data.get('webhook_url')
+
+        try:
+            video_urls = validate_batch_urls(data.get('video_urls'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Create all the jobs with one insert and commit
+        db = SessionLocal()
+        try:
+            job_ids = create_jobs(db, video_urls, webhook_url)
+        finally:
+            db.close()
+
+        # Send the jobs to the queue, the ones that can't be sent are marked as failed
+        enqueued = enqueue_video_jobs(job_ids, video_urls, webhook_url)
+        if not enqueued["enqueued"]:
+            return jsonify({"job_ids": job_ids, "failed_job_ids": enqueued["failed"], "error": enqueued["error"]}), 500
+
+        return jsonify({
+            "job_ids": job_ids,
+            "status": "queued",
+            "enqueued_job_ids": enqueued["enqueued"],
+            "failed_job_ids": enqueued["failed"],
+            "error": enqueued["error"],
+            "message": f"{len(enqueued['enqueued'])} of {len(job_ids)} video processing jobs created successfully"
+        })
+
+    except Exception as e:
+        logger.error(f"Error creating batch of jobs: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/status/<int:job_id>', methods=['GET'])
 def get_status(job_id):
     try:
@@ -80,6 +118,22 @@ def get_status(job_id):
         logger.error(f"Error getting status: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/status/<int:job_id>/stream', methods=['GET'])
+def stream_status(job_id):
+    """Stream the status changes of a job as Server-Sent Events"""
+    try:
+        if load_job_status(job_id) is None:
+            return jsonify({"error": "Job not found"}), 404
+        return Response(
+            stream_with_context(stream_job_status(job_id, load_job_status)),
+            mimetype='text/event-stream',
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    except Exception as e:
+        logger.error(f"Error streaming status: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/results/<int:job_id>', methods=['GET'])
 def get_results(job_id):
     try:
@@ -111,12 +165,8 @@ def get_video_metadata_endpoint(video_id):
         if not metadata:
             return jsonify({"error": "Video metadata not found"}), 404
             
-        # Save metadata locally
-        filepath = save_metadata_locally(metadata)
-        
         return jsonify({
-            "metadata": metadata,
-            "local_file": filepath
+            "metadata": metadata
         })
         
     except Exception as e:
@@ -125,26 +175,36 @@ def get_video_metadata_endpoint(video_id):
 
 @app.route('/api/metadata', methods=['GET'])
 def get_all_metadata():
-    """Get metadata for all videos"""
+    """
+    Get one page of video metadata. Pass the next_cursor of a page as ?after= to get the next
+    one, and ?limit= to set the page size.
+    """
     try:
-        metadata_list = get_all_video_metadata()
-        
-        # Save all metadata locally
-        filepath = save_metadata_locally({
-            "videos": metadata_list,
-            "total_count": len(metadata_list),
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
+        try:
+            limit = int(request.args.get('limit', DEFAULT_METADATA_PAGE_SIZE))
+            page = get_video_metadata_page(after=request.args.get('after'), limit=limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         return jsonify({
-            "metadata": metadata_list,
-            "total_count": len(metadata_list),
-            "local_file": filepath
+            "metadata": page["metadata"],
+            "count": len(page["metadata"]),
+            "next_cursor": page["next_cursor"]
         })
         
     except Exception as e:
         logger.error(f"Error retrieving all metadata: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metadata/export', methods=['GET'])
+def export_metadata():
+    """Stream the metadata of every video as newline delimited JSON"""
+    filename = f"video_metadata_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    return Response(
+        stream_with_context(stream_video_metadata_ndjson()),
+        mimetype='application/x-ndjson',
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
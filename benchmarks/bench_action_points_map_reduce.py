@@ -0,0 +1,92 @@
+"""
+Benchmark map-reduce action point extraction against a single prompt, using a local stub of the
+OpenAI chat completions API.
+
+The stub answers every request after a delay that grows with the prompt size (a fixed overhead
+plus a per-token cost), which is roughly how a real model behaves. For synthetic transcripts of
+increasing length it reports the wall time of one whole-transcript call and of the chunked,
+concurrent extraction.
+
+Usage:
+    python benchmarks/bench_action_points_map_reduce.py --minutes 5 15 30 60 --concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+WORDS_PER_MINUTE = 150
+WORDS = ('we need to ship the new export feature before the end of the quarter and '
+         'someone should follow up with the design team about the onboarding flow').split()
+
+class StubChatCompletionsHandler(BaseHTTPRequestHandler):
+    base_latency = 0.3
+    seconds_per_token = 0.0002
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt_tokens = sum(len(message['content']) // 4 for message in request['messages'])
+        time.sleep(self.base_latency + prompt_tokens * self.seconds_per_token)
+
+        content = json.dumps({'action_points': [
+            {'action': f'Follow up on item {random.randint(1, 5)}', 'context': 'stub', 'priority': 'Medium'}
+        ]})
+        body = json.dumps({
+            'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': request['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 20, 'total_tokens': prompt_tokens + 20},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_transcript(minutes):
+    words = [random.choice(WORDS) for _ in range(minutes * WORDS_PER_MINUTE)]
+    # Whisper-style segments of ~12 words
+    return {'text': ' '.join(words), 'segments': [{'text': ' '.join(words[i:i + 12]) + '.'} for i in range(0, len(words), 12)]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, nargs='+', default=[5, 15, 30, 60])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--chunk-tokens', type=int, default=3000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubChatCompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/v1'
+    os.environ['OPENAI_API_KEY'] = 'stub'
+    os.environ['TRANSCRIPT_CHUNK_TOKENS'] = str(args.chunk_tokens)
+    os.environ['TRANSCRIPT_MAP_CONCURRENCY'] = str(args.concurrency)
+
+    from processors import action_points
+
+    for minutes in args.minutes:
+        transcript = make_transcript(minutes)
+
+        start = time.perf_counter()
+        action_points._extract_chunk_action_points(transcript['text'])
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        points = action_points.extract_action_points(transcript)
+        chunked = time.perf_counter() - start
+
+        print(f"{minutes:>3} min  single prompt={single:6.2f}s  map-reduce={chunked:6.2f}s  action points={len(points)}")
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark submitting jobs one at a time against the batch path.
+
+Creates N jobs in a temporary SQLite database and enqueues a process_video message for each,
+once like /api/process (one session, insert and commit per job, then a send) and once like
+/api/process/batch (create_jobs() for each batch, then the sends). Messages go to dramatiq's
+in-process StubBroker, pass --rabbitmq-url to enqueue to a real broker instead. The HTTP round
+trip per request on the single-job path is not included, so the real difference is larger.
+
+Usage:
+    python benchmarks/bench_batch_submission.py --jobs 2000 --batch-size 500
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import dramatiq
+from dramatiq.brokers.stub import StubBroker
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rabbitmq-url', default=None)
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % database_path
+    from database import Base, engine, SessionLocal
+    from models import ProcessingJob
+    from job_repository import create_jobs
+    Base.metadata.create_all(bind=engine)
+
+    if args.rabbitmq_url:
+        from dramatiq.brokers.rabbitmq import RabbitmqBroker
+        broker = RabbitmqBroker(url=args.rabbitmq_url)
+    else:
+        broker = StubBroker()
+
+    # Same signature and queue as workers.process_video, without loading the processing models
+    @dramatiq.actor(broker=broker, queue_name='video_processing_benchmark')
+    def process_video(job_id, video_url, webhook_url=None):
+        pass
+
+    video_urls = ['https://example.com/video_%d.mp4' % i for i in range(args.jobs)]
+
+    def single_job_path():
+        for video_url in video_urls:
+            db = SessionLocal()
+            job = ProcessingJob(video_url=video_url, webhook_url=None)
+            db.add(job)
+            db.commit()
+            job_id = job.id
+            db.close()
+            process_video.send(job_id, video_url, None)
+
+    def batch_path():
+        for start in range(0, len(video_urls), args.batch_size):
+            batch_urls = video_urls[start:start + args.batch_size]
+            db = SessionLocal()
+            try:
+                job_ids = create_jobs(db, batch_urls)
+            finally:
+                db.close()
+            for job_id, video_url in zip(job_ids, batch_urls):
+                broker.enqueue(process_video.message(job_id, video_url, None))
+
+    print('%d jobs, batches of %d, %s broker' % (args.jobs, args.batch_size, 'rabbitmq' if args.rabbitmq_url else 'stub'))
+    for name, run in (('single', single_job_path), ('batch', batch_path)):
+        broker.flush_all()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print('%-8s %8.0f jobs/s   %8.2f s' % (name, args.jobs / elapsed, elapsed))
+
+if __name__ == '__main__':
+    main()
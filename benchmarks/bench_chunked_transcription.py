@@ -0,0 +1,57 @@
+"""
+Benchmark chunked transcription across different worker counts.
+
+For each worker count it reports the wall time, the real-time factor (processing time / audio
+duration) and the speedup over a single worker. The first run for each count also pays for
+starting the pool and loading the models, so it is reported separately as the warm-up.
+
+Usage:
+    python benchmarks/bench_chunked_transcription.py --audio meeting.wav --workers 1 2 4 8
+"""
+import os
+import sys
+import time
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from processors import chunked_transcription
+from processors.transcription_backends import TRANSCRIPTION_BACKENDS, create_transcription_backend
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', required=True, help='Audio file to transcribe')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--backend', default='whisper', choices=[name for name, backend in TRANSCRIPTION_BACKENDS.items() if backend.supports_process_pool])
+    parser.add_argument('--model', default=None, help='Model name, defaults to the backend default')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--chunk-seconds', type=float, default=chunked_transcription.TRANSCRIPTION_CHUNK_SECONDS)
+    args = parser.parse_args()
+
+    samples = chunked_transcription.load_audio_samples(args.audio)
+    duration = len(samples) / chunked_transcription.SAMPLE_RATE
+    backend = create_transcription_backend(args.backend, model_name=args.model)
+    print(f"Audio duration: {duration:.1f}s")
+
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        # One short chunk per worker so every model is loaded before the timed run
+        warmup_samples = samples[:workers * chunked_transcription.SAMPLE_RATE]
+        chunked_transcription.transcribe_chunked(warmup_samples, backend, args.language,
+                                                 workers=workers, chunk_seconds=1, overlap_seconds=0)
+        warmup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = chunked_transcription.transcribe_chunked(samples, backend, args.language,
+                                                          workers=workers, chunk_seconds=args.chunk_seconds)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"workers={workers:<3} warmup={warmup:7.1f}s wall={elapsed:7.1f}s rtf={elapsed / duration:.3f} "
+              f"speedup={baseline / elapsed:.2f}x segments={len(result['segments'])}")
+
+    chunked_transcription.shutdown_transcription_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark publishing task messages to RabbitMQ.
+
+Publishes N small task messages three ways and prints messages/sec for each:
+    per_send    a new connection and channel per message (the old send_task_to_queue pattern)
+    publisher   RabbitMQPublisher.publish() per message, pooled connection, one confirm wait per message
+    send_many   RabbitMQPublisher.send_many() for the whole batch, pooled connection, one confirm wait per
+                --batch-size messages
+
+Usage:
+    docker-compose up -d
+    python benchmarks/bench_rabbitmq_publisher.py --host localhost --username guest --password guest --messages 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import pika
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from utom_databases.functions.rabbitmq_utils import RabbitMQPublisher
+
+QUEUE_NAME = 'utom_benchmark_publish_queue'
+
+def per_send(parameters, bodies):
+    for body in bodies:
+        connection = pika.BlockingConnection(parameters)
+        try:
+            connection.channel().basic_publish(exchange='', routing_key=QUEUE_NAME, body=body)
+        finally:
+            connection.close()
+
+def pooled_publish(publisher, bodies):
+    for body in bodies:
+        publisher.publish(QUEUE_NAME, body)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=os.getenv('rabbitmq_server_ip_address', 'localhost'))
+    parser.add_argument('--username', default=os.getenv('rabbitmq_server_username', 'guest'))
+    parser.add_argument('--password', default=os.getenv('rabbitmq_server_password', 'guest'))
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    parameters = pika.ConnectionParameters(host=args.host, credentials=pika.PlainCredentials(args.username, args.password))
+    setup_connection = pika.BlockingConnection(parameters)
+    setup_channel = setup_connection.channel()
+    setup_channel.queue_declare(queue=QUEUE_NAME)
+
+    bodies = [json.dumps({'task_id': str(i), 'video_url': 'https://example.com/video_%d.mp4' % i}) for i in range(args.messages)]
+    publisher = RabbitMQPublisher(connection_parameters=parameters, pool_size=1, batch_size=args.batch_size)
+    publisher.publish(QUEUE_NAME, 'warm up')
+
+    for name, run in (
+        ('per_send', lambda: per_send(parameters, bodies)),
+        ('publisher', lambda: pooled_publish(publisher, bodies)),
+        ('send_many', lambda: publisher.send_many(QUEUE_NAME, bodies)),
+    ):
+        setup_channel.queue_purge(queue=QUEUE_NAME)
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print('%-10s %8.0f msg/s   %8.2f s' % (name, args.messages / elapsed, elapsed))
+
+    setup_channel.queue_delete(queue=QUEUE_NAME)
+    setup_connection.close()
+    publisher.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark concurrent job writes and status reads on SQLite, rollback journal against WAL.
+
+Starts N writer processes that do what a worker does to a job (insert it, set it to processing,
+then to completed, one commit each) and M reader processes that look up job statuses like
+/api/status does, all on the same database file, for a fixed time. It runs once with the
+default rollback journal and once with WAL and synchronous=NORMAL (SQLITE_WAL in database.py),
+each on a fresh database.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 8 --seconds 10
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+def open_database(database_path, wal):
+    # database.py reads these when it is imported, which happens in the child process
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % database_path
+    os.environ['SQLITE_WAL'] = 'true' if wal else 'false'
+    from database import SessionLocal
+    from models import ProcessingJob
+    return SessionLocal, ProcessingJob
+
+def wait_until(start_at):
+    # Processes start at the same time, after the spawned interpreters finished importing
+    time.sleep(max(start_at - time.time(), 0))
+
+def writer(database_path, wal, start_at, stop_at, results):
+    from sqlalchemy.exc import OperationalError
+    SessionLocal, ProcessingJob = open_database(database_path, wal)
+    wait_until(start_at)
+    jobs = errors = 0
+    while time.time() < stop_at:
+        try:
+            with SessionLocal() as db:
+                job = ProcessingJob(video_url='https://example.com/video.mp4', status='pending')
+                db.add(job)
+                db.commit()
+                for status in ('processing', 'completed'):
+                    job.status = status
+                    db.commit()
+            jobs += 1
+        except OperationalError:
+            errors += 1
+    results.put(('writer', jobs, errors, []))
+
+def reader(database_path, wal, start_at, stop_at, results):
+    from sqlalchemy.exc import OperationalError
+    SessionLocal, ProcessingJob = open_database(database_path, wal)
+    wait_until(start_at)
+    reads = errors = 0
+    latencies = []
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            with SessionLocal() as db:
+                job_id = random.randint(1, 1000)
+                db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+            reads += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    results.put(('reader', reads, errors, latencies))
+
+def run(writers, readers, seconds, wal):
+    from sqlalchemy import create_engine
+    from database import Base, configure_sqlite_engine
+    import models  # noqa
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    setup_engine = create_engine('sqlite:///%s' % database_path)
+    configure_sqlite_engine(setup_engine, wal=wal)
+    Base.metadata.create_all(bind=setup_engine)
+    setup_engine.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 3
+    stop_at = start_at + seconds
+    processes = [context.Process(target=writer, args=(database_path, wal, start_at, stop_at, results)) for _ in range(writers)]
+    processes += [context.Process(target=reader, args=(database_path, wal, start_at, stop_at, results)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    jobs = sum(count for kind, count, _, _ in outcomes if kind == 'writer')
+    reads = sum(count for kind, count, _, _ in outcomes if kind == 'reader')
+    errors = sum(errors for _, _, errors, _ in outcomes)
+    latencies = sorted(latency for _, _, _, kind_latencies in outcomes for latency in kind_latencies)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    name = 'wal, synchronous=NORMAL' if wal else 'rollback journal'
+    print(f"{name:24s} {jobs / seconds:8.0f} jobs/s {reads / seconds:9.0f} reads/s "
+          f"read p99 {p99:7.2f} ms  {errors} locked errors")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s per run")
+    run(args.writers, args.readers, args.seconds, wal=False)
+    run(args.writers, args.readers, args.seconds, wal=True)
+
+if __name__ == '__main__':
+    main()
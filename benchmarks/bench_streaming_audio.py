@@ -0,0 +1,87 @@
+"""
+Benchmark the download-then-extract audio path against the streaming ffmpeg pipeline.
+
+For each mode it reports the wall time, the time until the first audio sample is available and
+the peak number of bytes written to the temp directory while the job ran.
+
+Usage:
+    python benchmarks/bench_streaming_audio.py --url https://example.com/meeting.mp4
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from processors.video import VideoProcessor
+
+class PeakDiskUsage:
+    """Poll a directory in the background and remember the largest total file size seen"""
+    def __init__(self, directory, interval=0.1):
+        self.directory = directory
+        self.interval = interval
+        self.baseline = self._size()
+        self.peak = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _size(self):
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, self._size() - self.baseline)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop_event.set()
+        self._thread.join()
+
+def bench_download(url, temp_dir):
+    processor = VideoProcessor(streaming=False)
+    processor.temp_dir = temp_dir
+    start = time.perf_counter()
+    with PeakDiskUsage(temp_dir) as disk:
+        video_path = processor.download_video(url)
+        audio_path = processor.extract_audio(video_path)
+        first_audio = time.perf_counter() - start
+    processor.cleanup(video_path, audio_path)
+    return time.perf_counter() - start, first_audio, disk.peak
+
+def bench_streaming(url, temp_dir):
+    processor = VideoProcessor(streaming=True)
+    processor.temp_dir = temp_dir
+    start = time.perf_counter()
+    first_audio = None
+    with PeakDiskUsage(temp_dir) as disk:
+        for _ in processor.stream_audio(url):
+            if first_audio is None:
+                first_audio = time.perf_counter() - start
+    return time.perf_counter() - start, first_audio, disk.peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', required=True)
+    args = parser.parse_args()
+
+    for name, bench in [('download', bench_download), ('streaming', bench_streaming)]:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            total, first_audio, peak_bytes = bench(args.url, temp_dir)
+        print('%-10s total %7.2fs   first audio %7.2fs   peak disk %8.1f MB' % (name, total, first_audio, peak_bytes / 1e6))
+
+if __name__ == '__main__':
+    main()
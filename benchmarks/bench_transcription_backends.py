@@ -0,0 +1,98 @@
+"""
+Compare transcription backends on a fixed set of local clips.
+
+The clip directory holds audio files, each next to a reference transcript with the same name and
+a .txt extension (meeting1.wav + meeting1.txt). For each backend it reports the model load time,
+and per clip and in total the real-time factor (processing time / audio duration, lower is
+faster) and the word error rate against the reference.
+
+Usage:
+    python benchmarks/bench_transcription_backends.py --clips benchmarks/clips --backends whisper faster-whisper openai
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from processors.chunked_transcription import load_audio_samples, SAMPLE_RATE
+from processors.transcription_backends import TRANSCRIPTION_BACKENDS, create_transcription_backend
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm')
+
+def normalize_words(text):
+    """Lowercase and drop punctuation so only word choices count towards the error rate"""
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, by word-level edit distance"""
+    reference_words = normalize_words(reference)
+    hypothesis_words = normalize_words(hypothesis)
+    if not reference_words:
+        return 0.0 if not hypothesis_words else 1.0
+
+    previous_row = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, 1):
+        row = [i]
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            row.append(min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (reference_word != hypothesis_word)
+            ))
+        previous_row = row
+    return previous_row[-1] / len(reference_words)
+
+def load_clips(clips_dir):
+    clips = []
+    for name in sorted(os.listdir(clips_dir)):
+        base, extension = os.path.splitext(name)
+        reference_path = os.path.join(clips_dir, base + '.txt')
+        if extension.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                reference = f.read()
+            clips.append((name, load_audio_samples(os.path.join(clips_dir, name)), reference))
+    return clips
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', required=True, help='Directory of audio clips with .txt reference transcripts')
+    parser.add_argument('--backends', nargs='+', default=list(TRANSCRIPTION_BACKENDS), choices=list(TRANSCRIPTION_BACKENDS))
+    parser.add_argument('--language', default='en')
+    args = parser.parse_args()
+
+    clips = load_clips(args.clips)
+    if not clips:
+        sys.exit(f"No clips with reference transcripts found in {args.clips}")
+    total_duration = sum(len(samples) for _, samples, _ in clips) / SAMPLE_RATE
+    print(f"{len(clips)} clips, {total_duration:.1f}s of audio")
+
+    for backend_name in args.backends:
+        backend = create_transcription_backend(backend_name)
+        start = time.perf_counter()
+        backend.load()
+        print(f"\n{backend_name} ({backend.model_name}) loaded in {time.perf_counter() - start:.1f}s")
+
+        total_elapsed = 0.0
+        total_errors = 0.0
+        total_words = 0
+        for name, samples, reference in clips:
+            start = time.perf_counter()
+            result = backend.transcribe(samples, args.language)
+            elapsed = time.perf_counter() - start
+            duration = len(samples) / SAMPLE_RATE
+            wer = word_error_rate(reference, result['text'])
+            reference_words = len(normalize_words(reference))
+
+            total_elapsed += elapsed
+            total_errors += wer * reference_words
+            total_words += reference_words
+            print(f"  {name:<30} rtf={elapsed / duration:.3f} wer={wer:.3f}")
+
+        print(f"  {'total':<30} rtf={total_elapsed / total_duration:.3f} wer={total_errors / max(total_words, 1):.3f}")
+
+if __name__ == '__main__':
+    main()
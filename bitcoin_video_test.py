@@ -13,9 +13,9 @@ import moviepy.editor as mp
 from moviepy.editor import VideoFileClip, AudioFileClip
 import uuid
 from pymongo import MongoClient
-import openai
 from video_processor import process_video
 from utom_feature.processors.action_points import extract_action_points, format_action_points
+from utom_feature.functions import llm_client
 
 # Load environment variables
 load_dotenv()
@@ -29,9 +29,6 @@ MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
 DB_NAME = 'video_processor'
 COLLECTION_NAME = 'video_metadata'
 
-# Configure OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
-
 def get_mongodb_client():
     """Get MongoDB client instance"""
     return MongoClient(MONGODB_URI)
@@ -221,7 +218,7 @@ def transcribe_audio(audio_path: str) -> dict:
     try:
         logger.info("Transcribing audio using OpenAI Whisper...")
         with open(audio_path, "rb") as audio_file:
-            client = openai.OpenAI()
+            client = llm_client.get_openai_client()
             transcription = client.audio.transcriptions.create(
                 model="whisper-1",
                 file=audio_file
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import os
@@ -6,6 +7,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
 # Create engine with optimized pool settings for SQLite
@@ -18,20 +21,82 @@ engine = create_engine(
     pool_pre_ping=True  # Enable connection health checks
 )
 
+# WAL lets the API read while a worker writes, and synchronous=NORMAL only syncs at checkpoints,
+# which is still safe against corruption in WAL mode. Set SQLITE_WAL=false for the rollback journal.
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+# How long a writer waits for the write lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 30000))
+
+def configure_sqlite_engine(sqlite_engine, wal=None):
+    """Set the journal mode and busy timeout on every new connection of a SQLite engine"""
+    wal = SQLITE_WAL if wal is None else wal
+
+    @event.listens_for(sqlite_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if wal:
+            # The journal mode is stored in the database file, synchronous is per connection
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+if engine.dialect.name == "sqlite":
+    configure_sqlite_engine(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create declarative base
 Base = declarative_base()
 
+def get_db():
+    """Yield a session for one request and close it afterwards, for FastAPI's Depends()"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def drop_and_recreate_tables():
-    """Drop all tables and recreate them"""
+    """Drop all tables and recreate them. This deletes every job, it is not run at startup."""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
 
-def init_db():
-    """Initialize database and create all tables"""
+def create_missing_indexes(bind=engine):
+    """
+    Create the model indexes that an existing table doesn't have yet.
+
+    create_all() only creates the indexes of tables it creates, so this is what adds a new
+    index to a database that was created before the index was declared.
+
+    Returns:
+        list: The names of the created indexes.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=bind)
+                created.append(index.name)
+    return created
+
+def init_db(bind=engine):
+    """
+    Create the tables and indexes that don't exist yet. Existing tables and their rows are
+    kept, so it is safe to run at every start.
+    """
     # Import here to avoid circular imports
     import models  # noqa
-    drop_and_recreate_tables()
+    existing_tables = set(inspect(bind).get_table_names())
+    Base.metadata.create_all(bind=bind, checkfirst=True)
+    created_tables = [table.name for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+    created_indexes = create_missing_indexes(bind)
+    if created_tables or created_indexes:
+        logger.info(f"Created tables {created_tables} and indexes {created_indexes}")
     return True 
\ No newline at end of file
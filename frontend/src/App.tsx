@@ -40,8 +40,8 @@ function App() {
       const response = await axios.post('/api/process', { video_url: videoUrl });
       setJobId(response.data.job_id);
       setStatus(response.data.status);
-      // Start polling for status
-      pollStatus(response.data.job_id);
+      // Follow the status as the worker reports it
+      watchStatus(response.data.job_id);
     } catch (err) {
       if (axios.isAxiosError(err)) {
         setError(err.response?.data?.error || err.message || 'An error occurred');
@@ -54,33 +54,85 @@ function App() {
     }
   };
 
+  const handleError = (err: unknown, fallback: string) => {
+    if (axios.isAxiosError(err)) {
+      setError(err.response?.data?.error || err.message || fallback);
+    } else if (err instanceof Error) {
+      setError(err.message);
+    } else {
+      setError('An unexpected error occurred');
+    }
+    setIsProcessing(false);
+  };
+
+  // Returns true once the job has finished, either way
+  const handleStatus = async (id: number, jobStatus: string, jobError?: string | null) => {
+    setStatus(jobStatus);
+
+    if (jobStatus === 'completed') {
+      // Fetch results
+      const resultsResponse = await axios.get<ProcessingResult>(`/api/results/${id}`);
+      setResults(resultsResponse.data);
+      setIsProcessing(false);
+      return true;
+    }
+    if (jobStatus === 'failed') {
+      setError(jobError || 'Job processing failed');
+      setIsProcessing(false);
+      return true;
+    }
+    return false;
+  };
+
+  const watchStatus = (id: number) => {
+    if (typeof EventSource === 'undefined') {
+      pollStatus(id);
+      return;
+    }
+
+    // The server pushes every status change, and closes the stream once the job is done
+    const source = new EventSource(`/api/status/${id}/stream`);
+    let finished = false;
+
+    source.onmessage = async (event: MessageEvent) => {
+      const data = JSON.parse(event.data);
+      if (data.status === 'completed' || data.status === 'failed') {
+        // Close before the server ends the stream, otherwise the browser reconnects
+        finished = true;
+        source.close();
+      }
+      try {
+        await handleStatus(id, data.status, data.error);
+      } catch (err) {
+        handleError(err, 'An error occurred while fetching results');
+      }
+    };
+
+    source.addEventListener('job_not_found', () => {
+      finished = true;
+      source.close();
+      setError('Job not found');
+      setIsProcessing(false);
+    });
+
+    source.onerror = () => {
+      // The browser reconnects by itself after a dropped connection, only fall back to
+      // polling when the stream can't be opened at all
+      if (!finished && source.readyState === EventSource.CLOSED) {
+        pollStatus(id);
+      }
+    };
+  };
+
   const pollStatus = async (id: number) => {
     try {
       const response = await axios.get(`/api/status/${id}`);
-      setStatus(response.data.status);
-
-      if (response.data.status === 'completed') {
-        // Fetch results
-        const resultsResponse = await axios.get<ProcessingResult>(`/api/results/${id}`);
-        setResults(resultsResponse.data);
-        setIsProcessing(false);
-      } else if (response.data.status === 'failed') {
-        const errorResponse = await axios.get(`/api/error/${id}`);
-        setError(errorResponse.data.error || 'Job processing failed');
-        setIsProcessing(false);
-      } else {
+      if (!(await handleStatus(id, response.data.status, response.data.error))) {
         // Continue polling
         setTimeout(() => pollStatus(id), 5000);
       }
     } catch (err) {
-      if (axios.isAxiosError(err)) {
-        setError(err.response?.data?.error || err.message || 'An error occurred while checking status');
-      } else if (err instanceof Error) {
-        setError(err.message);
-      } else {
-        setError('An unexpected error occurred');
-      }
-      setIsProcessing(false);
+      handleError(err, 'An error occurred while checking status');
     }
   };
 
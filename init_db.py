@@ -1,4 +1,5 @@
 import os
+import sys
 import time
 import logging
 from sqlalchemy import inspect
@@ -35,7 +36,9 @@ def verify_tables():
     return "processing_jobs" in tables
 
 if __name__ == "__main__":
-    if remove_db_if_exists():
+    # Existing jobs are kept unless --reset is passed
+    reset = "--reset" in sys.argv[1:]
+    if not reset or remove_db_if_exists():
         logger.info("Initializing database...")
         init_db()
         
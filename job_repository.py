@@ -0,0 +1,108 @@
+import os
+import logging
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models import ProcessingJob
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+"""
+Processing job repository
+
+Database access for processing jobs that is shared by the API processes and the workers.
+"""
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+
+# The statuses a job may move to, each with the statuses it may move from. A retried job goes
+# back to processing from processing or failed, and a completed job never changes again.
+JOB_STATUS_TRANSITIONS = {
+    "processing": ("pending", "processing", "failed"),
+    "completed": ("processing",),
+    "failed": ("pending", "processing"),
+}
+
+def validate_batch_urls(video_urls) -> List[str]:
+    """
+    Check a batch of video URLs submitted in one request.
+
+    Raises:
+        ValueError: If the batch is empty, too big or has an entry that isn't a URL string.
+    """
+    if not isinstance(video_urls, list) or not video_urls:
+        raise ValueError("video_urls must be a non-empty list")
+    if len(video_urls) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} video_urls can be submitted at once")
+    for video_url in video_urls:
+        if not isinstance(video_url, str) or not video_url.strip():
+            raise ValueError(f"Invalid video_url: {video_url!r}")
+    return [video_url.strip() for video_url in video_urls]
+
+def create_jobs(db: Session, video_urls: List[str], webhook_url: Optional[str] = None) -> List[int]:
+    """
+    Create pending jobs for a batch of videos with one bulk insert and one commit.
+
+    Args:
+        db: The database session.
+        video_urls: The videos to process.
+        webhook_url: Where to send the results of every job, if anywhere.
+
+    Returns:
+        List[int]: The job ids, in the order of video_urls.
+    """
+    jobs = [ProcessingJob(video_url=video_url, webhook_url=webhook_url, status="pending") for video_url in video_urls]
+    db.add_all(jobs)
+    # The flush inserts the rows in batches and returns their ids, read them before the commit
+    # expires the objects, otherwise each id would be loaded with its own SELECT
+    db.flush()
+    job_ids = [job.id for job in jobs]
+    db.commit()
+    return job_ids
+
+def transition_job(db: Session, job_id: int, status: str, **values) -> int:
+    """
+    Move a job to a new status with a single UPDATE, without loading the job first.
+
+    The UPDATE only matches the job while it is in a status that may move to the new one,
+    so an invalid transition changes nothing.
+
+    Args:
+        db: The database session.
+        job_id: The job to update.
+        status: The new status, a key of JOB_STATUS_TRANSITIONS.
+        **values: Other columns to set in the same statement.
+
+    Returns:
+        int: The number of updated rows, 0 if the job doesn't exist or can't move to the status.
+
+    Raises:
+        ValueError: If the status is not one a job can move to.
+    """
+    if status not in JOB_STATUS_TRANSITIONS:
+        raise ValueError(f"Jobs can't move to status {status!r}")
+    statement = (
+        update(ProcessingJob)
+        .where(ProcessingJob.id == job_id, ProcessingJob.status.in_(JOB_STATUS_TRANSITIONS[status]))
+        .values(status=status, **values)
+        .execution_options(synchronize_session=False)
+    )
+    rowcount = db.execute(statement).rowcount
+    db.commit()
+    if not rowcount:
+        logger.warning(f"Job {job_id} was not moved to {status}, it doesn't exist or is in a status that can't move to it")
+    return rowcount
+
+def mark_job_processing(db: Session, job_id: int) -> int:
+    """Mark a job as picked up by a worker"""
+    return transition_job(db, job_id, "processing", started_at=datetime.utcnow(), completed_at=None, error_message=None)
+
+def mark_job_completed(db: Session, job_id: int, transcription: str, action_points: str) -> int:
+    """Store the results of a job and mark it as completed"""
+    return transition_job(db, job_id, "completed", completed_at=datetime.utcnow(), transcription=transcription, action_points=action_points)
+
+def mark_job_failed(db: Session, job_id: int, error_message: str) -> int:
+    """Mark a job as failed with the error that stopped it"""
+    return transition_job(db, job_id, "failed", completed_at=datetime.utcnow(), error_message=error_message)
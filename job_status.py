@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import logging
+from typing import Callable, Dict, Iterator, Optional
+import redis
+from dotenv import load_dotenv
+from database import SessionLocal
+from models import ProcessingJob
+from utom_databases.functions.redis_utils import get_pooled_redis_client
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+"""
+Job status notifications
+
+The workers publish every status transition of a processing job to a Redis pub/sub channel
+for that job, and the status stream endpoints forward those messages to the browser as
+Server-Sent Events. A client watching a job then holds one connection and gets each change
+as it happens, instead of polling /api/status and opening a database session every time.
+
+A stream first sends the status stored in the database, so a transition published before
+the client connected is not missed, and ends once the job is completed or failed.
+"""
+JOB_STATUS_CHANNEL_PREFIX = 'job_status:'
+TERMINAL_STATUSES = ('completed', 'failed')
+# A comment line is sent when nothing happened for this long, so proxies keep the connection open
+JOB_STATUS_HEARTBEAT_SECONDS = float(os.getenv('JOB_STATUS_HEARTBEAT_SECONDS', 15))
+# Clients reconnect after this, which also frees the worker thread of a closed tab
+JOB_STATUS_STREAM_TIMEOUT_SECONDS = float(os.getenv('JOB_STATUS_STREAM_TIMEOUT_SECONDS', 1800))
+
+def job_status_channel(job_id: int) -> str:
+    return f"{JOB_STATUS_CHANNEL_PREFIX}{job_id}"
+
+def publish_job_status(job_id: int, status: str, error: Optional[str] = None, client: Optional[redis.Redis] = None) -> int:
+    """
+    Publish a status transition of a job. Call it after the new status is committed.
+
+    A failed publish is only logged: the status is in the database, and a client that
+    missed it gets it from the database when it reconnects.
+
+    Returns:
+        int: The number of subscribers that received the message.
+    """
+    message = {"job_id": job_id, "status": status, "error": error}
+    try:
+        return (client or get_pooled_redis_client()).publish(job_status_channel(job_id), json.dumps(message))
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish status {status} for job {job_id}: {str(e)}")
+        return 0
+
+def load_job_status(job_id: int) -> Optional[Dict]:
+    """Read the stored status of a job, or None if there is no such job"""
+    with SessionLocal() as db:
+        job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+        if not job:
+            return None
+        return {"job_id": job.id, "status": job.status, "error": job.error_message}
+
+def format_sse(data: Dict, event: Optional[str] = None) -> str:
+    """Format a message as a Server-Sent Event"""
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def stream_job_status(
+    job_id: int,
+    load_status: Callable[[int], Optional[Dict]],
+    client: Optional[redis.Redis] = None,
+    heartbeat_seconds: Optional[float] = None,
+    timeout_seconds: Optional[float] = None
+) -> Iterator[str]:
+    """
+    Yield the status changes of a job as Server-Sent Events until it is completed or failed.
+
+    Args:
+        job_id: The job to watch.
+        load_status: Returns the stored status of a job as {"job_id", "status", "error"}, or None.
+        client: The Redis client, the shared one by default.
+        heartbeat_seconds: How long to wait for a message before sending a heartbeat.
+        timeout_seconds: How long to stream before asking the client to reconnect.
+    """
+    heartbeat_seconds = heartbeat_seconds or JOB_STATUS_HEARTBEAT_SECONDS
+    timeout_seconds = timeout_seconds or JOB_STATUS_STREAM_TIMEOUT_SECONDS
+    pubsub = (client or get_pooled_redis_client()).pubsub(ignore_subscribe_messages=True)
+    try:
+        # Subscribe before reading the database, a transition in between is then received
+        # as a message rather than lost
+        pubsub.subscribe(job_status_channel(job_id))
+        current = load_status(job_id)
+        if current is None:
+            yield format_sse({"job_id": job_id, "error": "Job not found"}, event="job_not_found")
+            return
+        yield format_sse(current)
+        if current["status"] in TERMINAL_STATUSES:
+            return
+
+        deadline = time.monotonic() + timeout_seconds
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=heartbeat_seconds)
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            data = json.loads(message["data"])
+            yield format_sse(data)
+            if data["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
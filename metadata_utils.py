@@ -1,9 +1,9 @@
 import json
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from pymongo import MongoClient
 import logging
 from pathlib import Path
+from utom_databases.functions.mongo_utils import get_pooled_mongo_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +16,7 @@ COLLECTION_NAME = 'video_metadata'
 
 class MetadataManager:
     def __init__(self, mongodb_uri: str = MONGODB_URI):
-        self.client = MongoClient(mongodb_uri)
+        self.client = get_pooled_mongo_client(mongodb_uri)
         self.db = self.client[DB_NAME]
         self.collection = self.db[COLLECTION_NAME]
 
@@ -119,10 +119,3 @@ class MetadataManager:
         except Exception as e:
             logger.error(f"Error searching videos: {str(e)}")
             return []
-
-    def __del__(self):
-        """Close MongoDB connection when object is destroyed"""
-        try:
-            self.client.close()
-        except:
-            pass 
\ No newline at end of file
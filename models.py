@@ -9,11 +9,11 @@ class ProcessingJob(Base):
     id = Column(Integer, primary_key=True, index=True)
     video_url = Column(String, nullable=False)
     webhook_url = Column(String, nullable=True)
-    status = Column(String, nullable=False, default="pending")
+    status = Column(String, nullable=False, default="pending", index=True)
     transcription = Column(Text, nullable=True)
     action_points = Column(Text, nullable=True)
     error_message = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
@@ -1,22 +1,33 @@
-from pymongo import MongoClient
 import json
 from datetime import datetime
 import os
 from pathlib import Path
 import logging
+from typing import Iterator, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from utom_databases.functions.mongo_utils import get_pooled_mongo_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # MongoDB configuration
-MONGODB_URI = 'mongodb://localhost:27017/'
+MONGODB_URI = os.getenv('VIDEO_METADATA_MONGODB_URI', 'mongodb://localhost:27017/')
 DB_NAME = 'video_processor'
 COLLECTION_NAME = 'video_metadata'
 
+# Fields returned when listing videos, the transcription and action points under features
+# can be large and are only returned for a single video or in the export
+METADATA_LIST_FIELDS = ('video_id', 'filename', 'url', 'duration', 'size', 'resolution', 'fps', 'status', 'created_at')
+DEFAULT_METADATA_PAGE_SIZE = int(os.getenv('METADATA_PAGE_SIZE', 100))
+MAX_METADATA_PAGE_SIZE = int(os.getenv('MAX_METADATA_PAGE_SIZE', 1000))
+# Documents fetched per round trip while exporting
+METADATA_EXPORT_BATCH_SIZE = int(os.getenv('METADATA_EXPORT_BATCH_SIZE', 500))
+
 def get_mongodb_client():
-    """Get MongoDB client instance"""
-    return MongoClient(MONGODB_URI)
+    """Get the shared, pooled MongoDB client instance (do not close it)"""
+    return get_pooled_mongo_client(MONGODB_URI)
 
 def get_video_metadata(video_id: str) -> dict:
     """
@@ -36,28 +47,84 @@ def get_video_metadata(video_id: str) -> dict:
     except Exception as e:
         logger.error(f"Error retrieving metadata: {str(e)}")
         return None
+
+def get_metadata_collection():
+    return get_mongodb_client()[DB_NAME][COLLECTION_NAME]
+
+def get_video_metadata_page(after: Optional[str] = None, limit: int = DEFAULT_METADATA_PAGE_SIZE) -> dict:
+    """
+    Retrieve one page of video metadata, in _id order, with only the list fields.
+
+    The page starts after the _id of the last video of the previous page, so every page is
+    an index range scan on _id, however deep into the collection it is.
+
+    Args:
+        after: The next_cursor of the previous page, None for the first page.
+        limit: The page size, at most MAX_METADATA_PAGE_SIZE.
+
+    Returns:
+        dict: {"metadata": [...], "next_cursor": the cursor of the next page, or None on the last page}
+
+    Raises:
+        ValueError: If the cursor or the limit is invalid.
+    """
+    if limit < 1 or limit > MAX_METADATA_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_METADATA_PAGE_SIZE}")
+    query = {}
+    if after:
+        try:
+            query['_id'] = {'$gt': ObjectId(after)}
+        except (InvalidId, TypeError):
+            raise ValueError(f"Invalid cursor: {after!r}")
+
+    collection = get_metadata_collection()
+    projection = {field: 1 for field in METADATA_LIST_FIELDS}
+    # One extra document tells whether there is a next page without counting
+    metadata_list = list(collection.find(query, projection).sort('_id', 1).limit(limit + 1))
+    has_next_page = len(metadata_list) > limit
+    metadata_list = metadata_list[:limit]
+    for metadata in metadata_list:
+        metadata['_id'] = str(metadata['_id'])
+    return {
+        "metadata": metadata_list,
+        "next_cursor": metadata_list[-1]['_id'] if has_next_page else None
+    }
+
+def iter_video_metadata(projection: Optional[dict] = None, batch_size: int = METADATA_EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Iterate over all video metadata in _id order, fetching batch_size documents at a time, so
+    only one batch is held in memory.
+    """
+    cursor = get_metadata_collection().find({}, projection).sort('_id', 1).batch_size(batch_size)
+    try:
+        for metadata in cursor:
+            metadata['_id'] = str(metadata['_id'])
+            yield metadata
     finally:
-        client.close()
+        cursor.close()
+
+def stream_video_metadata_ndjson(projection: Optional[dict] = None) -> Iterator[str]:
+    """
+    Yield all video metadata as newline delimited JSON, one document per line, for bulk exports.
+    """
+    try:
+        for metadata in iter_video_metadata(projection):
+            yield json.dumps(metadata, default=str) + "\n"
+    except Exception as e:
+        # The response has started, the client sees a truncated export
+        logger.error(f"Error streaming metadata export: {str(e)}")
+        raise
 
 def get_all_video_metadata() -> list:
     """
-    Retrieve all video metadata from MongoDB
+    Retrieve all video metadata from MongoDB. This holds every document in memory, use
+    get_video_metadata_page() or stream_video_metadata_ndjson() to serve large collections.
     """
     try:
-        client = get_mongodb_client()
-        db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        
-        metadata_list = list(collection.find())
-        # Convert ObjectId to string for JSON serialization
-        for metadata in metadata_list:
-            metadata['_id'] = str(metadata['_id'])
-        return metadata_list
+        return list(iter_video_metadata())
     except Exception as e:
         logger.error(f"Error retrieving all metadata: {str(e)}")
         return []
-    finally:
-        client.close()
 
 def save_metadata_locally(metadata: dict, output_dir: str = 'test_output') -> str:
     """
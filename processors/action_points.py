@@ -1,27 +1,24 @@
-from openai import OpenAI
 import os
-from typing import List, Dict
+from typing import List, Dict, Union, Any
 import logging
 from dotenv import load_dotenv
 import json
+from utom_feature.functions import llm_client
+from utom_feature.processors.transcript_map_reduce import chunk_transcript, map_chunks, dedupe_items
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client with API key from environment
+# Check the API key up front, the shared client is fetched per call
 api_key = os.getenv('OPENAI_API_KEY')
 if not api_key:
     raise ValueError("OPENAI_API_KEY environment variable is not set")
-client = OpenAI(api_key=api_key)
 
-def extract_action_points(transcription: str) -> List[Dict]:
-    """Extract action points from transcription using OpenAI"""
-    try:
-        logger.info("Extracting action points from transcription")
-        
-        system_prompt = """
+PRIORITY_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+
+SYSTEM_PROMPT = """
         You are an expert at analyzing transcripts and extracting clear, actionable points.
         You must respond with ONLY a valid JSON object in this exact format:
         {
@@ -42,77 +39,110 @@ def extract_action_points(transcription: str) -> List[Dict]:
         5. Ensure the response is valid JSON that can be parsed
         """
 
-        user_prompt = f"""
+def _extract_chunk_action_points(transcription: str) -> List[Dict]:
+    """Extract action points from one transcript chunk, raises if the response can't be used"""
+    user_prompt = f"""
         Analyze this transcription and return action points as a JSON object:
 
         {transcription}
         """
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        
-        # Parse and validate the JSON response
-        try:
-            content = response.choices[0].message.content.strip()
-            logger.info(f"Received GPT response: {content[:200]}...")  # Log first 200 chars
-            
-            # Parse JSON response
-            parsed = json.loads(content)
+    response = llm_client.create_chat_completion(
+        api_key=api_key,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        max_tokens=1500,
+        use_cache=False
+    )
+    
+    # Parse and validate the JSON response
+    content = response.choices[0].message.content.strip()
+    logger.info(f"Received GPT response: {content[:200]}...")  # Log first 200 chars
+    
+    # Parse JSON response
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse GPT response as JSON: {str(e)}")
+        # Create a fallback action point
+        return [{
+            'action': 'Review transcription manually',
+            'context': f'Failed to parse GPT response: {str(e)}',
+            'priority': 'High'
+        }]
+    
+    # Extract action points array
+    if isinstance(parsed, dict) and 'action_points' in parsed:
+        action_points = parsed['action_points']
+    elif isinstance(parsed, list):
+        action_points = parsed
+    else:
+        raise ValueError("Unexpected response format")
+    
+    # Validate and format each action point
+    formatted_points = []
+    for point in action_points:
+        if isinstance(point, dict):
+            formatted_point = {
+                'action': str(point.get('action', '')).strip(),
+                'context': str(point.get('context', '')).strip(),
+                'priority': str(point.get('priority', 'Medium')).strip()
+            }
             
-            # Extract action points array
-            if isinstance(parsed, dict) and 'action_points' in parsed:
-                action_points = parsed['action_points']
-            elif isinstance(parsed, list):
-                action_points = parsed
+            # Validate required fields
+            if not formatted_point['action']:
+                continue
+                
+            # Normalize priority
+            priority = formatted_point['priority'].lower()
+            if 'high' in priority or 'urgent' in priority:
+                formatted_point['priority'] = 'High'
+            elif 'low' in priority:
+                formatted_point['priority'] = 'Low'
             else:
-                raise ValueError("Unexpected response format")
-            
-            # Validate and format each action point
-            formatted_points = []
-            for point in action_points:
-                if isinstance(point, dict):
-                    formatted_point = {
-                        'action': str(point.get('action', '')).strip(),
-                        'context': str(point.get('context', '')).strip(),
-                        'priority': str(point.get('priority', 'Medium')).strip()
-                    }
-                    
-                    # Validate required fields
-                    if not formatted_point['action']:
-                        continue
-                        
-                    # Normalize priority
-                    priority = formatted_point['priority'].lower()
-                    if 'high' in priority or 'urgent' in priority:
-                        formatted_point['priority'] = 'High'
-                    elif 'low' in priority:
-                        formatted_point['priority'] = 'Low'
-                    else:
-                        formatted_point['priority'] = 'Medium'
-                        
-                    formatted_points.append(formatted_point)
-            
-            if not formatted_points:
-                raise ValueError("No valid action points extracted")
+                formatted_point['priority'] = 'Medium'
                 
-            logger.info(f"Successfully extracted {len(formatted_points)} action points")
-            return formatted_points
+            formatted_points.append(formatted_point)
+    
+    return formatted_points
+
+def _merge_duplicate_action_points(kept: Dict, duplicate: Dict) -> Dict:
+    """Keep the higher of the two priorities when the same action comes up in two chunks"""
+    if PRIORITY_ORDER[duplicate['priority']] < PRIORITY_ORDER[kept['priority']]:
+        return dict(kept, priority=duplicate['priority'])
+    return kept
+
+def extract_action_points(transcription: Union[str, Dict[str, Any]]) -> List[Dict]:
+    """
+    Extract action points from transcription using OpenAI.
+
+    Long transcripts are split into chunks on segment boundaries, the chunks are sent to the model
+    concurrently, and the action points from all chunks are merged with duplicates removed.
+    """
+    try:
+        chunks = chunk_transcript(transcription)
+        logger.info(f"Extracting action points from transcription in {len(chunks)} chunks")
+
+        chunk_results = map_chunks(chunks, _extract_chunk_action_points)
+        failures = [chunk_result['error'] for chunk_result in chunk_results if not chunk_result['success']]
+        if failures and len(failures) == len(chunk_results):
+            raise ValueError(failures[0])
+        if failures:
+            logger.warning(f"{len(failures)} of {len(chunk_results)} transcript chunks failed, continuing with the rest")
+
+        # Reduce: merge the chunks in order and drop actions that came up more than once
+        action_points = [point for chunk_result in chunk_results if chunk_result['success'] for point in chunk_result['result']]
+        formatted_points = dedupe_items(action_points, key_func=lambda point: point['action'], merge_func=_merge_duplicate_action_points)
+
+        if not formatted_points:
+            raise ValueError("No valid action points extracted")
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse GPT response as JSON: {str(e)}")
-            # Create a fallback action point
-            return [{
-                'action': 'Review transcription manually',
-                'context': f'Failed to parse GPT response: {str(e)}',
-                'priority': 'High'
-            }]
+        logger.info(f"Successfully extracted {len(formatted_points)} action points")
+        return formatted_points
             
     except Exception as e:
         logger.error(f"Error extracting action points: {str(e)}")
@@ -0,0 +1,220 @@
+import os
+import wave
+import atexit
+import logging
+import threading
+import subprocess
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Chunking settings. Each dramatiq process starts its own pool with a model copy per worker, so the
+# pool is off by default; set it to the CPUs divided by the dramatiq processes on the host to use it
+TRANSCRIPTION_WORKERS = int(os.getenv('TRANSCRIPTION_WORKERS', 1))
+TRANSCRIPTION_CHUNK_SECONDS = float(os.getenv('TRANSCRIPTION_CHUNK_SECONDS', 120))
+TRANSCRIPTION_CHUNK_OVERLAP_SECONDS = float(os.getenv('TRANSCRIPTION_CHUNK_OVERLAP_SECONDS', 5))
+# How far back from each target boundary to look for a quiet spot to cut at
+TRANSCRIPTION_SILENCE_SEARCH_SECONDS = float(os.getenv('TRANSCRIPTION_SILENCE_SEARCH_SECONDS', 10))
+SILENCE_FRAME_SECONDS = 0.02
+
+def load_audio_samples(audio_path: str) -> np.ndarray:
+    """Load an audio file as float32 16kHz mono samples in [-1, 1], decoding with ffmpeg if needed"""
+    try:
+        with wave.open(audio_path, 'rb') as wav_file:
+            if (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                pcm = wav_file.readframes(wav_file.getnframes())
+                return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    except (wave.Error, EOFError):
+        pass
+
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-i', audio_path,
+        '-vn', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1',
+        '-f', 's16le', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+def frame_energies(samples: np.ndarray, frame_seconds: float = SILENCE_FRAME_SECONDS) -> np.ndarray:
+    """RMS energy of consecutive non-overlapping frames"""
+    frame_length = int(SAMPLE_RATE * frame_seconds)
+    num_frames = len(samples) // frame_length
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+def find_silence_cut_points(samples: np.ndarray, chunk_seconds: float = TRANSCRIPTION_CHUNK_SECONDS,
+                            search_seconds: float = TRANSCRIPTION_SILENCE_SEARCH_SECONDS) -> List[float]:
+    """
+    Pick chunk boundaries roughly every chunk_seconds, each moved to the quietest frame in the
+    search_seconds before it so that cuts land between words.
+
+    Returns:
+        list: Boundary times in seconds, starting at 0 and ending at the audio duration.
+    """
+    duration = len(samples) / SAMPLE_RATE
+    energies = frame_energies(samples)
+    cut_points = [0.0]
+
+    while duration - cut_points[-1] > chunk_seconds:
+        target = cut_points[-1] + chunk_seconds
+        first_frame = int(max(cut_points[-1] + 1.0, target - search_seconds) / SILENCE_FRAME_SECONDS)
+        last_frame = min(int(target / SILENCE_FRAME_SECONDS), len(energies))
+        if last_frame > first_frame:
+            quietest_frame = first_frame + int(np.argmin(energies[first_frame:last_frame]))
+            cut_points.append(quietest_frame * SILENCE_FRAME_SECONDS)
+        else:
+            cut_points.append(target)
+
+    cut_points.append(duration)
+    return cut_points
+
+def build_chunk_windows(cut_points: List[float], overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS) -> List[Tuple[float, float, float, float]]:
+    """
+    Turn boundaries into overlapping windows.
+
+    Returns:
+        list: (window_start, window_end, keep_start, keep_end) tuples. Each window is transcribed in
+            full, but only segments centred inside [keep_start, keep_end) are kept when stitching.
+    """
+    duration = cut_points[-1]
+    windows = []
+    for keep_start, keep_end in zip(cut_points[:-1], cut_points[1:]):
+        window_start = max(0.0, keep_start - overlap_seconds)
+        window_end = min(duration, keep_end + overlap_seconds)
+        windows.append((window_start, window_end, keep_start, keep_end))
+    return windows
+
+def stitch_chunk_results(chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk transcriptions into one whisper-style result.
+
+    Segment timestamps are shifted by their window's start, and segments from the overlapping
+    edges are only kept by the chunk whose keep range contains the middle of the segment, so
+    nothing in an overlap is transcribed twice.
+    """
+    segments = []
+    for chunk in chunk_results:
+        for segment in chunk['segments']:
+            start = segment['start'] + chunk['window_start']
+            end = segment['end'] + chunk['window_start']
+            middle = (start + end) / 2
+            if chunk['keep_start'] <= middle < chunk['keep_end']:
+                segments.append(dict(segment, start=start, end=end))
+
+    segments.sort(key=lambda segment: segment['start'])
+    for segment_id, segment in enumerate(segments):
+        segment['id'] = segment_id
+
+    languages = [chunk.get('language') for chunk in chunk_results if chunk.get('language')]
+    return {
+        'text': ' '.join(segment['text'].strip() for segment in segments if segment['text'].strip()),
+        'segments': segments,
+        'language': max(set(languages), key=languages.count) if languages else None,
+    }
+
+"""
+Worker processes
+
+Each worker builds its own transcription backend and loads the model once in the pool initializer,
+then keeps it for every chunk it transcribes. The pool itself is created on first use and reused
+for the life of the process.
+"""
+_worker_backend = None
+
+def _init_transcription_worker(backend_name: str, backend_config: Dict[str, Any]):
+    global _worker_backend
+    from .transcription_backends import create_transcription_backend
+
+    _worker_backend = create_transcription_backend(backend_name, **backend_config)
+    _worker_backend.load()
+
+def _transcribe_chunk(samples: np.ndarray, language: Optional[str]) -> Dict[str, Any]:
+    result = _worker_backend.transcribe(samples, language)
+    return {'segments': result['segments'], 'language': result.get('language')}
+
+_transcription_pools = {}
+_transcription_pools_lock = threading.Lock()
+
+def get_transcription_pool(backend, workers: int = TRANSCRIPTION_WORKERS) -> ProcessPoolExecutor:
+    """
+    Get the process pool of preloaded transcription workers for a backend, creating it on first use.
+
+    Pools are kept per backend config, a task may still be using the pool of another config so it
+    is never shut down here.
+    """
+    backend_config = backend.config()
+    # Split the cores between the workers unless the backend has its own thread setting
+    if not backend_config.get('threads'):
+        backend_config['threads'] = max(1, (os.cpu_count() or 1) // workers)
+
+    config = (backend.name, tuple(sorted(backend_config.items())), workers)
+    with _transcription_pools_lock:
+        pool = _transcription_pools.get(config)
+        if pool is None:
+            logger.info(f"Starting {workers} {backend.name} transcription workers with {backend_config['threads']} threads each")
+            # Spawn rather than fork, torch does not survive being forked after it has started threads
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_transcription_worker,
+                initargs=(backend.name, backend_config)
+            )
+            _transcription_pools[config] = pool
+    return pool
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+def warm_transcription_pool(backend, workers: int = TRANSCRIPTION_WORKERS):
+    """Start the pool workers and wait for them to load their models"""
+    pool = get_transcription_pool(backend, workers)
+    # Workers are started as tasks are submitted, and load their model before running any task
+    for future in [pool.submit(_worker_ready) for _ in range(workers)]:
+        future.result()
+    logger.info(f"Transcription pool ready with {workers} workers")
+
+def shutdown_transcription_pool():
+    """Stop the transcription workers"""
+    with _transcription_pools_lock:
+        pools = list(_transcription_pools.values())
+        _transcription_pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+atexit.register(shutdown_transcription_pool)
+
+def transcribe_chunked(samples: np.ndarray, backend, language: Optional[str],
+                       workers: int = TRANSCRIPTION_WORKERS, chunk_seconds: float = TRANSCRIPTION_CHUNK_SECONDS,
+                       overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS) -> Dict[str, Any]:
+    """
+    Transcribe audio by splitting it at silences into overlapping windows and transcribing the
+    windows in parallel across a pool of workers running the given backend.
+
+    Returns:
+        dict: A whisper-style result with 'text', 'segments' and 'language'.
+    """
+    windows = build_chunk_windows(find_silence_cut_points(samples, chunk_seconds), overlap_seconds)
+    logger.info(f"Transcribing {len(samples) / SAMPLE_RATE:.0f}s of audio in {len(windows)} chunks across {workers} workers")
+
+    pool = get_transcription_pool(backend, workers)
+    futures = []
+    for window_start, window_end, _, _ in windows:
+        chunk_samples = samples[int(window_start * SAMPLE_RATE):int(window_end * SAMPLE_RATE)]
+        futures.append(pool.submit(_transcribe_chunk, chunk_samples, language))
+
+    chunk_results = []
+    for (window_start, window_end, keep_start, keep_end), future in zip(windows, futures):
+        chunk_result = future.result()
+        chunk_result.update({'window_start': window_start, 'keep_start': keep_start, 'keep_end': keep_end})
+        chunk_results.append(chunk_result)
+
+    return stitch_chunk_results(chunk_results)
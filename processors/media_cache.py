@@ -0,0 +1,216 @@
+import os
+import shutil
+import fcntl
+import hashlib
+import logging
+import tempfile
+import requests
+from contextlib import contextmanager
+from typing import Optional, List, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Query params that change between shares of the same video but not the content
+IGNORED_QUERY_PARAMS = {'si', 'feature', 'pp', 't', 'start', 'ab_channel', 'fbclid', 'gclid'}
+
+def normalize_url(url: str) -> str:
+    """Canonicalize a video URL so the same video always maps to the same cache key"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    hostname = (parsed.hostname or '').lower()
+    if hostname.startswith('www.') or hostname.startswith('m.'):
+        hostname = hostname.split('.', 1)[1]
+
+    # YouTube serves the same video under several URL shapes
+    query = dict(parse_qsl(parsed.query))
+    if hostname == 'youtu.be':
+        return f"youtube:{parsed.path.strip('/')}"
+    if hostname == 'youtube.com':
+        if parsed.path == '/watch' and 'v' in query:
+            return f"youtube:{query['v']}"
+        if parsed.path.startswith('/shorts/') or parsed.path.startswith('/embed/'):
+            return f"youtube:{parsed.path.rstrip('/').split('/')[-1]}"
+
+    # Drop default ports, tracking params and the fragment, and sort what's left
+    netloc = hostname
+    if parsed.port and not ((scheme == 'http' and parsed.port == 80) or (scheme == 'https' and parsed.port == 443)):
+        netloc = f"{hostname}:{parsed.port}"
+    query_items = sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                         if key not in IGNORED_QUERY_PARAMS and not key.startswith('utm_'))
+    path = parsed.path or '/'
+
+    return urlunparse((scheme, netloc, path, '', urlencode(query_items), ''))
+
+def link_or_copy(src_path: str, dst_path: str) -> str:
+    """Hard link src to dst when both are on the same filesystem, otherwise copy"""
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copyfile(src_path, dst_path)
+    return dst_path
+
+class MediaCache:
+    """
+    On-disk LRU cache of downloaded media and extracted audio, shared by all workers on a host.
+
+    Entries are keyed by the kind of file ('media' or 'audio'), the normalized URL and a validator
+    (the ETag/Last-Modified of the source, or nothing when the URL itself pins the content, like a
+    YouTube video id). Inserts are written to a temp file and moved into place with an atomic
+    rename, and a per-key file lock stops two workers from filling the same entry at once. Reading an entry bumps its mtime, and the least recently used
+    entries are evicted when the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        if cache_dir is None:
+            cache_dir = os.getenv('MEDIA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'utom_media_cache'))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('MEDIA_CACHE_MAX_BYTES', 10 * 1024 ** 3))  # 10GB
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.locks_dir = os.path.join(cache_dir, 'locks')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+
+    def get_validator(self, url: str, s3_client=None) -> str:
+        """
+        Find a version marker for the content behind a URL, so a changed source gets a new key.
+
+        Uses the ETag/Last-Modified from a HEAD request (or head_object for S3). Pages handled by
+        yt-dlp don't expose one, for those the video id in the normalized URL is the version.
+        """
+        parsed = urlparse(url)
+        try:
+            if s3_client is not None:
+                bucket = parsed.netloc.split('.')[0]
+                key = parsed.path.lstrip('/')
+                head = s3_client.head_object(Bucket=bucket, Key=key)
+                return head.get('ETag', '').strip('"') or str(head.get('LastModified', ''))
+
+            if parsed.scheme in ('http', 'https') and not normalize_url(url).startswith('youtube:'):
+                response = requests.head(url, allow_redirects=True, timeout=10)
+                if response.ok:
+                    return response.headers.get('ETag') or response.headers.get('Last-Modified') or ''
+        except Exception as e:
+            logger.warning(f"Could not get cache validator for {url}: {str(e)}")
+        return ''
+
+    def _key(self, kind: str, url: str, validator: str = '') -> str:
+        return hashlib.sha256(f"{kind}|{normalize_url(url)}|{validator}".encode()).hexdigest()
+
+    def _entry_path(self, key: str, suffix: str = '') -> str:
+        return os.path.join(self.objects_dir, key[:2], key + suffix)
+
+    def _find_entry(self, key: str) -> Optional[str]:
+        entry_dir = os.path.join(self.objects_dir, key[:2])
+        if not os.path.isdir(entry_dir):
+            return None
+        for name in os.listdir(entry_dir):
+            if name.startswith(key):
+                return os.path.join(entry_dir, name)
+        return None
+
+    @contextmanager
+    def entry_lock(self, kind: str, url: str, validator: str = ''):
+        """Hold an exclusive lock on one cache entry, e.g. while checking for it and filling it"""
+        lock_path = os.path.join(self.locks_dir, self._key(kind, url, validator) + '.lock')
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, kind: str, url: str, validator: str = '', output_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Look up a cached file.
+
+        Returns:
+            str: A private hard link (or copy) of the cached file in output_dir that the caller may
+                delete, or None on a cache miss.
+        """
+        entry_path = self._find_entry(self._key(kind, url, validator))
+        if entry_path is None:
+            return None
+
+        try:
+            # Bump the mtime so the entry counts as recently used
+            os.utime(entry_path, None)
+            output_dir = output_dir or tempfile.gettempdir()
+            fd, output_path = tempfile.mkstemp(prefix=f"{kind}_", suffix=os.path.splitext(entry_path)[1], dir=output_dir)
+            os.close(fd)
+            os.remove(output_path)
+            link_or_copy(entry_path, output_path)
+        except FileNotFoundError:
+            # Evicted by another worker between the lookup and the link
+            return None
+
+        logger.info(f"Media cache hit for {kind} {url}")
+        return output_path
+
+    def put(self, kind: str, url: str, src_path: str, validator: str = '') -> str:
+        """
+        Insert a file into the cache with an atomic rename. src_path is left in place for the caller.
+
+        Returns:
+            str: The path of the cache entry.
+        """
+        key = self._key(kind, url, validator)
+        entry_path = self._entry_path(key, os.path.splitext(src_path)[1])
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        tmp_path = os.path.join(os.path.dirname(entry_path), f".tmp-{key}-{os.getpid()}")
+        try:
+            link_or_copy(src_path, tmp_path)
+            os.replace(tmp_path, entry_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict()
+        return entry_path
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        """Total bytes held by the cache"""
+        return sum(size for _, size, _ in self._list_entries())
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        with open(os.path.join(self.locks_dir, 'evict.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = sorted(self._list_entries())
+            total_bytes = sum(size for _, size, _ in entries)
+            freed_bytes = 0
+            for _, size, path in entries:
+                if total_bytes - freed_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    freed_bytes += size
+                except FileNotFoundError:
+                    pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        if freed_bytes:
+            logger.info(f"Evicted {freed_bytes} bytes from the media cache")
+        return freed_bytes
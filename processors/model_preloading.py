@@ -0,0 +1,28 @@
+import time
+import logging
+import dramatiq
+from typing import Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ModelPreloader(dramatiq.Middleware):
+    """
+    Load models once in each worker process as soon as it boots, so the first message doesn't pay
+    for it and processes that only enqueue (the API servers) never load them at all.
+
+    Example:
+        broker.add_middleware(ModelPreloader(load_transcription_model))
+    """
+    def __init__(self, *loaders: Callable[[], object]):
+        self.loaders = loaders
+
+    def after_worker_boot(self, broker, worker):
+        for loader in self.loaders:
+            start = time.time()
+            try:
+                loader()
+                logger.info(f"Preloaded {getattr(loader, '__name__', loader)} in {time.time() - start:.1f}s")
+            except Exception as e:
+                # The model is loaded again on first use, so the worker can still come up
+                logger.error(f"Failed to preload {getattr(loader, '__name__', loader)}: {str(e)}")
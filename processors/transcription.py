@@ -1,25 +1,81 @@
-import whisper
 import logging
-import torch
 import os
 from typing import Optional
+from utom_feature.processors.transcription_cache import cached_transcription
+from . import chunked_transcription
+from . import vad
+from .transcription_backends import get_transcription_backend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the model once as a global variable since it's expensive to load
-device = "cuda" if torch.cuda.is_available() else "cpu"
-logger.info(f"Using device: {device}")
+TRANSCRIPTION_LANGUAGE = "en"
 
-try:
-    model = whisper.load_model("base", device=device)
-    logger.info("Initialized Whisper model (base)")
-except Exception as e:
-    logger.error(f"Failed to load Whisper model: {str(e)}")
-    raise
+# The backend loads its model on first use (or when a worker boots, see load_transcription_model),
+# so importing this module stays cheap for processes that only enqueue jobs
+backend = get_transcription_backend()
 
-def transcribe_audio(audio_path: str) -> Optional[str]:
-    """Transcribe audio file and return transcription text"""
+def load_transcription_model():
+    """Load the transcription model, and start the chunked transcription workers when they are used"""
+    backend.load()
+    logger.info(f"Using transcription backend: {backend.name} ({backend.model_name})")
+    if backend.supports_process_pool and getattr(backend, "device", "cpu") != "cuda" \
+            and chunked_transcription.TRANSCRIPTION_WORKERS > 1:
+        chunked_transcription.warm_transcription_pool(backend)
+
+def _cache_options() -> dict:
+    """Everything besides the audio, model and language that changes the transcription"""
+    if not vad.VAD_ENABLED:
+        return backend.cache_options()
+    return dict(backend.cache_options(), vad={
+        "threshold_db": vad.VAD_THRESHOLD_DB,
+        "min_level_db": vad.VAD_MIN_LEVEL_DB,
+        "pad_seconds": vad.VAD_PAD_SECONDS,
+        "min_silence_seconds": vad.VAD_MIN_SILENCE_SECONDS,
+        "min_speech_seconds": vad.VAD_MIN_SPEECH_SECONDS,
+    })
+
+def _transcribe(audio_path: str) -> dict:
+    """
+    Run the transcription backend over the voiced parts of the file, split across the worker pool when they are
+    long enough to benefit. Segment timestamps are relative to the original audio.
+    """
+    samples = chunked_transcription.load_audio_samples(audio_path)
+    audio_seconds = len(samples) / chunked_transcription.SAMPLE_RATE
+
+    # Drop silences, hold music gaps and other non-speech stretches before transcribing
+    time_map = None
+    if vad.VAD_ENABLED:
+        samples, time_map = vad.build_speech_audio(samples, vad.detect_speech(samples))
+    speech_seconds = len(samples) / chunked_transcription.SAMPLE_RATE
+    vad_stats = {
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "saved_seconds": round(audio_seconds - speech_seconds, 2),
+    }
+    logger.info(f"Voice activity detection kept {speech_seconds:.1f}s of {audio_seconds:.1f}s of audio")
+
+    if speech_seconds == 0:
+        result = {"text": "", "segments": [], "language": TRANSCRIPTION_LANGUAGE}
+    elif backend.supports_process_pool and getattr(backend, "device", "cpu") != "cuda" \
+            and chunked_transcription.TRANSCRIPTION_WORKERS > 1 \
+            and speech_seconds > 2 * chunked_transcription.TRANSCRIPTION_CHUNK_SECONDS:
+        result = chunked_transcription.transcribe_chunked(samples, backend, TRANSCRIPTION_LANGUAGE)
+    else:
+        result = backend.transcribe(samples, TRANSCRIPTION_LANGUAGE)
+
+    if time_map:
+        vad.remap_transcription(result, time_map)
+    result["vad"] = vad_stats
+    return result
+
+def transcribe_audio(audio_path: str, stats: Optional[dict] = None) -> Optional[str]:
+    """
+    Transcribe audio file and return transcription text.
+
+    If a stats dict is passed it is filled in with the audio_seconds, speech_seconds and
+    saved_seconds of the voice activity detection pass.
+    """
     try:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
@@ -30,22 +86,26 @@ def transcribe_audio(audio_path: str) -> Optional[str]:
             
         logger.info(f"Starting transcription of audio file: {audio_path} ({file_size} bytes)")
         
-        # Transcribe with error handling
+        # Transcribe with error handling, reusing the cached result for audio we have seen before
         try:
-            result = model.transcribe(
+            result = cached_transcription(
                 audio_path,
-                language="en",
-                fp16=False,
-                task="transcribe",
-                verbose=False
+                backend.model_name,
+                TRANSCRIPTION_LANGUAGE,
+                _cache_options(),
+                lambda: _transcribe(audio_path),
+                is_cacheable=lambda result: bool(result and result.get("text", "").strip())
             )
         except Exception as e:
-            logger.error(f"Whisper transcription failed: {str(e)}")
+            logger.error(f"{backend.name} transcription failed: {str(e)}")
             raise
         
         # Validate and clean transcription
         if not result or "text" not in result:
             raise ValueError("Transcription result is invalid")
+
+        if stats is not None:
+            stats.update(result.get("vad", {}))
             
         transcription = result["text"].strip()
         if not transcription:
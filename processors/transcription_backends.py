@@ -0,0 +1,226 @@
+import io
+import os
+import wave
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from utom_feature.functions import llm_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+"""
+Transcription backends
+
+Each backend turns float32 16kHz mono samples into a whisper-style result dict with 'text',
+'segments' (each with 'start', 'end' and 'text') and 'language'. Models are loaded on the first
+call to load() or transcribe().
+
+    whisper         openai-whisper in PyTorch, fp32 on CPU
+    faster-whisper  CTranslate2 engine, int8 quantized on CPU by default
+    openai          The hosted whisper-1 API
+
+The backend is picked with TRANSCRIPTION_BACKEND and each one reads its own settings from the
+environment, see the constructors below.
+"""
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'whisper').lower()
+
+class TranscriptionBackend:
+    """Base class for transcription backends"""
+    name = None
+    # Whether chunks can be spread over a process pool with one copy of the backend per worker
+    supports_process_pool = True
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        self.model_name = model_name
+        self.threads = threads
+        self.model = None
+
+    def config(self) -> Dict[str, Any]:
+        """Constructor arguments for building the same backend in another process"""
+        return {'model_name': self.model_name, 'threads': self.threads}
+
+    def cache_options(self) -> Dict[str, Any]:
+        """Settings that change the output, these are part of the transcription cache key"""
+        return {'backend': self.name}
+
+    def load(self):
+        if self.model is None:
+            self.model = self._load_model()
+        return self.model
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper, on the GPU when there is one. WHISPER_THREADS sets the torch CPU threads."""
+    name = 'whisper'
+
+    def __init__(self, model_name: Optional[str] = None, threads: Optional[int] = None):
+        super().__init__(
+            model_name or os.getenv('WHISPER_MODEL', 'base'),
+            threads or int(os.getenv('WHISPER_THREADS', 0)) or None
+        )
+        self.device = None
+        self.decode_options = {'fp16': False, 'task': 'transcribe'}
+
+    def cache_options(self) -> Dict[str, Any]:
+        return dict(super().cache_options(), **self.decode_options)
+
+    def _load_model(self):
+        import torch
+        import whisper
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        model = whisper.load_model(self.model_name, device=self.device)
+        logger.info(f"Initialized Whisper model ({self.model_name}) on {self.device}")
+        return model
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        result = self.load().transcribe(samples, language=language, verbose=None, **self.decode_options)
+        return {
+            'text': result['text'],
+            'segments': [
+                {'id': segment['id'], 'start': float(segment['start']), 'end': float(segment['end']), 'text': segment['text']}
+                for segment in result['segments']
+            ],
+            'language': result.get('language'),
+        }
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper (CTranslate2). FASTER_WHISPER_COMPUTE_TYPE picks the quantization (int8 by
+    default) and FASTER_WHISPER_THREADS the CTranslate2 CPU threads.
+    """
+    name = 'faster-whisper'
+
+    def __init__(self, model_name: Optional[str] = None, threads: Optional[int] = None, compute_type: Optional[str] = None):
+        super().__init__(
+            model_name or os.getenv('FASTER_WHISPER_MODEL', 'base'),
+            threads or int(os.getenv('FASTER_WHISPER_THREADS', 0)) or None
+        )
+        self.compute_type = compute_type or os.getenv('FASTER_WHISPER_COMPUTE_TYPE', 'int8')
+        self.beam_size = int(os.getenv('FASTER_WHISPER_BEAM_SIZE', 5))
+
+    def config(self) -> Dict[str, Any]:
+        return dict(super().config(), compute_type=self.compute_type)
+
+    def cache_options(self) -> Dict[str, Any]:
+        return dict(super().cache_options(), compute_type=self.compute_type, beam_size=self.beam_size)
+
+    def _load_model(self):
+        from faster_whisper import WhisperModel
+
+        # cpu_threads=0 lets CTranslate2 pick
+        model = WhisperModel(self.model_name, device='cpu', compute_type=self.compute_type, cpu_threads=self.threads or 0)
+        logger.info(f"Initialized faster-whisper model ({self.model_name}, {self.compute_type})")
+        return model
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        segments, info = self.load().transcribe(samples, language=language, beam_size=self.beam_size)
+        # segments is a generator, decoding happens while it is consumed
+        segments = [
+            {'id': segment_id, 'start': float(segment.start), 'end': float(segment.end), 'text': segment.text}
+            for segment_id, segment in enumerate(segments)
+        ]
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language,
+        }
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """
+    The hosted whisper-1 API. Audio is uploaded as WAV in windows of OPENAI_TRANSCRIPTION_CHUNK_SECONDS
+    to stay under the upload size limit, OPENAI_TRANSCRIPTION_THREADS of them at a time.
+    """
+    name = 'openai'
+    supports_process_pool = False
+
+    def __init__(self, model_name: Optional[str] = None, threads: Optional[int] = None, client=None):
+        super().__init__(
+            model_name or 'whisper-1',
+            threads or int(os.getenv('OPENAI_TRANSCRIPTION_THREADS', 4))
+        )
+        # 16kHz 16-bit mono WAV is ~1.9MB a minute, 10 minutes stays well under the 25MB limit
+        self.chunk_seconds = float(os.getenv('OPENAI_TRANSCRIPTION_CHUNK_SECONDS', 600))
+        self.model = client
+
+    def _load_model(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        return llm_client.get_openai_client(api_key)
+
+    def _transcribe_window(self, samples: np.ndarray, language: Optional[str]) -> Dict[str, Any]:
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(SAMPLE_RATE)
+            wav_file.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+
+        request = {'model': self.model_name, 'file': ('audio.wav', wav_buffer.getvalue()), 'response_format': 'verbose_json'}
+        if language:
+            request['language'] = language
+        llm_client.wait_for_rate_limit(self.model_name)
+        response = self.load().audio.transcriptions.create(**request)
+
+        return {
+            'segments': [
+                {'start': float(segment.start), 'end': float(segment.end), 'text': segment.text}
+                for segment in (getattr(response, 'segments', None) or [])
+            ],
+            'language': getattr(response, 'language', None),
+        }
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        from .chunked_transcription import find_silence_cut_points, build_chunk_windows, stitch_chunk_results
+
+        windows = build_chunk_windows(find_silence_cut_points(samples, self.chunk_seconds))
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = [
+                executor.submit(self._transcribe_window, samples[int(window_start * SAMPLE_RATE):int(window_end * SAMPLE_RATE)], language)
+                for window_start, window_end, _, _ in windows
+            ]
+            chunk_results = []
+            for (window_start, _, keep_start, keep_end), future in zip(windows, futures):
+                chunk_result = future.result()
+                chunk_result.update({'window_start': window_start, 'keep_start': keep_start, 'keep_end': keep_end})
+                chunk_results.append(chunk_result)
+
+        return stitch_chunk_results(chunk_results)
+
+TRANSCRIPTION_BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+}
+
+def create_transcription_backend(name: str = TRANSCRIPTION_BACKEND, **kwargs) -> TranscriptionBackend:
+    """
+    Build a transcription backend by name.
+
+    Raises:
+        ValueError: If there is no backend with that name.
+    """
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}', expected one of {', '.join(TRANSCRIPTION_BACKENDS)}")
+    return TRANSCRIPTION_BACKENDS[name](**kwargs)
+
+_transcription_backend = None
+
+def get_transcription_backend() -> TranscriptionBackend:
+    """Get the process-wide backend configured by TRANSCRIPTION_BACKEND"""
+    global _transcription_backend
+    if _transcription_backend is None:
+        _transcription_backend = create_transcription_backend()
+    return _transcription_backend
@@ -0,0 +1,105 @@
+import os
+import logging
+import numpy as np
+from typing import List, Tuple, Dict, Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Voice activity detection settings
+VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+VAD_FRAME_SECONDS = 0.03
+# A frame counts as speech when it is this many dB above the noise floor (the quietest 10% of frames)
+VAD_THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', 12))
+# ...and above this absolute level, so digital silence doesn't make every sound look like speech
+VAD_MIN_LEVEL_DB = float(os.getenv('VAD_MIN_LEVEL_DB', -50))
+# Padding kept around speech so word onsets and endings aren't clipped
+VAD_PAD_SECONDS = float(os.getenv('VAD_PAD_SECONDS', 0.3))
+# Pauses shorter than this are kept, they are part of normal speech
+VAD_MIN_SILENCE_SECONDS = float(os.getenv('VAD_MIN_SILENCE_SECONDS', 1.0))
+# Bursts of sound shorter than this are dropped as clicks and noise
+VAD_MIN_SPEECH_SECONDS = float(os.getenv('VAD_MIN_SPEECH_SECONDS', 0.25))
+
+def frame_levels_db(samples: np.ndarray, frame_seconds: float = VAD_FRAME_SECONDS) -> np.ndarray:
+    """RMS level in dBFS of consecutive non-overlapping frames"""
+    frame_length = int(SAMPLE_RATE * frame_seconds)
+    num_frames = len(samples) // frame_length
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+def detect_speech(samples: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Find the voiced regions of some audio with an energy detector.
+
+    Args:
+        samples: float32 16kHz mono samples.
+
+    Returns:
+        list: (start, end) times in seconds of each speech region, in order and non-overlapping.
+    """
+    levels = frame_levels_db(samples)
+    if len(levels) == 0:
+        return []
+
+    threshold = max(np.percentile(levels, 10) + VAD_THRESHOLD_DB, VAD_MIN_LEVEL_DB)
+    is_speech = levels > threshold
+
+    # Run starts and ends from the edges of the boolean mask
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * VAD_FRAME_SECONDS
+    ends = np.flatnonzero(edges == -1) * VAD_FRAME_SECONDS
+    if len(starts) == 0:
+        return []
+
+    # Pad, then merge regions separated by short pauses
+    duration = len(samples) / SAMPLE_RATE
+    starts = np.maximum(starts - VAD_PAD_SECONDS, 0.0)
+    ends = np.minimum(ends + VAD_PAD_SECONDS, duration)
+    keep_gap = (starts[1:] - ends[:-1]) >= VAD_MIN_SILENCE_SECONDS
+    starts = starts[np.concatenate(([True], keep_gap))]
+    ends = ends[np.concatenate((keep_gap, [True]))]
+
+    long_enough = (ends - starts) >= VAD_MIN_SPEECH_SECONDS + 2 * VAD_PAD_SECONDS
+    return [(float(start), float(end)) for start, end in zip(starts[long_enough], ends[long_enough])]
+
+def build_speech_audio(samples: np.ndarray, speech_segments: List[Tuple[float, float]]) -> Tuple[np.ndarray, List[Tuple[float, float, float]]]:
+    """
+    Cut the speech regions out of the audio and join them.
+
+    Returns:
+        tuple: The speech-only samples, and a time map of (speech_start, original_start, duration)
+            entries for translating times in the speech-only audio back to the original.
+    """
+    pieces = []
+    time_map = []
+    speech_position = 0.0
+    for start, end in speech_segments:
+        piece = samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        pieces.append(piece)
+        time_map.append((speech_position, start, len(piece) / SAMPLE_RATE))
+        speech_position += len(piece) / SAMPLE_RATE
+
+    speech_samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=samples.dtype)
+    return speech_samples, time_map
+
+def to_original_time(speech_time: float, time_map: List[Tuple[float, float, float]], is_end: bool = False) -> float:
+    """
+    Translate a time in the speech-only audio to the original audio.
+
+    A time that falls exactly on the join of two regions belongs to the earlier region when it is
+    the end of something and to the later one when it is the start.
+    """
+    speech_starts = [entry[0] for entry in time_map]
+    index = int(np.searchsorted(speech_starts, speech_time, side='left' if is_end else 'right')) - 1
+    speech_start, original_start, duration = time_map[max(index, 0)]
+    return original_start + min(max(speech_time - speech_start, 0.0), duration)
+
+def remap_transcription(result: Dict[str, Any], time_map: List[Tuple[float, float, float]]) -> Dict[str, Any]:
+    """Move the segment timestamps of a whisper-style result from the speech-only audio to the original"""
+    for segment in result.get('segments', []):
+        segment['start'] = to_original_time(segment['start'], time_map)
+        segment['end'] = to_original_time(segment['end'], time_map, is_end=True)
+    return result
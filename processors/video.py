@@ -17,11 +17,30 @@ import json
 from bs4 import BeautifulSoup
 from .transcription import transcribe_audio
 from .action_points import extract_action_points
+from .media_cache import MediaCache, normalize_url
 import subprocess
+import hashlib
+import uuid
+import sys
+import wave
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Audio format produced for transcription: 16kHz mono signed 16-bit PCM
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_CHANNELS = 1
+AUDIO_SAMPLE_WIDTH = 2
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB
+# How long to wait for ffmpeg and the feeder thread to exit once a stream ends
+STREAM_EXIT_TIMEOUT_SECONDS = 10
+
+# We only need speech, so ask yt-dlp for an audio-only stream and only fall back to a muxed
+# audio+video format when the site has no audio-only format
+AUDIO_ONLY_DOWNLOADS = os.getenv('AUDIO_ONLY_DOWNLOADS', 'true').lower() in ('1', 'true', 'yes')
+AUDIO_ONLY_FORMAT = 'bestaudio[ext=m4a]/bestaudio/best[height<=480]/best'
+
 def create_temp_dir() -> str:
     """Create a temporary directory for processing files"""
     return tempfile.mkdtemp()
@@ -258,8 +277,84 @@ def download_with_requests(url: str, temp_dir: str) -> str:
     
     return video_path
 
-def download_video(url: str) -> str:
-    """Download video from URL using yt-dlp or direct download"""
+def probe_media(media_path: str) -> Dict[str, Any]:
+    """Read the container and stream info of a media file with ffprobe"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration:stream=codec_type,codec_name',
+        '-of', 'json',
+        media_path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True)
+    return json.loads(result.stdout)
+
+def validate_audio_stream(media_path: str) -> float:
+    """Check with ffprobe that a media file has an audio stream and a usable duration, returns the duration"""
+    if not os.path.exists(media_path) or os.path.getsize(media_path) == 0:
+        raise Exception(f"Media file is missing or empty: {media_path}")
+
+    try:
+        media_info = probe_media(media_path)
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"ffprobe could not read media file: {e.stderr.decode(errors='ignore').strip()}")
+
+    if not any(stream.get('codec_type') == 'audio' for stream in media_info.get('streams', [])):
+        raise Exception("No audio stream found in media file")
+
+    duration = float(media_info.get('format', {}).get('duration') or 0)
+    if duration < 0.1:
+        raise Exception("Invalid media duration")
+
+    return duration
+
+def download_audio_only(url: str, temp_dir: str) -> str:
+    """Download just the audio stream of a video with yt-dlp, skipping the video stream and the mp4 remux"""
+    timestamp = int(time.time())
+    ydl_opts = {
+        'format': AUDIO_ONLY_FORMAT,
+        'outtmpl': os.path.join(temp_dir, f"audio_{timestamp}.%(ext)s"),
+        'quiet': True,
+        'no_warnings': True,
+        'socket_timeout': 60,
+        'retries': 5,
+        'fragment_retries': 5,
+        'http_chunk_size': 5242880,  # 5MB chunks
+        'extractor_retries': 5,
+        'file_access_retries': 5,
+        'hls_prefer_native': True,
+        'noprogress': True,
+        'concurrent_fragments': 3,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': '*/*',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Connection': 'keep-alive',
+        }
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        logger.info("Attempting audio-only download with yt-dlp...")
+        info = ydl.extract_info(url, download=True)
+        media_path = ydl.prepare_filename(info)
+
+    try:
+        validate_audio_stream(media_path)
+    except Exception as e:
+        logger.error(f"Invalid audio file: {str(e)}")
+        if os.path.exists(media_path):
+            os.remove(media_path)
+        raise
+
+    logger.info(f"Downloaded {info.get('format_id')} ({info.get('acodec')}/{info.get('vcodec')}): {os.path.getsize(media_path)} bytes")
+    return media_path
+
+def download_video(url: str, audio_only: bool = AUDIO_ONLY_DOWNLOADS) -> str:
+    """
+    Download video from URL using yt-dlp or direct download.
+
+    With audio_only the returned file may be an audio-only container (m4a/webm), which
+    extract_audio() handles the same way as a video file.
+    """
     temp_dir = create_temp_dir()
     max_retries = 3
     last_error = None
@@ -286,6 +381,9 @@ def download_video(url: str) -> str:
             
             # Try yt-dlp first (works for most video platforms)
             try:
+                if audio_only:
+                    return download_audio_only(url, temp_dir)
+
                 timestamp = int(time.time())
                 video_path = os.path.join(temp_dir, f"video_{timestamp}.mp4")
                 ydl_opts = {
@@ -332,11 +430,7 @@ def download_video(url: str) -> str:
                     if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
                         # Validate video file
                         try:
-                            with VideoFileClip(video_path) as video:
-                                if video.duration < 0.1:
-                                    raise Exception("Invalid video duration")
-                                if not video.audio:
-                                    raise Exception("No audio stream found in video")
+                            validate_audio_stream(video_path)
                             return video_path
                         except Exception as e:
                             logger.error(f"Invalid video file: {str(e)}")
@@ -372,11 +466,7 @@ def download_video(url: str) -> str:
                     if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
                         # Validate video file
                         try:
-                            with VideoFileClip(video_path) as video:
-                                if video.duration < 0.1:
-                                    raise Exception("Invalid video duration")
-                                if not video.audio:
-                                    raise Exception("No audio stream found in video")
+                            validate_audio_stream(video_path)
                             return video_path
                         except Exception as e:
                             logger.error(f"Invalid video file: {str(e)}")
@@ -414,7 +504,7 @@ def is_loom_url(url: str) -> bool:
     return 'loom.com' in parsed_url.hostname if parsed_url.hostname else False
 
 def extract_audio(video_path: str) -> str:
-    """Extract audio from video file and return path to audio file"""
+    """Extract a 16kHz mono WAV from a video or audio file and return path to audio file"""
     try:
         logger.info(f"Extracting audio from {video_path}")
         
@@ -426,21 +516,27 @@ def extract_audio(video_path: str) -> str:
         
         if file_size == 0:
             raise Exception("Video file is empty")
-            
-        video = VideoFileClip(video_path)
-        if video is None:
-            raise Exception("Failed to load video file")
-            
-        if not video.audio:
-            raise Exception("No audio stream found in video")
+
+        # Validate with ffprobe rather than decoding the whole file with moviepy
+        validate_audio_stream(video_path)
             
         # Create a temporary directory for the audio file
         temp_dir = create_temp_dir()
         audio_path = os.path.join(temp_dir, "audio.wav")
         
-        # Disable audio playback during extraction
-        video.audio.write_audiofile(audio_path, verbose=False, logger=None)
-        video.close()
+        cmd = [
+            'ffmpeg', '-i', video_path,
+            '-vn',  # No video
+            '-acodec', 'pcm_s16le',  # PCM format
+            '-ar', str(AUDIO_SAMPLE_RATE),  # 16kHz sample rate
+            '-ac', str(AUDIO_CHANNELS),  # Mono audio
+            '-y',  # Overwrite output file
+            audio_path
+        ]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"ffmpeg failed to extract audio: {e.stderr.decode(errors='ignore').strip()}")
         
         if not os.path.exists(audio_path):
             raise Exception("Failed to create audio file")
@@ -531,8 +627,18 @@ def process_video(video_url: str) -> dict:
                 logger.warning(f"Failed to clean up temporary file {file_path}: {str(e)}")
 
 class VideoProcessor:
-    def __init__(self):
+    def __init__(self, streaming: Optional[bool] = None, audio_only: Optional[bool] = None, media_cache: Optional[MediaCache] = None):
         self.temp_dir = tempfile.gettempdir()
+        # In streaming mode the video is piped straight into ffmpeg and never written to disk
+        if streaming is None:
+            streaming = os.getenv('VIDEO_STREAMING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.streaming = streaming
+        # Only fetch the audio stream from sites that offer one, see AUDIO_ONLY_FORMAT
+        self.audio_only = AUDIO_ONLY_DOWNLOADS if audio_only is None else audio_only
+        # Downloads and extracted audio are shared between jobs on this host unless disabled
+        if media_cache is None and os.getenv('MEDIA_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+            media_cache = MediaCache()
+        self.media_cache = media_cache
         
     def _is_s3_url(self, url: str) -> bool:
         """Check if the URL is an S3 URL."""
@@ -648,14 +754,45 @@ class VideoProcessor:
             logger.error(f"Error downloading from S3: {str(e)}")
             return False
 
-    def download_video(self, url: str, max_attempts: int = 3) -> Optional[str]:
+    def _get_cache_validator(self, url: str) -> str:
+        """Get the ETag/Last-Modified used to key this URL in the media cache"""
+        s3_client = None
+        if self._is_s3_url(url):
+            try:
+                s3_client = self._get_s3_client()
+            except Exception as e:
+                logger.warning(f"Could not create S3 client for cache validation: {str(e)}")
+        return self.media_cache.get_validator(url, s3_client)
+
+    def download_video(self, url: str, max_attempts: int = 3, cache_validator: Optional[str] = None) -> Optional[str]:
+        """Download video from URL with support for S3, reusing the media cache when enabled."""
+        if self.media_cache is None:
+            return self._download_video(url, max_attempts)
+
+        if cache_validator is None:
+            cache_validator = self._get_cache_validator(url)
+
+        with self.media_cache.entry_lock('media', url, cache_validator):
+            video_path = self.media_cache.get('media', url, cache_validator, self.temp_dir)
+            if video_path:
+                return video_path
+
+            video_path = self._download_video(url, max_attempts)
+            if video_path and os.path.exists(video_path):
+                try:
+                    self.media_cache.put('media', url, video_path, cache_validator)
+                except Exception as e:
+                    logger.warning(f"Could not add video to the media cache: {str(e)}")
+            return video_path
+
+    def _download_video(self, url: str, max_attempts: int = 3) -> Optional[str]:
         """Download video from URL with support for S3."""
         logger.info(f"Step 1: Downloading video...")
         logger.info(f"Downloading video from {url} (attempt 1/{max_attempts})")
         
-        # Create a unique filename
-        video_id = str(hash(url))[-8:]
-        output_path = os.path.join(self.temp_dir, f"video_{video_id}.mp4")
+        # Create a unique filename, stable per video but never shared between two downloads
+        video_id = hashlib.sha256(normalize_url(url).encode()).hexdigest()[:12]
+        output_path = os.path.join(self.temp_dir, f"video_{video_id}_{uuid.uuid4().hex[:8]}.mp4")
         
         # Handle S3 URLs differently
         if self._is_s3_url(url):
@@ -690,11 +827,12 @@ class VideoProcessor:
                     logger.error(f"Fallback download failed: {str(e)}")
                     return None
         else:
-            # Use regular yt-dlp for non-S3 URLs
+            # Use regular yt-dlp for non-S3 URLs. The extension comes from the format yt-dlp picks,
+            # an audio-only download is an m4a or webm rather than an mp4
             logger.info("Attempting download with yt-dlp...")
             ydl_opts = {
-                'format': 'best',
-                'outtmpl': output_path,
+                'format': AUDIO_ONLY_FORMAT if self.audio_only else 'best',
+                'outtmpl': os.path.splitext(output_path)[0] + '.%(ext)s',
                 'quiet': True,
                 'no_warnings': True,
                 'extract_flat': False,
@@ -710,12 +848,18 @@ class VideoProcessor:
             }
             
             for attempt in range(max_attempts):
+                media_path = None
                 try:
                     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([url])
-                    return output_path
+                        info = ydl.extract_info(url, download=True)
+                        media_path = ydl.prepare_filename(info)
+                    # Never hand back (or cache) a truncated file or one without audio
+                    validate_audio_stream(media_path)
+                    return media_path
                 except Exception as e:
                     logger.error(f"Download attempt {attempt + 1} failed: {str(e)}")
+                    if media_path and os.path.exists(media_path):
+                        os.remove(media_path)
                     if attempt < max_attempts - 1:
                         logger.info(f"Retrying download... (attempt {attempt + 2}/{max_attempts})")
                     else:
@@ -760,25 +904,234 @@ class VideoProcessor:
             logger.error(f"Unexpected error extracting audio: {str(e)}")
             return None
 
-    def cleanup(self, video_path: str, audio_path: str) -> None:
+    def _get_s3_client(self):
+        """Create an S3 client from environment credentials, falling back to the default chain."""
+        import boto3
+
+        aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
+        aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+        aws_region = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+        if aws_access_key_id and aws_secret_access_key:
+            return boto3.client('s3',
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=aws_region
+            )
+        return boto3.client('s3', region_name=aws_region)
+
+    def _iter_source_chunks(self, url: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        """Yield the raw media bytes for a URL from S3, a direct HTTP download or yt-dlp."""
+        if self._is_s3_url(url):
+            parsed_url = urlparse(url)
+            bucket = parsed_url.netloc.split('.')[0]
+            key = parsed_url.path.lstrip('/')
+            body = self._get_s3_client().get_object(Bucket=bucket, Key=key)['Body']
+            try:
+                for chunk in body.iter_chunks(chunk_size):
+                    yield chunk
+            finally:
+                body.close()
+
+        elif re.search(r'\.(mp4|webm|mov|m4a|mp3|wav)(\?.*)?$', url, re.I):
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': '*/*',
+                'Connection': 'keep-alive',
+            }
+            with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        yield chunk
+
+        else:
+            # yt-dlp writes the media to stdout when the output template is '-'
+            cmd = [
+                sys.executable, '-m', 'yt_dlp',
+                '--quiet', '--no-warnings',
+                '--socket-timeout', '30',
+                '--retries', '3',
+                '-f', AUDIO_ONLY_FORMAT if self.audio_only else 'best',
+                '-o', '-',
+                url
+            ]
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                while True:
+                    chunk = process.stdout.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                return_code = process.wait()
+                stderr = process.stderr.read().decode(errors='ignore')
+                process.stderr.close()
+            if return_code != 0:
+                raise Exception(f"yt-dlp streaming failed: {stderr.strip()}")
+
+    def stream_audio(self, url: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Stream a video URL through ffmpeg and yield 16kHz mono PCM (s16le) bytes as they are decoded.
+
+        The source bytes are fed to ffmpeg's stdin from a background thread, so neither the video nor
+        the audio ever has to be written to disk. Containers that need seeking to be decoded (e.g. an
+        MP4 with its index at the end) cannot be read from a pipe, in which case an exception is raised
+        and callers should fall back to download_video().
+        """
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-vn',  # No video
+            '-acodec', 'pcm_s16le',  # PCM format
+            '-ar', str(AUDIO_SAMPLE_RATE),  # 16kHz sample rate
+            '-ac', str(AUDIO_CHANNELS),  # Mono audio
+            '-f', 's16le',
+            'pipe:1'
+        ]
+        ffmpeg_process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        feed_errors = []
+
+        def feed_ffmpeg():
+            try:
+                for chunk in self._iter_source_chunks(url, chunk_size):
+                    ffmpeg_process.stdin.write(chunk)
+            except BrokenPipeError:
+                # ffmpeg exited early, its return code tells us why
+                pass
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                try:
+                    ffmpeg_process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        # Drain stderr in the background so ffmpeg never blocks on a full pipe
+        stderr_chunks = []
+        stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(ffmpeg_process.stderr.read()), daemon=True)
+        feeder_thread = threading.Thread(target=feed_ffmpeg, daemon=True)
+        stderr_thread.start()
+        feeder_thread.start()
+
+        decoded = False
+        try:
+            while True:
+                pcm_chunk = ffmpeg_process.stdout.read(chunk_size)
+                if not pcm_chunk:
+                    break
+                yield pcm_chunk
+            decoded = True
+        finally:
+            # Stop ffmpeg if the consumer stopped early or failed, otherwise it is exiting on its own
+            if not decoded and ffmpeg_process.poll() is None:
+                ffmpeg_process.kill()
+            try:
+                return_code = ffmpeg_process.wait(timeout=STREAM_EXIT_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                ffmpeg_process.kill()
+                return_code = ffmpeg_process.wait()
+            # With ffmpeg gone the feeder's next write fails, but it may still be waiting on the source
+            feeder_thread.join(timeout=STREAM_EXIT_TIMEOUT_SECONDS)
+            stderr_thread.join()
+            ffmpeg_process.stdout.close()
+
+        if feed_errors:
+            raise Exception(f"Failed to stream video: {str(feed_errors[0])}")
+        if return_code != 0:
+            stderr = b''.join(stderr_chunks).decode(errors='ignore')
+            raise Exception(f"ffmpeg failed to decode the stream: {stderr.strip()}")
+
+    def stream_audio_to_file(self, url: str) -> Optional[str]:
+        """Spool the streamed PCM from stream_audio() into a 16kHz mono WAV file and return its path."""
+        logger.info(f"Streaming audio from {url}")
+        fd, audio_path = tempfile.mkstemp(prefix='audio_', suffix='.wav', dir=self.temp_dir)
+        os.close(fd)
+
+        try:
+            start_time = time.time()
+            first_sample_time = None
+            with wave.open(audio_path, 'wb') as wav_file:
+                wav_file.setnchannels(AUDIO_CHANNELS)
+                wav_file.setsampwidth(AUDIO_SAMPLE_WIDTH)
+                wav_file.setframerate(AUDIO_SAMPLE_RATE)
+                for pcm_chunk in self.stream_audio(url):
+                    if first_sample_time is None:
+                        first_sample_time = time.time() - start_time
+                    wav_file.writeframes(pcm_chunk)
+
+            if first_sample_time is None:
+                raise Exception("Stream produced no audio")
+
+            audio_size = os.path.getsize(audio_path)
+            logger.info(f"Streamed audio file size: {audio_size} bytes (first audio after {first_sample_time:.2f}s)")
+            return audio_path
+        except Exception as e:
+            logger.error(f"Error streaming audio: {str(e)}")
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+            return None
+
+    def cleanup(self, video_path: Optional[str], audio_path: Optional[str]) -> None:
         """Clean up temporary files."""
         try:
-            if os.path.exists(video_path):
+            if video_path and os.path.exists(video_path):
                 os.remove(video_path)
-            if os.path.exists(audio_path):
+            if audio_path and os.path.exists(audio_path):
                 os.remove(audio_path)
             logger.info("Cleaned up temporary files")
         except Exception as e:
             logger.error(f"Error cleaning up files: {str(e)}")
 
     def process_video(self, url: str) -> Dict[str, Any]:
+        """Process video and return results, reusing cached audio for a URL seen before."""
+        if self.media_cache is None:
+            return self._process_video(url)
+
+        try:
+            cache_validator = self._get_cache_validator(url)
+            with self.media_cache.entry_lock('audio', url, cache_validator):
+                audio_path = self.media_cache.get('audio', url, cache_validator, self.temp_dir)
+                if audio_path:
+                    return {
+                        "video_path": None,
+                        "audio_path": audio_path,
+                        "success": True
+                    }
+
+                result = self._process_video(url, cache_validator)
+                if result.get("success"):
+                    try:
+                        self.media_cache.put('audio', url, result["audio_path"], cache_validator)
+                    except Exception as e:
+                        logger.warning(f"Could not add audio to the media cache: {str(e)}")
+                return result
+        except Exception as e:
+            logger.error(f"Error processing video: {str(e)}")
+            return {"error": str(e), "success": False}
+
+    def _process_video(self, url: str, cache_validator: Optional[str] = None) -> Dict[str, Any]:
         """Process video and return results."""
         video_path = None
         audio_path = None
         
         try:
+            # Stream the audio straight out of the source when enabled
+            if self.streaming:
+                audio_path = self.stream_audio_to_file(url)
+                if audio_path:
+                    return {
+                        "video_path": None,
+                        "audio_path": audio_path,
+                        "success": True
+                    }
+                logger.info("Streaming failed, falling back to downloading the video")
+
             # Download video
-            video_path = self.download_video(url)
+            video_path = self.download_video(url, cache_validator=cache_validator)
             if not video_path:
                 return {"error": "Failed to download video", "success": False}
             
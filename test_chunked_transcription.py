@@ -0,0 +1,76 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from processors import chunked_transcription
+from processors.chunked_transcription import (
+    SAMPLE_RATE, find_silence_cut_points, build_chunk_windows, stitch_chunk_results
+)
+
+def make_audio(seconds, silences):
+    """Noise with silent gaps at the given (start, end) times"""
+    samples = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    for start, end in silences:
+        samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0
+    return samples
+
+def test_cuts_land_in_silence():
+    """Each cut moves back from the target boundary to the nearest quiet stretch"""
+    samples = make_audio(100, silences=[(25, 26), (52, 53)])
+    cut_points = find_silence_cut_points(samples, chunk_seconds=30, search_seconds=10)
+
+    assert cut_points[0] == 0.0
+    assert cut_points[-1] == 100.0
+    assert 25 <= cut_points[1] < 26
+    assert 52 <= cut_points[2] < 53
+    assert all(b - a <= 30 for a, b in zip(cut_points, cut_points[1:]))
+
+def test_short_audio_is_one_chunk():
+    assert find_silence_cut_points(make_audio(10, []), chunk_seconds=30) == [0.0, 10.0]
+
+def test_windows_overlap_and_stay_in_bounds():
+    windows = build_chunk_windows([0.0, 30.0, 60.0, 70.0], overlap_seconds=5)
+    assert windows == [(0.0, 35.0, 0.0, 30.0), (25.0, 65.0, 30.0, 60.0), (55.0, 70.0, 60.0, 70.0)]
+
+def test_stitch_deduplicates_overlaps_and_offsets_timestamps():
+    """A segment seen by both neighbouring windows is only kept once, at its absolute time"""
+    chunk_results = [
+        {'window_start': 0.0, 'keep_start': 0.0, 'keep_end': 30.0, 'language': 'en', 'segments': [
+            {'start': 0.0, 'end': 10.0, 'text': ' one'},
+            {'start': 27.0, 'end': 31.0, 'text': ' two'},
+            {'start': 31.0, 'end': 34.0, 'text': ' three'},
+        ]},
+        {'window_start': 25.0, 'keep_start': 30.0, 'keep_end': 60.0, 'language': 'en', 'segments': [
+            {'start': 2.0, 'end': 6.0, 'text': ' two'},
+            {'start': 6.0, 'end': 9.0, 'text': ' three'},
+            {'start': 20.0, 'end': 25.0, 'text': ' four'},
+        ]},
+    ]
+    result = stitch_chunk_results(chunk_results)
+
+    assert result['text'] == 'one two three four'
+    assert [(s['start'], s['end']) for s in result['segments']] == [(0.0, 10.0), (27.0, 31.0), (31.0, 34.0), (45.0, 50.0)]
+    assert [s['id'] for s in result['segments']] == [0, 1, 2, 3]
+    assert result['language'] == 'en'
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def config(self):
+        return {'model_name': self.model_name, 'threads': 1}
+
+def test_pool_is_shared_between_threads_and_kept_when_the_config_changes():
+    """Concurrent callers get one pool, and a pool for a new config doesn't shut down the old one"""
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pools = list(executor.map(lambda _: chunked_transcription.get_transcription_pool(FakeBackend('base'), 2), range(32)))
+        assert len({id(pool) for pool in pools}) == 1
+
+        other_pool = chunked_transcription.get_transcription_pool(FakeBackend('small'), 2)
+        assert other_pool is not pools[0]
+        assert chunked_transcription.get_transcription_pool(FakeBackend('base'), 2) is pools[0]
+        assert not pools[0]._shutdown_thread
+    finally:
+        chunked_transcription.shutdown_transcription_pool()
+    assert pools[0]._shutdown_thread and other_pool._shutdown_thread
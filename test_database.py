@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from database import init_db, configure_sqlite_engine
+from models import ProcessingJob
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine on a SQLite file, configured like the app's engine"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    configure_sqlite_engine(engine, wal=True)
+    yield engine
+    engine.dispose()
+
+def test_init_db_keeps_existing_jobs(engine):
+    """Running init_db at every start doesn't wipe the jobs table"""
+    init_db(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(ProcessingJob(video_url="https://example.com/a.mp4"))
+        db.commit()
+
+    init_db(bind=engine)
+
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(ProcessingJob).count() == 1
+
+def test_init_db_adds_missing_indexes_to_an_existing_table(engine):
+    """A table created before the status and created_at indexes were declared gets them"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE processing_jobs (id INTEGER PRIMARY KEY, video_url VARCHAR NOT NULL, webhook_url VARCHAR, "
+            "status VARCHAR NOT NULL, transcription TEXT, action_points TEXT, error_message TEXT, "
+            "created_at DATETIME, started_at DATETIME, completed_at DATETIME)"
+        ))
+
+    init_db(bind=engine)
+
+    indexed_columns = {tuple(index["column_names"]) for index in inspect(engine).get_indexes("processing_jobs")}
+    assert {("status",), ("created_at",)} <= indexed_columns
+    with engine.connect() as connection:
+        plan = connection.execute(text("EXPLAIN QUERY PLAN SELECT id FROM processing_jobs WHERE status = 'pending'")).fetchall()
+    assert "ix_processing_jobs_status" in str(plan)
+
+def test_sqlite_connections_use_wal(engine):
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # 1 is NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import ProcessingJob
+from job_repository import validate_batch_urls, create_jobs, transition_job, mark_job_processing, mark_job_completed, mark_job_failed
+
+@pytest.fixture
+def db():
+    """Session on an in-memory SQLite database"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def test_create_jobs_with_one_commit(db):
+    """A batch is inserted and committed once and the ids come back in URL order"""
+    commits = []
+    event.listen(db, 'after_commit', lambda session: commits.append(1))
+    video_urls = [f"https://example.com/video_{i}.mp4" for i in range(50)]
+
+    job_ids = create_jobs(db, video_urls, webhook_url="https://example.com/hook")
+
+    assert len(commits) == 1
+    assert len(set(job_ids)) == 50
+    jobs = {job.id: job for job in db.query(ProcessingJob).all()}
+    assert [jobs[job_id].video_url for job_id in job_ids] == video_urls
+    assert all(job.status == "pending" and job.webhook_url == "https://example.com/hook" for job in jobs.values())
+
+def test_validate_batch_urls(monkeypatch):
+    assert validate_batch_urls([' https://example.com/a.mp4 ']) == ['https://example.com/a.mp4']
+    for video_urls in (None, [], ['https://example.com/a.mp4', ''], [42]):
+        with pytest.raises(ValueError):
+            validate_batch_urls(video_urls)
+
+    monkeypatch.setattr('job_repository.MAX_BATCH_SIZE', 2)
+    with pytest.raises(ValueError):
+        validate_batch_urls(['a', 'b', 'c'])
+
+def test_transition_is_a_single_update(db):
+    """Moving a job issues one UPDATE and no SELECT, and sets the timestamps"""
+    job_id = create_jobs(db, ["https://example.com/a.mp4"])[0]
+    statements = []
+    event.listen(db.get_bind(), 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert mark_job_processing(db, job_id) == 1
+    assert mark_job_completed(db, job_id, "hello", "[]") == 1
+
+    assert [statement.split()[0] for statement in statements] == ["UPDATE", "UPDATE"]
+    job = db.get(ProcessingJob, job_id)
+    assert job.status == "completed" and job.transcription == "hello"
+    assert job.started_at is not None and job.completed_at >= job.started_at
+
+def test_status_model_is_enforced(db):
+    pending_id, finished_id = create_jobs(db, ["https://example.com/a.mp4", "https://example.com/b.mp4"])
+
+    # A job has to be processing before it can complete
+    assert mark_job_completed(db, pending_id, "hello", "[]") == 0
+    # A completed job never changes again
+    mark_job_processing(db, finished_id)
+    mark_job_completed(db, finished_id, "hello", "[]")
+    assert mark_job_failed(db, finished_id, "late error") == 0
+    assert mark_job_processing(db, finished_id) == 0
+    # A failed job can be retried
+    assert mark_job_failed(db, pending_id, "boom") == 1
+    assert mark_job_processing(db, pending_id) == 1
+
+    assert mark_job_processing(db, 12345) == 0
+    with pytest.raises(ValueError):
+        transition_job(db, pending_id, "pending")
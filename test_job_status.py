@@ -0,0 +1,53 @@
+import json
+import threading
+import time
+import fakeredis
+import pytest
+from job_status import publish_job_status, stream_job_status
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+def parse_events(chunks):
+    return [json.loads(chunk[len("data: "):]) for chunk in chunks if chunk.startswith("data: ")]
+
+def test_stream_sends_stored_status_then_published_transitions(client):
+    """The stream starts with the database status and ends at the first terminal status"""
+    stream = stream_job_status(1, lambda job_id: {"job_id": job_id, "status": "pending", "error": None},
+                               client=client, heartbeat_seconds=0.05, timeout_seconds=5)
+    chunks = [next(stream)]
+
+    def publish():
+        time.sleep(0.1)
+        publish_job_status(1, "processing", client=client)
+        publish_job_status(2, "completed", client=client)
+        publish_job_status(1, "failed", error="boom", client=client)
+
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    chunks.extend(stream)
+    publisher.join()
+
+    assert [event["status"] for event in parse_events(chunks)] == ["pending", "processing", "failed"]
+    assert parse_events(chunks)[-1]["error"] == "boom"
+    # Nothing was published for the first 100ms, so heartbeats kept the connection alive
+    assert ": heartbeat\n\n" in chunks
+
+def test_stream_of_finished_job_ends_without_waiting(client):
+    chunks = list(stream_job_status(1, lambda job_id: {"job_id": job_id, "status": "completed", "error": None}, client=client))
+
+    assert parse_events(chunks) == [{"job_id": 1, "status": "completed", "error": None}]
+    assert client.pubsub_numsub("job_status:1") == [(b"job_status:1", 0)]
+
+def test_stream_of_missing_job(client):
+    chunks = list(stream_job_status(1, lambda job_id: None, client=client))
+
+    assert chunks[0].startswith("event: job_not_found\n")
+
+def test_publish_failure_does_not_raise():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = fakeredis.FakeRedis(server=server)
+
+    assert publish_job_status(1, "processing", client=client) == 0
@@ -0,0 +1,45 @@
+import os
+import pytest
+from processors.media_cache import MediaCache, normalize_url
+
+@pytest.fixture
+def media_cache(tmp_path):
+    return MediaCache(cache_dir=str(tmp_path / 'cache'), max_bytes=100)
+
+def write_file(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return str(path)
+
+def test_normalize_url():
+    """Different shares of the same video map to the same key"""
+    assert normalize_url('https://youtu.be/abc123?si=xyz') == 'youtube:abc123'
+    assert normalize_url('https://www.youtube.com/watch?v=abc123&t=30') == 'youtube:abc123'
+    assert normalize_url('HTTPS://Example.com:443/video.mp4?b=2&a=1&utm_source=x#frag') == \
+        normalize_url('https://example.com/video.mp4?a=1&b=2')
+
+def test_put_and_get(media_cache, tmp_path):
+    """Cached files come back as private copies that can be deleted without touching the cache"""
+    src_path = write_file(tmp_path / 'audio.wav', 10)
+    media_cache.put('audio', 'https://example.com/a.mp4', src_path, validator='etag-1')
+    os.remove(src_path)
+
+    cached_path = media_cache.get('audio', 'https://example.com/a.mp4', validator='etag-1', output_dir=str(tmp_path))
+    assert cached_path is not None
+    os.remove(cached_path)
+
+    assert media_cache.get('audio', 'https://example.com/a.mp4', validator='etag-1', output_dir=str(tmp_path)) is not None
+    assert media_cache.get('audio', 'https://example.com/a.mp4', validator='etag-2', output_dir=str(tmp_path)) is None
+    assert media_cache.get('media', 'https://example.com/a.mp4', validator='etag-1', output_dir=str(tmp_path)) is None
+
+def test_lru_eviction(media_cache, tmp_path):
+    """The least recently used entries are evicted once the cache is over its size cap"""
+    for name in ['a', 'b', 'c']:
+        media_cache.put('media', f'https://example.com/{name}.mp4', write_file(tmp_path / f'{name}.mp4', 40))
+        # Age 'b' so it is the least recently used entry when 'c' is added
+        if name == 'b':
+            os.utime(media_cache._find_entry(media_cache._key('media', 'https://example.com/b.mp4')), (0, 0))
+
+    assert media_cache.size() <= 100
+    assert media_cache.get('media', 'https://example.com/b.mp4', output_dir=str(tmp_path)) is None
+    assert media_cache.get('media', 'https://example.com/c.mp4', output_dir=str(tmp_path)) is not None
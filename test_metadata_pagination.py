@@ -0,0 +1,81 @@
+import json
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+import mongodb_utils
+
+class FakeCursor:
+    """The part of a pymongo cursor the metadata functions use"""
+    def __init__(self, documents):
+        self.documents = documents
+        self.closed = False
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.documents = self.documents[:limit]
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self.documents)
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        documents = [document for document in self.documents if '_id' not in query or document['_id'] > query['_id']['$gt']]
+        if projection:
+            documents = [{key: value for key, value in document.items() if key == '_id' or key in projection} for document in documents]
+        return FakeCursor([dict(document) for document in documents])
+
+@pytest.fixture
+def collection():
+    documents = [
+        {'_id': ObjectId(), 'video_id': f'video_{i}', 'status': 'processed', 'features': {'transcription': 'x' * 1000}}
+        for i in range(25)
+    ]
+    collection = FakeCollection(documents)
+    with patch.object(mongodb_utils, 'get_metadata_collection', return_value=collection):
+        yield collection
+
+def test_pages_follow_the_cursor_to_the_end(collection):
+    """Each page starts after the last _id of the previous one, without the features field"""
+    video_ids = []
+    after = None
+    pages = 0
+    while True:
+        page = mongodb_utils.get_video_metadata_page(after=after, limit=10)
+        video_ids.extend(metadata['video_id'] for metadata in page['metadata'])
+        assert all('features' not in metadata for metadata in page['metadata'])
+        pages += 1
+        after = page['next_cursor']
+        if after is None:
+            break
+
+    assert pages == 3
+    assert video_ids == [f'video_{i}' for i in range(25)]
+    assert collection.queries[1][0] == {'_id': {'$gt': collection.documents[9]['_id']}}
+
+def test_invalid_page_arguments(collection):
+    with pytest.raises(ValueError):
+        mongodb_utils.get_video_metadata_page(after='not-an-object-id')
+    with pytest.raises(ValueError):
+        mongodb_utils.get_video_metadata_page(limit=mongodb_utils.MAX_METADATA_PAGE_SIZE + 1)
+
+def test_ndjson_export_has_one_document_per_line(collection):
+    lines = list(mongodb_utils.stream_video_metadata_ndjson())
+
+    assert len(lines) == 25
+    assert all(line.endswith('\n') for line in lines)
+    assert json.loads(lines[0])['features']['transcription'] == 'x' * 1000
@@ -0,0 +1,22 @@
+import os
+import sys
+import subprocess
+from processors.model_preloading import ModelPreloader
+
+def test_importing_transcription_does_not_load_torch():
+    """Processes that only enqueue jobs import the transcription module without paying for the model"""
+    code = "import sys, processors.transcription; print('torch' in sys.modules or 'whisper' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.strip() == 'False'
+
+def test_preloader_runs_loaders_on_worker_boot():
+    loaded = []
+    def failing_loader():
+        raise RuntimeError('no model')
+
+    preloader = ModelPreloader(failing_loader, lambda: loaded.append('model'))
+    preloader.after_worker_boot(broker=None, worker=None)
+
+    # A loader that fails doesn't stop the worker or the other loaders
+    assert loaded == ['model']
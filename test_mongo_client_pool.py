@@ -0,0 +1,48 @@
+import os
+from unittest.mock import patch, MagicMock
+from utom_databases.functions import mongo_utils as mongo
+
+def setup_function():
+    mongo._reset_mongo_client_registry_after_fork()
+
+def test_pooled_client_is_reused_per_uri():
+    """The same client is returned for the same URI, a different one per URI"""
+    with patch.object(mongo, 'MongoClient', side_effect=lambda *a, **k: MagicMock()) as mock_client:
+        first = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+        second = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+        other = mongo.get_pooled_mongo_client('mongodb://otherhost:27017/')
+
+    assert first is second
+    assert other is not first
+    assert mock_client.call_count == 2
+
+def test_pool_options_come_from_env():
+    """Pool sizes are read from the environment and can be overridden per client"""
+    with patch.dict(os.environ, {'MONGO_MAX_POOL_SIZE': '7', 'MONGO_MIN_POOL_SIZE': '2'}):
+        with patch.object(mongo, 'MongoClient') as mock_client:
+            mongo.get_pooled_mongo_client('mongodb://localhost:27017/', maxIdleTimeMS=1000)
+
+    kwargs = mock_client.call_args.kwargs
+    assert kwargs['maxPoolSize'] == 7
+    assert kwargs['minPoolSize'] == 2
+    assert kwargs['maxIdleTimeMS'] == 1000
+
+def test_registry_is_reset_in_a_forked_child():
+    """A child process never reuses a client created by its parent"""
+    with patch.object(mongo, 'MongoClient', side_effect=lambda *a, **k: MagicMock()):
+        parent_client = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+        with patch.object(mongo.os, 'getpid', return_value=mongo._mongo_client_registry_pid + 1):
+            child_client = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+
+    assert child_client is not parent_client
+    parent_client.close.assert_not_called()
+
+def test_close_pooled_mongo_clients():
+    """Closing the pool closes every client and the next call creates a new one"""
+    with patch.object(mongo, 'MongoClient', side_effect=lambda *a, **k: MagicMock()):
+        client = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+        mongo.close_pooled_mongo_clients()
+        new_client = mongo.get_pooled_mongo_client('mongodb://localhost:27017/')
+
+    client.close.assert_called_once()
+    assert new_client is not client
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from processors.transcription_backends import (
+    SAMPLE_RATE, create_transcription_backend, WhisperBackend, FasterWhisperBackend, OpenAIWhisperBackend
+)
+
+def test_create_backend_by_name(monkeypatch):
+    monkeypatch.setenv('FASTER_WHISPER_THREADS', '3')
+    backend = create_transcription_backend('faster-whisper')
+
+    assert isinstance(backend, FasterWhisperBackend)
+    assert backend.compute_type == 'int8'
+    assert backend.threads == 3
+    assert backend.config() == {'model_name': 'base', 'threads': 3, 'compute_type': 'int8'}
+    assert isinstance(create_transcription_backend('whisper'), WhisperBackend)
+
+    with pytest.raises(ValueError):
+        create_transcription_backend('nope')
+
+def test_cache_options_differ_between_backends():
+    """Results from different engines or quantizations must not share cache entries"""
+    assert create_transcription_backend('whisper').cache_options() != create_transcription_backend('faster-whisper').cache_options()
+    assert create_transcription_backend('faster-whisper', compute_type='int8').cache_options() != \
+        create_transcription_backend('faster-whisper', compute_type='float32').cache_options()
+
+class FakeTranscriptions:
+    """Stands in for client.audio.transcriptions, returns one segment per uploaded window"""
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        name, wav_bytes = request['file']
+        seconds = (len(wav_bytes) - 44) / 2 / SAMPLE_RATE
+        segment = SimpleNamespace(start=1.0, end=min(seconds, 3.0), text=f' window {len(self.requests)}')
+        return SimpleNamespace(text=segment.text, language='english', segments=[segment])
+
+def test_openai_backend_uploads_windows(monkeypatch):
+    """Long audio is uploaded in windows and the segments are stitched back at their real offsets"""
+    monkeypatch.setenv('OPENAI_TRANSCRIPTION_CHUNK_SECONDS', '30')
+    monkeypatch.setenv('LLM_RATE_LIMIT_ENABLED', 'false')
+    transcriptions = FakeTranscriptions()
+    backend = OpenAIWhisperBackend(client=SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions)), threads=1)
+
+    result = backend.transcribe(np.zeros(70 * SAMPLE_RATE, dtype=np.float32), language='en')
+
+    assert len(transcriptions.requests) == 3
+    assert all(request['model'] == 'whisper-1' and request['language'] == 'en' for request in transcriptions.requests)
+    assert [segment['start'] for segment in result['segments']] == [1.0]
+    assert result['language'] == 'english'
@@ -0,0 +1,42 @@
+import numpy as np
+from processors import vad
+from processors.vad import SAMPLE_RATE, detect_speech, build_speech_audio, to_original_time, remap_transcription
+
+def make_audio(seconds, speech):
+    """Quiet noise with loud bursts at the given (start, end) times"""
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 0.001, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    for start, end in speech:
+        burst = samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        burst += rng.normal(0, 0.2, len(burst)).astype(np.float32)
+    return samples
+
+def test_detects_speech_regions():
+    """Long gaps split regions, short pauses and tiny clicks do not make new ones"""
+    samples = make_audio(60, speech=[(5, 10), (10.5, 15), (40, 45), (50, 50.05)])
+    segments = detect_speech(samples)
+
+    assert len(segments) == 2
+    assert abs(segments[0][0] - (5 - vad.VAD_PAD_SECONDS)) < 0.05
+    assert abs(segments[0][1] - (15 + vad.VAD_PAD_SECONDS)) < 0.05
+    assert abs(segments[1][0] - (40 - vad.VAD_PAD_SECONDS)) < 0.05
+    assert abs(segments[1][1] - (45 + vad.VAD_PAD_SECONDS)) < 0.05
+
+def test_silence_has_no_speech():
+    assert detect_speech(np.zeros(10 * SAMPLE_RATE, dtype=np.float32)) == []
+
+def test_time_map_round_trip():
+    """Times in the speech-only audio map back to where they were in the original"""
+    samples = make_audio(60, speech=[])
+    speech_samples, time_map = build_speech_audio(samples, [(10.0, 20.0), (30.0, 35.0)])
+
+    assert len(speech_samples) == 15 * SAMPLE_RATE
+    assert time_map == [(0.0, 10.0, 10.0), (10.0, 30.0, 5.0)]
+    assert to_original_time(2.0, time_map) == 12.0
+    assert to_original_time(12.0, time_map) == 32.0
+    # A time on the join is the end of the first region or the start of the second
+    assert to_original_time(10.0, time_map, is_end=True) == 20.0
+    assert to_original_time(10.0, time_map) == 30.0
+
+    result = remap_transcription({'segments': [{'start': 8.0, 'end': 10.0}, {'start': 10.0, 'end': 14.0}]}, time_map)
+    assert [(s['start'], s['end']) for s in result['segments']] == [(18.0, 20.0), (30.0, 34.0)]
@@ -2,8 +2,12 @@ import os
 import sys
 import ssl
 import pymongo
+import time
 import random
-from pymongo import MongoClient, ASCENDING, IndexModel
+import datetime
+import threading
+from pymongo import MongoClient, ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import OperationFailure
 from bson.objectid import ObjectId
 
 # Add the root path so modules can be easily imported
@@ -31,6 +35,21 @@ def initialise_mongo_cloud_db_client():
         ValueError: If any of the required environment variables are not set.
     """
 
+    # Create the MongoDB connection string
+    CONNECTION_STRING = get_mongo_cloud_db_connection_string()
+
+    # Establish a connection to the MongoDB server
+    client = MongoClient(CONNECTION_STRING)
+
+    return client
+
+def get_mongo_cloud_db_connection_string():
+    """
+    Build the connection string for the MongoDB server in the cloud.
+
+    Returns:
+        str: The MongoDB connection string.
+    """
     # Read environment variables *** later we will read from env variables
     mongo_server_public_ip_address = '95.217.233.18'
     mongodb_server_username = 'utom_admin'
@@ -41,14 +60,112 @@ def initialise_mongo_cloud_db_client():
     # print(f"MongoDB Username: {mongodb_server_username}")
     # print("MongoDB Password: [Hidden]")
 
-    # Create the MongoDB connection string
-    CONNECTION_STRING = "mongodb://%s:%s@%s:27017/" % (mongodb_server_username, mongodb_server_password, mongo_server_public_ip_address)
+    return "mongodb://%s:%s@%s:27017/" % (mongodb_server_username, mongodb_server_password, mongo_server_public_ip_address)
 
-    # Establish a connection to the MongoDB server
-    client = MongoClient(CONNECTION_STRING)
+"""
+Pooled clients
+
+A MongoClient is thread-safe and keeps its own connection pool, so each process only needs one
+client per server. The registry below hands out a lazily created client per connection string and
+is reset after a fork, since clients must never be shared between a parent and child process.
+"""
+_mongo_client_registry = {}
+_mongo_client_registry_lock = threading.Lock()
+_mongo_client_registry_pid = os.getpid()
+
+def _reset_mongo_client_registry_after_fork():
+    """
+    Drop every client inherited from the parent process. The inherited clients are not closed
+    because their sockets and monitor threads belong to the parent.
+    """
+    global _mongo_client_registry, _mongo_client_registry_lock, _mongo_client_registry_pid
+    _mongo_client_registry = {}
+    _mongo_client_registry_lock = threading.Lock()
+    _mongo_client_registry_pid = os.getpid()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_mongo_client_registry_after_fork)
+
+def get_mongo_client_pool_options():
+    """
+    Read the connection pool settings for pooled clients from the environment.
+
+    Env vars (all optional):
+        MONGO_MAX_POOL_SIZE: Max connections per client (default 50).
+        MONGO_MIN_POOL_SIZE: Connections kept open when idle (default 0).
+        MONGO_MAX_IDLE_TIME_MS: Close connections idle for longer than this (default 300000).
+        MONGO_WAIT_QUEUE_TIMEOUT_MS: How long to wait for a free connection (default 30000).
+
+    Returns:
+        dict: Keyword arguments for MongoClient.
+    """
+    return {
+        'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+        'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+        'waitQueueTimeoutMS': int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 30000)),
+    }
+
+def get_pooled_mongo_client(connection_string=None, **client_kwargs):
+    """
+    Get the process-wide MongoDB client for a connection string, creating it on first use.
+
+    Clients are keyed by connection string, so every caller in the process shares the same
+    connection pool. Callers must not close the returned client; use close_pooled_mongo_clients()
+    at shutdown instead.
+
+    Args:
+        connection_string (str, optional): The MongoDB URI. Defaults to the cloud db server.
+        **client_kwargs: Extra MongoClient options, only applied when the client is first created.
+            These override the pool settings from get_mongo_client_pool_options().
+
+    Returns:
+        MongoClient: A shared, pooled MongoDB client.
+    """
+    if connection_string is None:
+        connection_string = get_mongo_cloud_db_connection_string()
+
+    # Fallback for platforms without os.register_at_fork
+    if _mongo_client_registry_pid != os.getpid():
+        _reset_mongo_client_registry_after_fork()
+
+    client = _mongo_client_registry.get(connection_string)
+    if client is not None:
+        return client
+
+    with _mongo_client_registry_lock:
+        client = _mongo_client_registry.get(connection_string)
+        if client is None:
+            options = get_mongo_client_pool_options()
+            options.update(client_kwargs)
+            client = MongoClient(connection_string, **options)
+            _mongo_client_registry[connection_string] = client
 
     return client
 
+def get_mongo_cloud_db_client():
+    """
+    Get the shared, pooled MongoDB client for the cloud db server.
+
+    Use this instead of initialise_mongo_cloud_db_client() for anything that runs per request or
+    per task, and do not close the returned client.
+
+    Returns:
+        MongoClient: A shared, pooled MongoDB client.
+    """
+    return get_pooled_mongo_client()
+
+def close_pooled_mongo_clients():
+    """
+    Close every pooled client owned by this process and empty the registry.
+    """
+    with _mongo_client_registry_lock:
+        clients = list(_mongo_client_registry.values())
+        _mongo_client_registry.clear()
+
+    for client in clients:
+        client.close()
+
 def get_mongo_server_stats():
     """
     Retrieve and display MongoDB server connection statistics.
@@ -63,8 +180,8 @@ def get_mongo_server_stats():
         Exception: If there is an error during the connection or status retrieval.
     """
 
-    # Initialize the MongoDB client by connecting to the cloud database
-    mongo_client = initialise_mongo_cloud_db_client()
+    # Get the pooled MongoDB client for the cloud database
+    mongo_client = get_mongo_cloud_db_client()
 
     # Retrieve server status information using the "serverStatus" command
     stats = mongo_client.admin.command("serverStatus")
@@ -601,7 +718,7 @@ def update_documents_in_db(db_name, collection_name, documents_to_update):
         Exception: If there is an error during the update operation.
     """
     # Connect to the MongoDB
-    mongo_client = initialise_mongo_cloud_db_client()
+    mongo_client = get_mongo_cloud_db_client()
 
     db = mongo_client[db_name]
     collection = db[collection_name]
@@ -635,11 +752,14 @@ def create_ttl_unix_timestamp_index(client, db_name, collection_name, index_name
 
     The index_name is the name of the field in the documents that stores UNIX timestamps. The index is set to expire documents immediately (0 seconds).
 
+    MongoDB only expires documents whose indexed field holds a date, so the field should store the
+    expiry time as a datetime. Documents where it is an int are kept forever.
+
     Example:
         create_ttl_unix_timestamp_index(client, 'my_db', 'my_collection', 'expiration_time')
 
-    Raises:
-        Exception: If there is an error during the TTL index creation.
+    Returns:
+        bool: True if the index exists now, False if there was an error creating it.
     """
     try:
         # Select the database
@@ -654,5 +774,317 @@ def create_ttl_unix_timestamp_index(client, db_name, collection_name, index_name
         collection.create_index(index_spec, expireAfterSeconds=index_options["expireAfterSeconds"])
 
         print(f"TTL index '{index_name}' has been created in the '{collection_name}' collection.")
+        return True
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        return False
+
+def claim_task_log_lease(mongo_client, db_name, collection_name, task_id_str, worker_id, lease_seconds, claimed_task_json=None, task_id_key_name='task_id',
+                         claimable_task_stages=None):
+    """
+    Atomically claim a task log for a worker by moving it from 'sent' to 'started' with a lease.
+
+    A task can be claimed if it is still 'sent', or if it is 'started' but the lease of the worker
+    that claimed it has expired (e.g. the worker died without finishing). The check and the update
+    happen in a single find_one_and_update, so two workers can never claim the same task.
+
+    Args:
+        mongo_client (MongoClient): A MongoDB client instance.
+        db_name (str): The name of the MongoDB database.
+        collection_name (str): The name of the task logs collection.
+        task_id_str (str): The task id to claim.
+        worker_id (str): An id for the claiming worker, stored on the task log.
+        lease_seconds (int): How long the claim is valid for unless extended.
+        claimed_task_json (dict, optional): Extra fields to set on the task log when it is claimed.
+        task_id_key_name (str, optional): The key the task id is stored under. Defaults to 'task_id'.
+        claimable_task_stages (list, optional): Only claim a task log with no task_stage or one of
+            these, for tasks whose later stages run without the lease.
+
+    Returns:
+        dict: The claimed task log (after the update), or None if it could not be claimed.
+    """
+    now = int(time.time())
+
+    # Only claim tasks that are still waiting or whose previous claim has lapsed
+    query = {
+        task_id_key_name: task_id_str,
+        '$or': [
+            {'task_status': 'sent'},
+            {'task_status': 'started', 'task_lease_expires_at': {'$lt': now}},
+        ]
+    }
+    if claimable_task_stages is not None:
+        query['task_stage'] = {'$in': [None] + list(claimable_task_stages)}
+
+    updated_task_json = dict(claimed_task_json or {})
+    updated_task_json.update({
+        'task_status': 'started',
+        'task_lease_worker_id': worker_id,
+        'task_lease_expires_at': now + lease_seconds,
+    })
+    task_log_expires_at = get_task_log_expires_at()
+    if task_log_expires_at is not None:
+        updated_task_json['task_log_expires_at'] = task_log_expires_at
+
+    collection = mongo_client[db_name][collection_name]
+    claimed_task = collection.find_one_and_update(
+        query,
+        {'$set': updated_task_json, '$inc': {'task_claim_count': 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+    return claimed_task
+
+def extend_task_log_lease(mongo_client, db_name, collection_name, task_id_str, worker_id, lease_seconds, task_id_key_name='task_id'):
+    """
+    Push back the lease expiry of a task log claimed with claim_task_log_lease().
+
+    The lease is only extended if the worker still holds it, so a worker whose lease was reclaimed
+    by another worker finds out here.
+
+    Args:
+        mongo_client (MongoClient): A MongoDB client instance.
+        db_name (str): The name of the MongoDB database.
+        collection_name (str): The name of the task logs collection.
+        task_id_str (str): The claimed task id.
+        worker_id (str): The id of the worker that claimed the task.
+        lease_seconds (int): How long from now the lease is valid for.
+        task_id_key_name (str, optional): The key the task id is stored under. Defaults to 'task_id'.
+
+    Returns:
+        bool: True if the lease was extended, False if the worker no longer holds it.
+    """
+    query = {
+        task_id_key_name: task_id_str,
+        'task_status': 'started',
+        'task_lease_worker_id': worker_id,
+    }
+    update_result = mongo_client[db_name][collection_name].update_one(
+        query,
+        {'$set': {'task_lease_expires_at': int(time.time()) + lease_seconds}}
+    )
+
+    return update_result.matched_count > 0
+
+def update_task_log_if_lease_held(mongo_client, db_name, collection_name, task_id_str, worker_id, updated_task_json, task_id_key_name='task_id'):
+    """
+    Update a task log claimed with claim_task_log_lease(), only if the worker still holds the lease.
+
+    A worker whose lease lapsed and was reclaimed by another worker must not overwrite the new
+    owner's status and results, so the update filters on the lease holder as well as the task id.
+
+    Args:
+        mongo_client (MongoClient): A MongoDB client instance.
+        db_name (str): The name of the MongoDB database.
+        collection_name (str): The name of the task logs collection.
+        task_id_str (str): The claimed task id.
+        worker_id (str): The id of the worker that claimed the task.
+        updated_task_json (dict): The fields to set on the task log.
+        task_id_key_name (str, optional): The key the task id is stored under. Defaults to 'task_id'.
+
+    Returns:
+        bool: True if the task log was updated, False if the worker no longer holds the lease.
+    """
+    query = {
+        task_id_key_name: task_id_str,
+        'task_lease_worker_id': worker_id,
+    }
+    update_result = mongo_client[db_name][collection_name].update_one(query, {'$set': updated_task_json})
+
+    return update_result.matched_count > 0
+
+"""
+Size-capped caches
+
+Cache collections (transcriptions, LLM responses) store each entry's size_bytes and
+last_accessed_at, and evict the least recently used entries once they hold more than max_bytes.
+Summing the sizes is a scan of the whole collection, so it isn't done on every write: each
+process keeps a running total from the last sum plus the bytes it wrote since, and only sums
+again when that total is over the cap or every MONGO_CACHE_RECOUNT_EVERY_PUTS writes to pick up
+what other processes wrote.
+"""
+MONGO_CACHE_RECOUNT_EVERY_PUTS = int(os.environ.get('MONGO_CACHE_RECOUNT_EVERY_PUTS', 100))
+
+def get_collection_total_bytes(collection, size_key_name='size_bytes'):
+    """
+    Sum the entry sizes of a cache collection.
+
+    Returns:
+        int: The total of size_key_name over all documents.
+    """
+    totals = list(collection.aggregate([{'$group': {'_id': None, 'total_bytes': {'$sum': '$%s' % size_key_name}}}]))
+    return totals[0]['total_bytes'] if totals else 0
+
+def evict_least_recently_used_documents(collection, max_bytes, total_bytes=None, size_key_name='size_bytes', last_accessed_key_name='last_accessed_at'):
+    """
+    Delete the least recently used documents of a cache collection until it fits in max_bytes.
+    The sort needs an index on last_accessed_key_name, see MONGO_INDEX_REGISTRY.
+
+    Args:
+        collection (Collection): The cache collection.
+        max_bytes (int): The size cap.
+        total_bytes (int, optional): The current total size, summed here if not given.
+
+    Returns:
+        int: The number of bytes freed.
+    """
+    if total_bytes is None:
+        total_bytes = get_collection_total_bytes(collection, size_key_name)
+    if total_bytes <= max_bytes:
+        return 0
+
+    freed_bytes = 0
+    to_delete = []
+    for doc in collection.find({}, {size_key_name: 1}).sort(last_accessed_key_name, ASCENDING):
+        if total_bytes - freed_bytes <= max_bytes:
+            break
+        to_delete.append(doc['_id'])
+        freed_bytes += doc.get(size_key_name, 0)
+    if to_delete:
+        collection.delete_many({'_id': {'$in': to_delete}})
+
+    return freed_bytes
+
+class MongoCacheEvictor:
+    """
+    Keeps a cache collection under max_bytes without summing it on every write, see above.
+
+    Example:
+        evictor = MongoCacheEvictor(collection, max_bytes=500 * 1024 ** 2)
+        collection.update_one(...)
+        evictor.record_put(size_bytes)
+    """
+    def __init__(self, collection, max_bytes, recount_every_puts=None):
+        self.collection = collection
+        self.max_bytes = max_bytes
+        self.recount_every_puts = recount_every_puts or MONGO_CACHE_RECOUNT_EVERY_PUTS
+        self._lock = threading.Lock()
+        self._estimated_bytes = None
+        self._puts_since_recount = 0
+
+    def record_put(self, size_bytes):
+        """
+        Count a write of size_bytes, and evict if the cache may be over its cap.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        with self._lock:
+            self._puts_since_recount += 1
+            if self._estimated_bytes is not None and self._puts_since_recount < self.recount_every_puts:
+                # Overwriting an entry counts its size twice, which at worst recounts early
+                self._estimated_bytes += size_bytes
+                if self._estimated_bytes <= self.max_bytes:
+                    return 0
+            return self._evict()
+
+    def evict(self):
+        """Sum the collection and evict the least recently used entries past max_bytes, returns bytes freed"""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self):
+        total_bytes = get_collection_total_bytes(self.collection)
+        freed_bytes = evict_least_recently_used_documents(self.collection, self.max_bytes, total_bytes)
+        self._estimated_bytes = total_bytes - freed_bytes
+        self._puts_since_recount = 0
+        return freed_bytes
+
+"""
+Index registry
+
+The lookup keys that tasks and API calls query on every run, declared in one place so that
+workers can make sure they are indexed when they boot. Each entry is created with
+create_index(), which does nothing when the same index already exists, so running
+ensure_mongo_indexes() on every boot is safe.
+
+Task logs are removed by a TTL index on task_log_expires_at, a date that
+claim_task_log_lease() sets TASK_LOG_RETENTION_DAYS after a task is picked up. The send and
+pickup times can't be used for this because they are unix ints, which TTL indexes ignore.
+"""
+# How long task logs are kept after the task was picked up, 0 keeps them forever
+TASK_LOG_RETENTION_DAYS = float(os.environ.get('TASK_LOG_RETENTION_DAYS', 30))
+TASK_LOG_EXPIRES_AT_KEY_NAME = 'task_log_expires_at'
+# video_metadata lives on its own server, see mongodb_utils.py at the repo root
+VIDEO_METADATA_MONGODB_URI = os.environ.get('VIDEO_METADATA_MONGODB_URI', 'mongodb://localhost:27017/')
+
+MONGO_INDEX_REGISTRY = [
+    {'db_name': 'utom_task_log_service', 'collection_name': 'task_logs', 'key': 'task_id', 'unique': True},
+    {'db_name': 'utom_task_log_service', 'collection_name': 'task_logs', 'key': TASK_LOG_EXPIRES_AT_KEY_NAME, 'ttl': True},
+    {'db_name': 'utom_video_processing_db', 'collection_name': 'video_task_logs', 'key': 'task_id', 'unique': True},
+    {'db_name': 'utom_video_processing_db', 'collection_name': 'video_task_logs', 'key': TASK_LOG_EXPIRES_AT_KEY_NAME, 'ttl': True},
+    {'db_name': 'utom_features', 'collection_name': 'project_features', 'key': 'feature_id', 'unique': True},
+    {'db_name': 'utom_features', 'collection_name': 'project_features', 'key': 'project_id'},
+    # members is a list, so this is a multikey index that serves {"members": {"$in": [...]}}
+    {'db_name': 'utom_features', 'collection_name': 'project_features', 'key': 'members'},
+    {'db_name': 'video_processor', 'collection_name': 'video_metadata', 'key': 'video_id', 'unique': True,
+     'connection_string': VIDEO_METADATA_MONGODB_URI},
+    # Size-capped caches, evicted in last_accessed_at order
+    {'db_name': 'utom_video_processing_db', 'collection_name': 'transcription_cache', 'key': 'cache_key', 'unique': True},
+    {'db_name': 'utom_video_processing_db', 'collection_name': 'transcription_cache', 'key': 'last_accessed_at'},
+    {'db_name': 'utom_feature_db', 'collection_name': 'llm_response_cache', 'key': 'cache_key', 'unique': True},
+    {'db_name': 'utom_feature_db', 'collection_name': 'llm_response_cache', 'key': 'last_accessed_at'},
+    {'db_name': 'utom_feature_db', 'collection_name': 'llm_response_cache', 'key': 'expires_at', 'ttl': True},
+]
+
+def get_task_log_expires_at():
+    """
+    Get the date a task log picked up now should be removed at.
+
+    Returns:
+        datetime: The expiry date, or None when task logs are kept forever.
+    """
+    if TASK_LOG_RETENTION_DAYS <= 0:
+        return None
+    return datetime.datetime.utcnow() + datetime.timedelta(days=TASK_LOG_RETENTION_DAYS)
+
+def get_mongo_index_specs(*collection_names):
+    """
+    Get the registry entries for some collections.
+
+    Args:
+        *collection_names (str): The collections to get the indexes of, all of them if none are given.
+
+    Returns:
+        list: The matching entries of MONGO_INDEX_REGISTRY.
+    """
+    if not collection_names:
+        return list(MONGO_INDEX_REGISTRY)
+    return [index_spec for index_spec in MONGO_INDEX_REGISTRY if index_spec['collection_name'] in collection_names]
+
+def ensure_mongo_indexes(index_specs=None, client=None):
+    """
+    Create the indexes in the registry that don't exist yet.
+
+    An index that can't be created, e.g. a unique index on a collection that already holds
+    duplicates, is reported and skipped so the other indexes are still created.
+
+    Args:
+        index_specs (list, optional): Registry entries to create, all of MONGO_INDEX_REGISTRY by default.
+        client (MongoClient, optional): The client to use for every entry. By default each entry
+            uses the pooled client for its connection_string, or the cloud db server.
+
+    Returns:
+        dict: {'ensured': [index names], 'failed': [(index name, error)]}
+    """
+    index_specs = MONGO_INDEX_REGISTRY if index_specs is None else index_specs
+    result = {'ensured': [], 'failed': []}
+    for index_spec in index_specs:
+        db_name, collection_name, key = index_spec['db_name'], index_spec['collection_name'], index_spec['key']
+        index_client = client or get_pooled_mongo_client(index_spec.get('connection_string'))
+        index_name = '%s.%s.%s_1' % (db_name, collection_name, key)
+        if index_spec.get('ttl'):
+            # Errors are printed by create_ttl_unix_timestamp_index
+            if create_ttl_unix_timestamp_index(index_client, db_name, collection_name, key):
+                result['ensured'].append(index_name)
+            else:
+                result['failed'].append((index_name, 'TTL index could not be created'))
+            continue
+        try:
+            index_client[db_name][collection_name].create_index([(key, ASCENDING)], unique=index_spec.get('unique', False))
+            result['ensured'].append(index_name)
+        except OperationFailure as e:
+            print('Warning: Could not create index %s: %s' % (index_name, str(e)))
+            result['failed'].append((index_name, str(e)))
+
+    return result
@@ -1,7 +1,12 @@
 import os
+import time
 import pika
 import json
+import queue
+import random
 import requests
+import threading
+from pika.exceptions import AMQPConnectionError, AMQPChannelError
 
 """   
 ENVS to add
@@ -11,6 +16,20 @@ rabbitmq_server_username = os.environ.get('rabbitmq_server_username')
 rabbitmq_server_password = os.environ.get('rabbitmq_server_password')
 """
 
+def get_rabbitmq_connection_parameters():
+    """
+    Build the connection parameters for the RabbitMQ server from the environment.
+
+    Returns:
+        pika.ConnectionParameters: Parameters for pika.BlockingConnection.
+    """
+    rabbitmq_server_ip_address = os.environ.get('rabbitmq_server_ip_address')
+    rabbitmq_server_username = os.environ.get('rabbitmq_server_username')
+    rabbitmq_server_password = os.environ.get('rabbitmq_server_password')
+
+    credentials = pika.PlainCredentials(rabbitmq_server_username, rabbitmq_server_password)
+    return pika.ConnectionParameters(host=rabbitmq_server_ip_address, credentials=credentials)
+
 def initialize_rabbitmq_client_and_create_channel():
     """
     Initialize a RabbitMQ client to connect to a RabbitMQ server using the default 'guest' user.
@@ -21,14 +40,8 @@ def initialize_rabbitmq_client_and_create_channel():
     Returns:
         pika.BlockingConnection: A connection object to the RabbitMQ server.
     """
-    # Create a connection to the RabbitMQ server using the default 'guest' user and password
-    rabbitmq_server_ip_address = os.environ.get('rabbitmq_server_ip_address')
-    rabbitmq_server_username = os.environ.get('rabbitmq_server_username')
-    rabbitmq_server_password = os.environ.get('rabbitmq_server_password')
-
     # Create a connection to the RabbitMQ server using the provided username and password
-    credentials = pika.PlainCredentials(rabbitmq_server_username, rabbitmq_server_password)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_server_ip_address, credentials=credentials))
+    connection = pika.BlockingConnection(get_rabbitmq_connection_parameters())
     channel = connection.channel()
     
     return channel
@@ -236,4 +249,216 @@ def clear_all_rabbitmq_queues():
         message_count = get_queue_message_count(rabbitmq_server_ip_address, rabbitmq_server_username, rabbitmq_server_password, queue_name)
         print(message_count)
         # print()
-        clear_rabbitmq_queue(channel, queue_name)
\ No newline at end of file
+        clear_rabbitmq_queue(channel, queue_name)
+
+
+"""
+Pooled publisher
+
+Opening a connection per message costs a TCP and AMQP handshake, far more than the publish
+itself. RabbitMQPublisher keeps a small pool of open connections, each with one channel, and
+hands one to each publishing thread (pika connections are not thread-safe, so a channel is never
+shared between threads). A dropped connection is reopened with exponential backoff before
+retrying.
+
+With confirm_delivery the channels are in publisher confirm mode: send_many() publishes up to
+RABBITMQ_PUBLISH_BATCH_SIZE messages and then waits once for the broker to confirm all of them,
+so a batch costs one round trip instead of one per message. pika's BlockingChannel.confirm_delivery()
+makes every basic_publish wait for its own confirm, so confirm mode is enabled on the underlying
+channel with our own ack/nack callback instead. If the connection drops, or the broker nacks a
+message, before the whole batch is confirmed the batch is sent again, so a message can be delivered
+twice but is never lost. Messages are persistent unless other properties are passed.
+"""
+class _PublishConfirms:
+    """The delivery tags published on a channel in confirm mode that the broker has not confirmed yet"""
+    def __init__(self):
+        self.next_delivery_tag = 1
+        self.unconfirmed = set()
+        self.nacked = False
+
+    def on_publish(self):
+        self.unconfirmed.add(self.next_delivery_tag)
+        self.next_delivery_tag += 1
+
+    def on_confirm(self, method_frame):
+        method = method_frame.method
+        if method.multiple:
+            self.unconfirmed = {tag for tag in self.unconfirmed if tag > method.delivery_tag}
+        else:
+            self.unconfirmed.discard(method.delivery_tag)
+        if isinstance(method, pika.spec.Basic.Nack):
+            self.nacked = True
+
+class RabbitMQPublisher:
+    """
+    Thread-safe, long-lived publisher to RabbitMQ queues.
+
+    Example:
+        publisher = get_rabbitmq_publisher()
+        publisher.publish_dict('utom_video_processing_task_queue', task_message)
+        publisher.send_many('utom_video_processing_task_queue', [json.dumps(task) for task in tasks])
+    """
+    def __init__(self, connection_parameters=None, pool_size=None, confirm_delivery=True, batch_size=None, confirm_timeout_seconds=None,
+                 max_retries=None, backoff_seconds=None, max_backoff_seconds=None, connection_factory=pika.BlockingConnection,
+                 sleep=time.sleep):
+        self.connection_parameters = connection_parameters
+        self.pool_size = pool_size or int(os.environ.get('RABBITMQ_PUBLISHER_POOL_SIZE', 4))
+        self.confirm_delivery = confirm_delivery
+        self.batch_size = batch_size or int(os.environ.get('RABBITMQ_PUBLISH_BATCH_SIZE', 100))
+        self.confirm_timeout_seconds = confirm_timeout_seconds or float(os.environ.get('RABBITMQ_PUBLISH_CONFIRM_TIMEOUT_SECONDS', 30))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('RABBITMQ_PUBLISH_MAX_RETRIES', 5))
+        self.backoff_seconds = backoff_seconds or float(os.environ.get('RABBITMQ_PUBLISH_BACKOFF_SECONDS', 0.5))
+        self.max_backoff_seconds = max_backoff_seconds or float(os.environ.get('RABBITMQ_PUBLISH_MAX_BACKOFF_SECONDS', 30))
+        self.connection_factory = connection_factory
+        self.sleep = sleep
+        # Each slot is None until it is first used, or a (connection, channel, confirms) triple
+        self._pool = queue.LifoQueue()
+        for _ in range(self.pool_size):
+            self._pool.put(None)
+
+    def _open_channel(self):
+        connection = self.connection_factory(self.connection_parameters or get_rabbitmq_connection_parameters())
+        channel = connection.channel()
+        confirms = None
+        if self.confirm_delivery:
+            confirms = _PublishConfirms()
+            selected = []
+            channel._impl.confirm_delivery(ack_nack_callback=confirms.on_confirm, callback=selected.append)
+            self._wait_for(connection, lambda: selected)
+        return connection, channel, confirms
+
+    def _wait_for(self, connection, is_done):
+        """Process I/O on the connection until is_done() is true, raising if the broker takes too long"""
+        deadline = time.monotonic() + self.confirm_timeout_seconds
+        while not is_done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AMQPConnectionError('Timed out waiting for the broker to confirm')
+            connection.process_data_events(time_limit=remaining)
+
+    def _close_channel(self, pooled_channel):
+        if pooled_channel is None:
+            return
+        connection = pooled_channel[0]
+        try:
+            if connection.is_open:
+                connection.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        pooled_channel = self._pool.get()
+        if pooled_channel is not None:
+            connection, channel, _ = pooled_channel
+            try:
+                # Answer heartbeats that arrived while the connection sat idle in the pool
+                connection.process_data_events(time_limit=0)
+            except (AMQPConnectionError, AMQPChannelError):
+                pass
+            if not (connection.is_open and channel.is_open):
+                self._close_channel(pooled_channel)
+                pooled_channel = None
+        return pooled_channel
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds)
+        self.sleep(delay * random.uniform(0.5, 1.0))
+
+    def send_many(self, queue_name, message_bodies, properties=None):
+        """
+        Publish messages to a queue over one pooled channel.
+
+        Args:
+            queue_name (str): The name of the RabbitMQ queue to publish to.
+            message_bodies (list): The message bodies (str or bytes).
+            properties (pika.BasicProperties, optional): Properties for every message, persistent
+                delivery by default.
+
+        Returns:
+            int: The number of messages published (and confirmed, with confirm_delivery).
+
+        Raises:
+            AMQPConnectionError: If the broker is still unreachable, or still does not confirm a batch,
+                after max_retries reconnects.
+        """
+        message_bodies = list(message_bodies)
+        if properties is None:
+            properties = pika.BasicProperties(delivery_mode=pika.DeliveryMode.Persistent)
+        sent_count = 0
+        attempt = 0
+        pooled_channel = self._checkout()
+        try:
+            while sent_count < len(message_bodies):
+                batch = message_bodies[sent_count:sent_count + self.batch_size]
+                try:
+                    if pooled_channel is None:
+                        pooled_channel = self._open_channel()
+                    connection, channel, confirms = pooled_channel
+                    for message_body in batch:
+                        channel.basic_publish(exchange='', routing_key=queue_name, body=message_body, properties=properties)
+                        if confirms is not None:
+                            confirms.on_publish()
+                    if confirms is not None:
+                        # One wait for the whole batch
+                        self._wait_for(connection, lambda: not confirms.unconfirmed)
+                        if confirms.nacked:
+                            raise AMQPChannelError('The broker nacked a message in the batch')
+                    sent_count += len(batch)
+                    attempt = 0
+                except (AMQPConnectionError, AMQPChannelError) as e:
+                    self._close_channel(pooled_channel)
+                    pooled_channel = None
+                    if attempt >= self.max_retries:
+                        raise
+                    print(f"Warning: RabbitMQ publish failed, reconnecting: {str(e)}")
+                    self._backoff(attempt)
+                    attempt += 1
+        finally:
+            self._pool.put(pooled_channel)
+        return sent_count
+
+    def publish(self, queue_name, message_body, properties=None):
+        """Publish one message to a queue, see send_many()"""
+        return self.send_many(queue_name, [message_body], properties)
+
+    def publish_dict(self, queue_name, data_dict):
+        """Publish a dictionary as a JSON message to a queue"""
+        return self.publish(queue_name, json.dumps(data_dict))
+
+    def close(self):
+        """Close every pooled connection, the publisher reopens them if it is used again"""
+        for _ in range(self.pool_size):
+            self._close_channel(self._pool.get())
+        for _ in range(self.pool_size):
+            self._pool.put(None)
+
+_rabbitmq_publisher = None
+_rabbitmq_publisher_lock = threading.Lock()
+
+def _reset_rabbitmq_publisher_after_fork():
+    # The parent's connections can't be used from the child, it opens its own
+    global _rabbitmq_publisher, _rabbitmq_publisher_lock
+    _rabbitmq_publisher = None
+    _rabbitmq_publisher_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_rabbitmq_publisher_after_fork)
+
+def get_rabbitmq_publisher():
+    """
+    Get the process-wide publisher for the RabbitMQ server, creating it on first use.
+
+    Returns:
+        RabbitMQPublisher: A shared publisher. Don't close it, use close_rabbitmq_publisher() at shutdown.
+    """
+    global _rabbitmq_publisher
+    if _rabbitmq_publisher is None:
+        with _rabbitmq_publisher_lock:
+            if _rabbitmq_publisher is None:
+                _rabbitmq_publisher = RabbitMQPublisher()
+    return _rabbitmq_publisher
+
+def close_rabbitmq_publisher():
+    """Close the process-wide publisher's connections"""
+    if _rabbitmq_publisher is not None:
+        _rabbitmq_publisher.close()
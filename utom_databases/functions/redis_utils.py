@@ -198,3 +198,87 @@ def clear_redis_queue(redis_client, queue_name):
         return True  # Successfully cleared the queue
     except Exception as e:
         return str(e)  # Return any error message if an exception occurs
+
+"""
+Pooled clients
+"""
+_redis_client_registry = {}
+
+def get_pooled_redis_client(redis_url=None):
+    """
+    Get a process-wide Redis client for a server URL. redis-py clients are thread safe and keep
+    their own connection pool, which they rebuild after a fork.
+
+    Args:
+        redis_url (str, optional): The Redis server URL, defaults to the REDIS_URL env var.
+
+    Returns:
+        redis.Redis: A client shared by every caller in this process.
+    """
+    redis_url = redis_url or os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    redis_client = _redis_client_registry.get(redis_url)
+    if redis_client is None:
+        redis_client = redis.Redis.from_url(redis_url)
+        _redis_client_registry[redis_url] = redis_client
+    return redis_client
+
+"""
+Token buckets
+"""
+# KEYS are the bucket keys, ARGV[1] is the current time and then capacity, refill rate (per
+# second) and amount for each bucket. Either every bucket has enough and they are all taken from,
+# or nothing is taken and the seconds until they would all have enough is returned.
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local amount = tonumber(ARGV[i * 3 + 1])
+    local state = redis.call('HMGET', key, 'level', 'updated_at')
+    local level = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - updated_at) * rate)
+    levels[i] = level
+    -- An amount bigger than the bucket goes through once the bucket is full and leaves it in debt
+    local needed = math.min(amount, capacity) - level
+    if needed > 0 then
+        wait = math.max(wait, needed / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local amount = tonumber(ARGV[i * 3 + 1])
+    redis.call('HSET', key, 'level', tostring(levels[i] - amount), 'updated_at', tostring(now))
+    redis.call('EXPIRE', key, math.ceil((capacity + amount) / rate) + 60)
+end
+return '0'
+"""
+
+def take_from_token_buckets(redis_client, bucket_keys, capacities, refill_rates, amounts, now):
+    """
+    Atomically take amounts from one or more token buckets stored in Redis.
+
+    Args:
+        redis_client (redis.Redis): A Redis client instance.
+        bucket_keys (list): The Redis keys of the buckets.
+        capacities (list): The most each bucket can hold.
+        refill_rates (list): How much each bucket refills per second.
+        amounts (list): How much to take from each bucket.
+        now (float): The current time in seconds.
+
+    Returns:
+        float: 0 if the amounts were taken, otherwise how many seconds to wait before trying again.
+            Nothing is taken unless every bucket has enough.
+    """
+    args = [now]
+    for capacity, refill_rate, amount in zip(capacities, refill_rates, amounts):
+        args.extend([capacity, refill_rate, amount])
+
+    wait = redis_client.eval(TOKEN_BUCKET_LUA, len(bucket_keys), *bucket_keys, *args)
+    return float(wait)
@@ -0,0 +1,169 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import time
+import hashlib
+import datetime
+import dramatiq
+
+"""
+Claim checks for dramatiq messages
+
+Messages whose payload is bigger than CLAIM_CHECK_THRESHOLD_BYTES (e.g. a task carrying the whole
+project_metadata document) are sent through the broker as a small envelope with a reference,
+the claim check, and the payload itself is stored in Mongo or an S3-compatible store. Consumers
+fetch the payload back when they decode the message, so actors see their normal arguments.
+
+The payload is the message args and kwargs, plus the pipeline and group callback messages in its
+options, which carry the same arguments again. It is stored under a hash of its content, so a
+retried or resent message (which only changes the retry count) writes to the same entry instead
+of adding one, and restarts its expiry. Reading the payload back is retried with backoff, so a
+short store outage delays the message instead of sending it to the dead letter queue.
+
+CLAIM_CHECK_STORE picks the store: 'mongo' (default), 's3' or 'off'. Stored payloads are
+removed after CLAIM_CHECK_TTL_SECONDS by a TTL index in Mongo; for S3 set a lifecycle rule on
+the prefix.
+"""
+CLAIM_CHECK_OPTION = 'claim_check'
+# Options that hold copies of message arguments, these move into the payload
+CLAIM_CHECK_PAYLOAD_OPTIONS = ('pipe_target', 'group_completion_callbacks')
+
+class MongoClaimCheckStore:
+    """Payloads stored as binary documents in Mongo, removed by a TTL index"""
+    def __init__(self, mongo_client=None, db_name='utom_task_log_service', collection_name='message_claim_checks', ttl_seconds=None):
+        if mongo_client is None:
+            from utom_databases.functions import mongo_utils as mongo
+            mongo_client = mongo.get_mongo_cloud_db_client()
+        self.collection = mongo_client[db_name][collection_name]
+        self.ttl_seconds = ttl_seconds or int(os.getenv('CLAIM_CHECK_TTL_SECONDS', 7 * 24 * 3600))
+        self._indexes_created = False
+
+    def put(self, key, payload):
+        if not self._indexes_created:
+            self.collection.create_index('created_at', expireAfterSeconds=self.ttl_seconds)
+            self._indexes_created = True
+        # The key is a hash of the payload, an existing document already holds the same bytes so
+        # only its expiry is pushed back
+        self.collection.update_one(
+            {'_id': key},
+            {'$setOnInsert': {'payload': payload}, '$set': {'created_at': datetime.datetime.utcnow()}},
+            upsert=True
+        )
+
+    def get(self, key):
+        doc = self.collection.find_one({'_id': key}, {'payload': 1})
+        if doc is None:
+            raise KeyError(f"Claim check {key} not found")
+        return bytes(doc['payload'])
+
+class S3ClaimCheckStore:
+    """Payloads stored as objects in an S3-compatible bucket"""
+    def __init__(self, s3_client=None, bucket_name=None, prefix='claim_checks/'):
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID') or os.getenv('s3_access_key'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY') or os.getenv('s3_secret_key'),
+                region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                endpoint_url=os.getenv('CLAIM_CHECK_S3_ENDPOINT_URL') or None
+            )
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name or os.getenv('CLAIM_CHECK_S3_BUCKET') or os.getenv('AWS_BUCKET_NAME', 'utom-video-processing-bucket')
+        self.prefix = prefix
+
+    def put(self, key, payload):
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=f"{self.prefix}{key}", Body=payload)
+
+    def get(self, key):
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=f"{self.prefix}{key}")['Body'].read()
+
+class ClaimCheckEncoder(dramatiq.Encoder):
+    """
+    dramatiq encoder that moves large payloads out of the message, see the module docstring.
+
+    Example:
+        dramatiq.set_encoder(ClaimCheckEncoder(MongoClaimCheckStore()))
+    """
+    def __init__(self, store, threshold_bytes=None, encoder=None, get_attempts=None, get_backoff_seconds=None):
+        self.store = store
+        self.threshold_bytes = threshold_bytes or int(os.getenv('CLAIM_CHECK_THRESHOLD_BYTES', 64 * 1024))
+        self.encoder = encoder or dramatiq.JSONEncoder()
+        self.get_attempts = get_attempts or int(os.getenv('CLAIM_CHECK_GET_ATTEMPTS', 5))
+        self.get_backoff_seconds = get_backoff_seconds or float(os.getenv('CLAIM_CHECK_GET_BACKOFF_SECONDS', 0.5))
+
+    def encode(self, data):
+        options = dict(data.get('options') or {})
+        payload_options = {name: options.pop(name) for name in CLAIM_CHECK_PAYLOAD_OPTIONS if name in options}
+        payload = self.encoder.encode({'args': data.get('args', ()), 'kwargs': data.get('kwargs', {}), 'options': payload_options})
+        if len(payload) <= self.threshold_bytes:
+            return self.encoder.encode(data)
+
+        key = hashlib.sha256(payload).hexdigest()
+        # Stored on every send, a payload from an earlier send may have expired since
+        try:
+            self.store.put(key, payload)
+        except Exception as e:
+            # Sending the whole message is slower but better than not sending it
+            print(f"Warning: Could not store message payload, sending it inline: {str(e)}")
+            return self.encoder.encode(data)
+
+        options[CLAIM_CHECK_OPTION] = key
+        return self.encoder.encode(dict(data, args=(), kwargs={}, options=options))
+
+    def decode(self, data):
+        message = self.encoder.decode(data)
+        options = message.get('options') or {}
+        key = options.get(CLAIM_CHECK_OPTION)
+        if key and not message.get('args') and not message.get('kwargs'):
+            payload = self.encoder.decode(self._get_payload(key))
+            message['args'] = payload['args']
+            message['kwargs'] = payload['kwargs']
+            # The claim check stays in the options so a retry reuses the stored payload
+            message['options'] = dict(options, **payload['options'])
+        return message
+
+    def _get_payload(self, key):
+        """Read a payload from the store, retrying with exponential backoff while the store is unreachable"""
+        for attempt in range(self.get_attempts):
+            try:
+                return self.store.get(key)
+            except KeyError:
+                # Expired or never stored, waiting won't bring it back
+                raise
+            except Exception as e:
+                if attempt == self.get_attempts - 1:
+                    raise
+                delay = self.get_backoff_seconds * 2 ** attempt
+                print(f"Warning: Could not read message payload {key}, retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+
+def get_claim_check_store():
+    """
+    Get the store configured by CLAIM_CHECK_STORE.
+
+    Returns:
+        The store, or None when claim checks are turned off.
+    """
+    store = os.getenv('CLAIM_CHECK_STORE', 'mongo').lower()
+    if store == 'off':
+        return None
+    return S3ClaimCheckStore() if store == 's3' else MongoClaimCheckStore()
+
+def install_claim_check_encoder():
+    """
+    Use a ClaimCheckEncoder for every message this process sends or receives. Call it wherever
+    the broker is set up, producers and workers both need it.
+    """
+    store = get_claim_check_store()
+    if store is not None:
+        dramatiq.set_encoder(ClaimCheckEncoder(store))
@@ -15,10 +15,9 @@ import json
 from bson import ObjectId
 from datetime import datetime
 from utom_databases.functions import mongo_utils as mongo
-from utom_databases.functions import rabbitmq_utils as rabbit_mq
 from utom_utils.functions import general as gen
 from utom_utils.functions import dramatiq_task_funcs as dram_task
-from utom_feature.functions.feature_creation_dramatiq_app import generate_feature_details_e2e_one_shot_task
+from utom_feature.functions.feature_creation_dramatiq_app import generate_feature_details_e2e_one_shot_task, build_feature_creation_pipeline
 from utom_project.functions import project_management
 class CustomEncoder(json.JSONEncoder):
     """     
@@ -76,6 +75,9 @@ def generate_feature_details_e2e_one_shot_task_dict(combined_data):
 def send_generate_feature_details_e2e_one_shot_task(feature_creation_input_metadata):
     """
     Send a task to generate feature details end-to-end in one shot.
+
+    The task runs as the staged feature creation pipeline (see feature_creation_dramatiq_app)
+    unless FEATURE_CREATION_STAGED is turned off, then as the single one shot actor.
     
     Args:
         feature_creation_input_metadata (dict): Metadata required for feature creation
@@ -91,8 +93,7 @@ def send_generate_feature_details_e2e_one_shot_task(feature_creation_input_metad
     task_log_service_mongo_db_name = 'utom_task_log_service'
     task_logs_collection_name = 'task_logs'
     
-    channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
-    mongo_client = mongo.initialise_mongo_cloud_db_client()
+    mongo_client = mongo.get_mongo_cloud_db_client()
 
     # Combine the input metadata into a single dictionary
     combined_data = {
@@ -104,12 +105,19 @@ def send_generate_feature_details_e2e_one_shot_task(feature_creation_input_metad
     task_json = json.dumps(task_dict)
     dram_task.save_task_log_to_mongo(task_dict, mongo_client, task_log_service_mongo_db_name, task_logs_collection_name)
 
+    staged = os.getenv('FEATURE_CREATION_STAGED', 'true').lower() in ('1', 'true', 'yes')
     try:
-        generate_feature_details_e2e_one_shot_task.send(task_json)
+        if staged:
+            build_feature_creation_pipeline(task_json).run()
+        else:
+            generate_feature_details_e2e_one_shot_task.send(task_json)
     except:
-        print('Error sending task, retrying with new connection')
-        channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
-        generate_feature_details_e2e_one_shot_task.send(task_json)
+        # The broker opens a new connection for the retry
+        print('Error sending task, retrying')
+        if staged:
+            build_feature_creation_pipeline(task_json).run()
+        else:
+            generate_feature_details_e2e_one_shot_task.send(task_json)
     
     print(f'Task has been sent to dramatiq with task_id: {task_dict["task_id"]}')
     
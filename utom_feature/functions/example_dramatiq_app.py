@@ -46,13 +46,13 @@ rabbitmq_server_password = os.environ.get('rabbitmq_server_password')
 broker = RabbitmqBroker(url="amqp://%s:%s@%s:5672" % (rabbitmq_server_username, rabbitmq_server_password, rabbitmq_server_ip_address))
 
 # Initialise rabbitmq and mongo connections
-mongo_client = mongo.initialise_mongo_cloud_db_client()
+mongo_client = mongo.get_mongo_cloud_db_client()
 channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
 
 # Function to be called at application shutdown
 def close_mongo_connection():
     # print('Calling the at exit function to close the mongo client')
-    mongo_client.close()
+    mongo.close_pooled_mongo_clients()
     # print('closed the mongo server')
     # print('Closing the rabbitmq channel')
     channel.close()
@@ -85,7 +85,7 @@ def generate_content_recommendations_for_driptok_user_task(data):
     task_message_dict = json.loads(args_tuple[0])
 
     # - Get task details
-    mongo_client = mongo.initialise_mongo_cloud_db_client()
+    mongo_client = mongo.get_mongo_cloud_db_client()
     task_id_str = task_message_dict['task_id']
     task_log_service_mongo_db_name = os.environ.get('task_log_service_mongo_db_name')
     task_logs_collection_name = os.environ.get('task_logs_collection_name')
@@ -185,11 +185,11 @@ def generate_content_recommendations_for_driptok_user_task(data):
         
         try:
             # Given how long the content service processing takes, we reinitialize the mongo_client at this point
-            mongo_client = mongo.initialise_mongo_cloud_db_client()
+            mongo_client = mongo.get_mongo_cloud_db_client()
             mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
         except:
             print('There was an error when we tried to save the updated task details')
-            mongo_client = mongo.initialise_mongo_cloud_db_client()
+            mongo_client = mongo.get_mongo_cloud_db_client()
             mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
         # print('We were able to save the data to mongo without having to explicitly initialise the mongo connection inside, which means that we are lit for cassandra')
         # mongo_client.close()
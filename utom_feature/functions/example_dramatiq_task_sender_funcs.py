@@ -86,7 +86,7 @@ def send_generate_content_recommendations_for_driptok_user_task(user_recc_params
     task_logs_collection_name = os.environ.get('task_logs_collection_name')
     
     channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
-    mongo_client = mongo.initialise_mongo_cloud_db_client()
+    mongo_client = mongo.get_mongo_cloud_db_client()
 
     task_dict = generate_content_recommendations_for_driptok_user_task_dict(user_recc_params_dict)
     task_json = json.dumps(task_dict)
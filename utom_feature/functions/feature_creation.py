@@ -12,13 +12,14 @@ sys.path.insert(0, BASE_DIR)
 
 import json
 import time
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 from bson import ObjectId
 from utom_agents.functions import conversations as convo
 from utom_user.functions import user_creation, user_management
 from utom_workspace.functions import workspace_creation, workspace_management
 from utom_project.functions import project_creation, project_management
 from utom_feature.functions import feature_management
+from utom_feature.functions import llm_client
 from utom_task.functions import task_creation
 from utom_pages.functions import pages_creation, pages_management
 # from utom_feature.functions import feature_creation_llm_prompts as llm_prompts
@@ -194,9 +195,7 @@ def extract_json_from_llm_response(text):
     return None
 
 def generate_initial_feature_metadata_from_feature_creation_conversation(conversation_id, model_name="o3-mini"):
-    # Initialize OpenAI client for this function call
     utom_openai_api_key = os.getenv('utom_openai_api_key')
-    client = OpenAI(api_key=utom_openai_api_key)
     
     # Convert conversation history to a more readable format for the prompt
     conversation_history = convo.get_cleaned_conversation_history_as_list(conversation_id)  
@@ -256,7 +255,8 @@ def generate_initial_feature_metadata_from_feature_creation_conversation(convers
     4. Steps are ordered in logical implementation sequence
     5. Return only valid JSON with no additional text"""
 
-    response = client.chat.completions.create(
+    response = llm_client.create_chat_completion(
+        api_key=utom_openai_api_key,
         model=model_name,
         messages=[
             {
@@ -304,9 +304,7 @@ def generate_detailed_design_brief(feature_details, model_name="o3-mini"):
     Returns:
         dict: Feature details with added design brief
     """
-    # Initialize OpenAI client for this function call
     utom_openai_api_key = os.getenv('utom_openai_api_key')
-    client = OpenAI(api_key=utom_openai_api_key)
 
     # Create a generic prompt with clear instructions for each section
     prompt = f"""Given the following feature metadata:
@@ -556,7 +554,10 @@ def generate_detailed_design_brief(feature_details, model_name="o3-mini"):
     
     while retry_count < max_retries:
         try:
-            response = client.chat.completions.create(
+            # A retry must ask the model again rather than get the rejected answer back from the cache
+            response = llm_client.create_chat_completion(
+                api_key=utom_openai_api_key,
+                use_cache=retry_count == 0,
                 model=model_name,
                 messages=[
                     {
@@ -606,12 +607,9 @@ def save_feature_to_db(feature_metadata):
         feature_metadata (dict): Feature metadata dictionary to save
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        db.project_features.insert_one(feature_metadata)
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    db.project_features.insert_one(feature_metadata)
 
 def get_feature_details(feature_id):
     """
@@ -624,15 +622,12 @@ def get_feature_details(feature_id):
         dict: Feature details dictionary
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        feature_details = db.project_features.find_one({"feature_id": feature_id})
-        if feature_details is None:
-            raise ValueError(f"Feature with ID {feature_id} not found")
-        return feature_details
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    feature_details = db.project_features.find_one({"feature_id": feature_id})
+    if feature_details is None:
+        raise ValueError(f"Feature with ID {feature_id} not found")
+    return feature_details
 
 def create_new_feature_from_user_conversation(feature_creation_input_metadata):
     """ 
@@ -727,7 +722,6 @@ New Functions For Feature E2E Creation
 """
 import os
 import json
-from openai import OpenAI
 
 def extract_json_from_llm_response(text):
     # Regex to find JSON-like structure in the text
@@ -755,9 +749,7 @@ def extract_json_from_llm_response(text):
     return None
 
 def generate_user_flows_and_execution_steps_from_feature_creation_conversation(conversation_id, is_placeholder_feature=True):
-    # Initialize OpenAI client for this function call
     utom_openai_api_key = os.getenv('utom_openai_api_key')
-    client = OpenAI(api_key=utom_openai_api_key)
 
     # Convert conversation history to a more readable format for the prompt
     if is_placeholder_feature:
@@ -836,7 +828,8 @@ def generate_user_flows_and_execution_steps_from_feature_creation_conversation(c
     5. Return only valid JSON with no additional text"""
 
     model_name="o3-mini"
-    response = client.chat.completions.create(
+    response = llm_client.create_chat_completion(
+        api_key=utom_openai_api_key,
         model=model_name,
         messages=[
             {
@@ -868,83 +861,281 @@ def generate_user_flows_and_execution_steps_from_feature_creation_conversation(c
     
     return userflow_and_execution_steps_metadata
 
-def generate_pages_for_feature_from_design_brief(pages_creation_input_metadata, feature_details):
+def get_screen_design_briefs(feature_details):
+    """
+    Split a feature's design brief into one design brief per screen.
+
+    Args:
+        feature_details (dict): The feature details with a design_brief.
+
+    Returns:
+        list: The screen design briefs, in page order.
+    """
+    return pages_creation.generate_screen_design_briefs(feature_details['design_brief']) or []
+
+def generate_page_for_screen(screen_design_brief, pages_creation_input_metadata):
+    """
+    Generate the page for one screen, catching the error if it fails.
+
+    Args:
+        screen_design_brief (dict): The design brief for the screen.
+        pages_creation_input_metadata (dict): Metadata required for page creation.
+
+    Returns:
+        tuple: (page_metadata, None) if the page was generated, otherwise
+            (None, {"screen_name": ..., "error": ...}).
+    """
+    try:
+        return pages_creation.generate_utom_page_from_screen_design_brief(screen_design_brief, pages_creation_input_metadata), None
+    except Exception as e:
+        screen_id = screen_design_brief.get('screen_id') if isinstance(screen_design_brief, dict) else None
+        print(f"Error generating page for screen {screen_id}: {str(e)}")
+        return None, {"screen_name": screen_id, "error": str(e)}
+
+def collect_feature_pages(feature_details, page_results):
+    """
+    Add the generated pages, and the screens that failed, to the feature details.
+
+    Args:
+        feature_details (dict): The feature details.
+        page_results (list): (page_metadata, failure) per screen, in screen order, see
+            generate_page_for_screen().
+
+    Returns:
+        tuple: (feature_details, pages_metadata) for the pages that were generated.
 
+    Raises:
+        Exception: If there were screens and none of them could be generated.
+    """
     feature_pages = []
     pages_metadata = []
-    design_brief = feature_details['design_brief']
-    screen_briefs = pages_creation.generate_screen_design_briefs(design_brief)
-
-    for screen_design_brief in screen_briefs:
-        page_metadata = pages_creation.generate_utom_page_from_screen_design_brief(screen_design_brief, pages_creation_input_metadata)
+    failed_pages = []
+    for page_metadata, failure in page_results:
+        if failure is not None:
+            failed_pages.append(failure)
+            continue
         feature_pages.append({
             "page_id": page_metadata["page_id"],
             "screen_name": page_metadata["screen_design_brief"]["screen_id"]
         })
         pages_metadata.append(page_metadata)
+
+    if page_results and not pages_metadata:
+        raise Exception(f"Could not generate any of the {len(page_results)} pages for the feature")
+
     feature_details['feature_pages'] = feature_pages
+    feature_details['failed_pages'] = failed_pages
     
     return feature_details, pages_metadata
 
-def generate_feature_details_e2e_one_shot(feature_creation_input_metadata, project_metadata):
+def generate_pages_for_feature_from_design_brief(pages_creation_input_metadata, feature_details, max_concurrency=None):
     """
-    Generate feature details end-to-end in one shot.
+    Generate a page for every screen in the feature's design brief.
 
-    This function orchestrates the process of generating user flows, execution steps, 
-    detailed design briefs, pages, and tasks for a feature, and updates the feature 
-    metadata in the database.
+    The screens are generated concurrently, at most FEATURE_PAGE_GENERATION_CONCURRENCY at a time,
+    so the feature waits for the slowest screen rather than the sum of them. Pages keep the order
+    of the screen briefs and a screen that fails is recorded in feature_details['failed_pages']
+    instead of failing the whole feature.
 
     Args:
-        feature_creation_input_metadata (dict): Metadata required for feature creation.
-        project_metadata (dict): Metadata of the project.
+        pages_creation_input_metadata (dict): Metadata required for page creation.
+        feature_details (dict): The feature details with a design_brief.
+        max_concurrency (int, optional): Most screens generated at once.
 
     Returns:
-        dict: Updated feature metadata.
+        tuple: (feature_details, pages_metadata) for the pages that were generated.
+
+    Raises:
+        Exception: If there were screens and none of them could be generated.
     """
+    screen_briefs = get_screen_design_briefs(feature_details)
+    max_concurrency = max_concurrency or int(os.getenv('FEATURE_PAGE_GENERATION_CONCURRENCY', 8))
 
-    # Extract necessary IDs from feature creation input metadata
-    workspace_id = feature_creation_input_metadata["workspace_id"]
-    project_id = feature_creation_input_metadata["project_id"]
-    feature_id = feature_creation_input_metadata["feature_id"]
-    creator_id = feature_creation_input_metadata["creator_id"]
-    conversation_id = feature_creation_input_metadata["conversation_id"]
+    page_results = []
+    if screen_briefs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(screen_briefs)))) as executor:
+            # map() yields in submission order, so pages stay in screen order
+            page_results = list(executor.map(lambda screen_design_brief: generate_page_for_screen(screen_design_brief, pages_creation_input_metadata), screen_briefs))
 
-    # Create metadata for pages creation
-    pages_creation_input_metadata = {
-        "workspace_id": workspace_id,
-        "project_id": project_id,
-        "creator_id": creator_id,
-        "feature_id": feature_id,
-    }
+    return collect_feature_pages(feature_details, page_results)
 
-    # Generate user flows and execution steps from the conversation
-    print('Generating user flows and execution steps')
-    userflow_and_execution_steps_metadata = generate_user_flows_and_execution_steps_from_feature_creation_conversation(conversation_id)
-    print('Generated user flows and execution steps')
+"""
+Feature Creation Stages
 
-    # Retrieve feature metadata by feature ID
+The end to end feature creation is split into stages: user flows, design brief, pages and tasks.
+Each stage saves its output as a checkpoint on the feature (see feature_management) and skips
+the work when a previous run already saved it, so they can be run one after the other by
+generate_feature_details_e2e_one_shot() or as separate dramatiq actors, and a rerun resumes at
+the first stage that didn't finish.
+"""
+def get_pages_creation_input_metadata(feature_creation_input_metadata):
+    """Metadata for pages creation from the feature creation input metadata"""
+    return {key: feature_creation_input_metadata[key] for key in ['workspace_id', 'project_id', 'creator_id', 'feature_id']}
+
+def load_feature_for_creation(feature_id, userflow_and_execution_steps_metadata):
+    """
+    Get the feature metadata, ready to be updated, with the user flows and execution steps set.
+    """
     feature_metadata = feature_management.get_feature_by_id(feature_id)
     del feature_metadata['_id']
+    # Checkpoints and the stage marker are only written through feature_management, saving a stale
+    # copy of them would roll back the stages that finished since
+    feature_metadata.pop('feature_creation_checkpoints', None)
+    feature_metadata.pop('feature_creation_stage', None)
 
     # Update feature metadata with user flows and execution steps
-    print('Generating detailed design brief')
     feature_metadata['feature_details']['user_flows'] = userflow_and_execution_steps_metadata['user_flows']
     feature_metadata['feature_details']['execution_steps'] = userflow_and_execution_steps_metadata['execution_steps']
+    return feature_metadata
+
+def run_user_flows_stage(feature_creation_input_metadata, checkpoints):
+    """
+    Generate the user flows and execution steps from the feature creation conversation.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        checkpoints (dict): The stage outputs saved by a previous run.
+
+    Returns:
+        dict: The user flows and execution steps.
+    """
+    if 'user_flows' in checkpoints:
+        return checkpoints['user_flows']
+
+    feature_id = feature_creation_input_metadata["feature_id"]
+    conversation_id = feature_creation_input_metadata["conversation_id"]
+    print('Generating user flows and execution steps')
+    userflow_and_execution_steps_metadata = generate_user_flows_and_execution_steps_from_feature_creation_conversation(conversation_id)
+    feature_management.save_feature_creation_checkpoint(feature_id, 'user_flows', userflow_and_execution_steps_metadata, conversation_id)
+    checkpoints['user_flows'] = userflow_and_execution_steps_metadata
+    print('Generated user flows and execution steps')
+    return userflow_and_execution_steps_metadata
+
+def run_design_brief_stage(feature_creation_input_metadata, checkpoints):
+    """
+    Generate the detailed design brief for the feature.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        checkpoints (dict): The stage outputs saved by a previous run.
+
+    Returns:
+        dict: The feature details with the design brief.
+    """
+    if 'design_brief' in checkpoints:
+        return checkpoints['design_brief']
+
+    feature_id = feature_creation_input_metadata["feature_id"]
+    conversation_id = feature_creation_input_metadata["conversation_id"]
+    userflow_and_execution_steps_metadata = run_user_flows_stage(feature_creation_input_metadata, checkpoints)
+    feature_metadata = load_feature_for_creation(feature_id, userflow_and_execution_steps_metadata)
+
+    print('Generating detailed design brief')
     feature_details = feature_metadata['feature_details']
     # Generate a detailed design brief for the feature
     ## - this ensures that the feature details are only the ones that are needed for the design brief
     feature_details = {key: feature_details[key] for key in ['feature_name', 'feature_description', 'priority', 'dependencies', 'integration_points', 'user_flow_reviewed', 'user_flows', 'execution_steps']}
 
     feature_details = generate_detailed_design_brief(feature_details)
+    feature_management.save_feature_creation_checkpoint(feature_id, 'design_brief', feature_details, conversation_id)
+    checkpoints['design_brief'] = feature_details
     print('Generated detailed design brief')
     # Save the feature to the database - interim save for independent page functionality
     feature_management.update_feature(feature_metadata)
+    return feature_details
+
+def save_pages_stage(feature_creation_input_metadata, checkpoints, feature_details, pages_metadata):
+    """Save the output of the pages stage as a checkpoint"""
+    feature_id = feature_creation_input_metadata["feature_id"]
+    conversation_id = feature_creation_input_metadata["conversation_id"]
+    checkpoints['pages'] = {'feature_details': feature_details, 'pages_metadata': pages_metadata}
+    feature_management.save_feature_creation_checkpoint(feature_id, 'pages', checkpoints['pages'], conversation_id)
+    if feature_details['failed_pages']:
+        print(f"Generated pages for the feature from the design brief, {len(feature_details['failed_pages'])} failed")
+    else:
+        print('Generated pages for the feature from the design brief')
+
+def run_pages_stage(feature_creation_input_metadata, checkpoints):
+    """
+    Generate the pages for every screen in the design brief, in this process.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        checkpoints (dict): The stage outputs saved by a previous run.
+
+    Returns:
+        tuple: (feature_details, pages_metadata)
+    """
+    if 'pages' not in checkpoints:
+        feature_details = run_design_brief_stage(feature_creation_input_metadata, checkpoints)
+        print('Generating pages for the feature from the design brief')
+        feature_details, pages_metadata = generate_pages_for_feature_from_design_brief(get_pages_creation_input_metadata(feature_creation_input_metadata), feature_details)
+        save_pages_stage(feature_creation_input_metadata, checkpoints, feature_details, pages_metadata)
+    return checkpoints['pages']['feature_details'], checkpoints['pages']['pages_metadata']
+
+def run_screen_page_stage(feature_creation_input_metadata, screen_index, screen_design_brief):
+    """
+    Generate the page for one screen and save it as a checkpoint, for when the screens are
+    generated by separate workers. Failures are saved too, the screen is not retried.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        screen_index (int): The position of the screen in the design brief.
+        screen_design_brief (dict): The design brief for the screen.
+    """
+    feature_id = feature_creation_input_metadata["feature_id"]
+    conversation_id = feature_creation_input_metadata["conversation_id"]
+    screen_checkpoints = feature_management.get_feature_screen_checkpoints(feature_id, conversation_id)
+    if str(screen_index) in screen_checkpoints:
+        return
+
+    page_metadata, failure = generate_page_for_screen(screen_design_brief, get_pages_creation_input_metadata(feature_creation_input_metadata))
+    feature_management.save_feature_screen_checkpoint(feature_id, screen_index, {'page_metadata': page_metadata, 'failure': failure}, conversation_id)
+
+def collect_screen_pages_stage(feature_creation_input_metadata, checkpoints, screen_count):
+    """
+    Finish the pages stage from the pages saved by run_screen_page_stage().
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        checkpoints (dict): The stage outputs saved so far.
+        screen_count (int): How many screens were generated.
+
+    Returns:
+        tuple: (feature_details, pages_metadata)
+    """
+    if 'pages' not in checkpoints:
+        feature_id = feature_creation_input_metadata["feature_id"]
+        conversation_id = feature_creation_input_metadata["conversation_id"]
+        screen_checkpoints = feature_management.get_feature_screen_checkpoints(feature_id, conversation_id)
+        page_results = []
+        for screen_index in range(screen_count):
+            screen_checkpoint = screen_checkpoints.get(str(screen_index))
+            if screen_checkpoint is None:
+                page_results.append((None, {"screen_name": None, "error": f"Page for screen {screen_index} was not generated"}))
+            else:
+                page_results.append((screen_checkpoint['page_metadata'], screen_checkpoint['failure']))
+        feature_details, pages_metadata = collect_feature_pages(checkpoints['design_brief'], page_results)
+        save_pages_stage(feature_creation_input_metadata, checkpoints, feature_details, pages_metadata)
+    return checkpoints['pages']['feature_details'], checkpoints['pages']['pages_metadata']
+
+def run_task_assignment_stage(feature_creation_input_metadata, project_metadata, checkpoints):
+    """
+    Generate and assign the tasks for the feature, save it as fleshed out and clear the checkpoints.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        project_metadata (dict): Metadata of the project.
+        checkpoints (dict): The outputs of the earlier stages.
 
-    # Generate pages for the feature from the design brief
-    print('Generating pages for the feature from the design brief')
-    feature_details, pages_metadata = generate_pages_for_feature_from_design_brief(pages_creation_input_metadata, feature_details)
+    Returns:
+        dict: Updated feature metadata.
+    """
+    feature_id = feature_creation_input_metadata["feature_id"]
+    feature_metadata = load_feature_for_creation(feature_id, checkpoints['user_flows'])
+    feature_details, pages_metadata = checkpoints['pages']['feature_details'], checkpoints['pages']['pages_metadata']
     feature_metadata['feature_details'] = feature_details
-    print('Generated pages for the feature from the design brief')
+
     # Generate tasks for the feature
     print('Generating tasks for the feature')
     feature_tasks = task_creation.generate_and_assign_tasks(project_metadata, feature_metadata, pages_metadata)
@@ -952,10 +1143,45 @@ def generate_feature_details_e2e_one_shot(feature_creation_input_metadata, proje
     # Update feature metadata with generated tasks and mark as fleshed out
     feature_metadata['feature_details']['feature_tasks'] = feature_tasks
     feature_metadata['feature_fleshed_out'] = True
+    feature_metadata['feature_creation_stage'] = 'tasks'
     feature_management.update_feature(feature_metadata)
+    # The feature now holds every stage's output, a later run starts over
+    feature_management.clear_feature_creation_checkpoints(feature_id)
 
     return feature_metadata
 
+def generate_feature_details_e2e_one_shot(feature_creation_input_metadata, project_metadata):
+    """
+    Generate feature details end-to-end in one shot.
+
+    This function orchestrates the process of generating user flows, execution steps, 
+    detailed design briefs, pages, and tasks for a feature, and updates the feature 
+    metadata in the database.
+
+    Each stage's output is saved as a checkpoint on the feature as soon as it finishes, so a
+    rerun after a failure (e.g. a task retry) skips the stages that already finished and
+    resumes at the first one that didn't.
+
+    Args:
+        feature_creation_input_metadata (dict): Metadata required for feature creation.
+        project_metadata (dict): Metadata of the project.
+
+    Returns:
+        dict: Updated feature metadata.
+    """
+    feature_id = feature_creation_input_metadata["feature_id"]
+    conversation_id = feature_creation_input_metadata["conversation_id"]
+
+    # Outputs of the stages a previous run finished
+    checkpoints = feature_management.get_feature_creation_checkpoints(feature_id, conversation_id)
+    if checkpoints:
+        print(f"Resuming feature creation after the {', '.join(stage for stage in feature_management.FEATURE_CREATION_STAGES if stage in checkpoints)} stages")
+
+    run_user_flows_stage(feature_creation_input_metadata, checkpoints)
+    run_design_brief_stage(feature_creation_input_metadata, checkpoints)
+    run_pages_stage(feature_creation_input_metadata, checkpoints)
+    return run_task_assignment_stage(feature_creation_input_metadata, project_metadata, checkpoints)
+
 def process_generate_feature_details_e2e_one_shot_task(task_json_string):
     """
     Process a task to generate feature details end-to-end in one shot.
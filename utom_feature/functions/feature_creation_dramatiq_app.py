@@ -16,13 +16,20 @@ import time
 import json
 import atexit
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
-from dramatiq.middleware import CurrentMessage
+from dramatiq.middleware import CurrentMessage, GroupCallbacks, TimeLimitExceeded
+from dramatiq.rate_limits.backends import RedisBackend
 from utom_utils.functions import general as gen
 from utom_utils.functions import env_utils
 from utom_utils.functions import dramatiq_task_funcs as dram_task
 from utom_databases.functions import rabbitmq_utils as rabbit_mq
 from utom_databases.functions import mongo_utils as mongo
+from utom_databases.functions import redis_utils
+from utom_feature.functions import task_lease
+from utom_feature.functions import llm_client
+from utom_feature.functions import claim_check
+from utom_feature.functions.mongo_indexes import EnsureMongoIndexes
 from utom_feature.functions import feature_creation
+from utom_feature.functions import feature_management
 
 """
 Server Side Setup
@@ -34,16 +41,18 @@ env_utils.load_in_env_vars()
 rabbitmq_server_ip_address = '95.216.155.137'
 rabbitmq_server_username = 'utom'
 rabbitmq_server_password = 'utom2024'
-broker = RabbitmqBroker(url="amqp://%s:%s@%s:5672" % (rabbitmq_server_username, rabbitmq_server_password, rabbitmq_server_ip_address))
+# confirm_delivery makes send() wait for the broker to accept the message
+broker = RabbitmqBroker(url="amqp://%s:%s@%s:5672" % (rabbitmq_server_username, rabbitmq_server_password, rabbitmq_server_ip_address), confirm_delivery=True)
 
 # Initialise rabbitmq and mongo connections
-mongo_client = mongo.initialise_mongo_cloud_db_client()
+mongo_client = mongo.get_mongo_cloud_db_client()
 channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
 print('Initialised rabbitmq and mongo connections')
 rabbit_mq.check_if_rabbitmq_server_is_active()
 # Function to be called at application shutdown
 def close_connections():
-    mongo_client.close()
+    mongo.close_pooled_mongo_clients()
+    llm_client.close_llm_clients()
     channel.close()
 
 # Register the function to be called at exit
@@ -51,7 +60,13 @@ atexit.register(close_connections)
 
 # Set the dramatiq broker and add messaging
 dramatiq.set_broker(broker)
+# Large message payloads go through Mongo/S3 instead of RabbitMQ, senders import this module too
+claim_check.install_claim_check_encoder()
 dramatiq.get_broker().add_middleware(CurrentMessage())
+# Group completion callbacks (the page fan-out) count finished messages with a Redis barrier
+dramatiq.get_broker().add_middleware(GroupCallbacks(RedisBackend(client=redis_utils.get_pooled_redis_client())))
+# Index the task log and feature lookup keys when a worker boots
+dramatiq.get_broker().add_middleware(EnsureMongoIndexes(mongo.get_mongo_index_specs('task_logs', 'project_features', 'llm_response_cache')))
 
 # Define your task
 @dramatiq.actor(queue_name="generate_feature_details_e2e_one_shot_task_queue", max_retries=1, time_limit=900000) # 15 minutes timeout
@@ -59,95 +74,74 @@ def generate_feature_details_e2e_one_shot_task(data):
     """
     Get the task worker and message details
     """
-    worker_id = '111'
+    worker_id = task_lease.get_worker_id()
     local_machine_public_ip = '127.0.0.1'  # Use localhost for local testing
     
     msg = CurrentMessage.get_current_message()
     args_tuple = msg.args
     task_message_dict = json.loads(args_tuple[0])
 
-    # - Get task details
+    task_id_str = task_message_dict['task_id']
+    task_log_service_mongo_db_name = 'utom_task_log_service'  # Hardcoded for testing
+    task_logs_collection_name = 'task_logs'  # Hardcoded for testing
+    task_started_count_collection_name = 'task_started_count'  # Hardcoded for testing
+
+    """
+    Calculate initial time params on the task
+    """
+    # Get send time
+    task_send_time = int(task_message_dict['task_send_time'])
+    
+    # Get params at the start of the task
+    task_pickup_time = int(time.time())
+    task_time_to_pickup = int(task_pickup_time - task_send_time)
+
+    """   
+    Claim the task, this atomically moves it from sent to started so duplicate deliveries are skipped
+    """
+    claimed_task_json = {
+        'task_pickup_time': task_pickup_time,
+        'task_time_to_pickup': task_time_to_pickup,
+        'task_pickup_local_machine_public_ip': local_machine_public_ip,
+        'task_pickup_worker_id': worker_id,
+    }
     try:
-        mongo_client = mongo.initialise_mongo_cloud_db_client()
-        task_id_str = task_message_dict['task_id']
-        task_log_service_mongo_db_name = 'utom_task_log_service'  # Hardcoded for testing
-        task_logs_collection_name = 'task_logs'  # Hardcoded for testing
-        
-        # Try to get task from MongoDB
-        try:
-            filter_criteria = {
-                'task_id': task_id_str
-            }
-            db_task_message_dict = mongo.get_documents_by_filter_criteria(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, filter_criteria)[0]
-            db_task_status = db_task_message_dict['task_status']
-            
-            if db_task_status == 'sent':
-                can_process_task = True
-            else:
-                can_process_task = False
-        except Exception as e:
-            print(f"Warning: Could not get task from MongoDB: {str(e)}")
-            # Assume we can process the task if we can't check MongoDB
-            can_process_task = True
+        mongo_client = mongo.get_mongo_cloud_db_client()
+        can_process_task = task_lease.claim_task(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id, claimed_task_json)
+    except dramatiq.Retry:
+        # Another worker holds the task, the message comes back once its lease could have lapsed
+        raise
     except Exception as e:
-        print(f"Warning: Could not connect to MongoDB: {str(e)}")
+        print(f"Warning: Could not claim task in MongoDB: {str(e)}")
         # Assume we can process the task if we can't connect to MongoDB
         can_process_task = True
         mongo_client = None
 
     if can_process_task:
-        """
-        Calculate initial time params on the task
-        """
-        # Get send time
-        task_send_time = int(task_message_dict['task_send_time'])
-        
-        # Get params at the start of the task
-        task_pickup_time = int(time.time())
-        task_time_to_pickup = int(task_pickup_time - task_send_time)
-
-        """   
-        Update the task logs that the task has been picked up
-        """
         if mongo_client:
-            task_status = 'started'
-            updated_task_json = {
-                'task_status': task_status,
-                'task_pickup_time': task_pickup_time,
-                'task_time_to_pickup': task_time_to_pickup,
-                'task_pickup_local_machine_public_ip': local_machine_public_ip,
-                'task_pickup_worker_id': worker_id,
-            }
-            
-            task_id_key_name = 'task_id'
-            task_log_service_mongo_db_name = 'utom_task_log_service'  # Hardcoded for testing
-            task_logs_collection_name = 'task_logs'  # Hardcoded for testing
-            task_started_count_collection_name = 'task_started_count'  # Hardcoded for testing
-            
             try:
-                mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-                
                 # Update the task started count
                 dram_task.update_task_started_count(mongo_client, task_log_service_mongo_db_name, task_started_count_collection_name, task_id_str)
             except Exception as e:
-                print(f"Warning: Could not update task status in MongoDB: {str(e)}")
+                print(f"Warning: Could not update task started count in MongoDB: {str(e)}")
 
         """
         Execute on the task
         """
-        try:
-            print(f"Starting task execution for task ID: {task_id_str}")
+        with task_lease.TaskLeaseHeartbeat(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id) as heartbeat:
+            try:
+                print(f"Starting task execution for task ID: {task_id_str}")
             
-            # Use the process function from feature_creation
-            feature_metadata = feature_creation.process_generate_feature_details_e2e_one_shot_task(data)
+                # Use the process function from feature_creation
+                feature_metadata = feature_creation.process_generate_feature_details_e2e_one_shot_task(data)
             
-            task_message = 'Task ran end to end successfully'
-            task_status = 'completed'
-            print(f"Task completed successfully for task ID: {task_id_str}")
-        except Exception as e:
-            task_message = f'There was an error: {str(e)}'
-            print(task_message)
-            task_status = 'failed'
+                task_message = 'Task ran end to end successfully'
+                task_status = 'completed'
+                print(f"Task completed successfully for task ID: {task_id_str}")
+            except Exception as e:
+                task_message = f'There was an error: {str(e)}'
+                print(task_message)
+                task_status = 'failed'
     
         """
         Calculate post process time params
@@ -173,19 +167,198 @@ def generate_feature_details_e2e_one_shot_task(data):
         Update the task logs
         """
         if mongo_client:
-            try:
-                # Given how long the processing takes, we reinitialize the mongo_client at this point
-                mongo_client = mongo.initialise_mongo_cloud_db_client()
-                mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-            except Exception as e:
-                print(f"Warning: Could not update task status in MongoDB: {str(e)}")
-                try:
-                    mongo_client = mongo.initialise_mongo_cloud_db_client()
-                    mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-                except Exception as e:
-                    print(f"Warning: Could not update task status in MongoDB after retry: {str(e)}")
+            # Only written while this worker still holds the lease, a worker that lost it must not
+            # overwrite the status and results of the worker that reclaimed the task
+            task_lease.finish_task(mongo.get_mongo_cloud_db_client(), task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id, updated_task_json, heartbeat)
 
     if can_process_task:
         print(f"Task ID: {task_id_str}, Worker ID: {worker_id} was able to be processed and completed successfully")
     else:
-        print(f"Task ID: {task_id_str}, Worker ID: {worker_id} seems to be a duplicate as the task was already started by another worker") 
\ No newline at end of file
+        print(f"Task ID: {task_id_str}, Worker ID: {worker_id} is a duplicate as the task was already finished") 
+
+"""
+Staged Feature Creation
+
+The same work as generate_feature_details_e2e_one_shot_task, split into one actor per stage on
+its own queue so each stage has its own time limit and can be given its own workers:
+
+    user flows -> design brief -> pages (one message per screen, a group) -> task assignment
+
+The first two stages are a dramatiq pipeline, the design brief stage fans the screens out as a
+group and the group's completion callback runs the task assignment. Every stage checkpoints its
+output on the feature (see feature_creation), so a retried stage only redoes its own work.
+Give the page queue more workers than the others, e.g.
+
+    dramatiq feature_creation_dramatiq_app --queues feature_creation_pages_task_queue --processes 2 --threads 16
+    dramatiq feature_creation_dramatiq_app --queues feature_creation_user_flows_task_queue feature_creation_design_brief_task_queue feature_creation_tasks_task_queue --threads 4
+"""
+FEATURE_CREATION_TASK_LOG_DB_NAME = 'utom_task_log_service'
+FEATURE_CREATION_TASK_LOGS_COLLECTION_NAME = 'task_logs'
+# Time limits per stage in milliseconds
+FEATURE_USER_FLOWS_STAGE_TIME_LIMIT = int(os.getenv('FEATURE_USER_FLOWS_STAGE_TIME_LIMIT_MS', 300000))
+FEATURE_DESIGN_BRIEF_STAGE_TIME_LIMIT = int(os.getenv('FEATURE_DESIGN_BRIEF_STAGE_TIME_LIMIT_MS', 600000))
+FEATURE_PAGE_STAGE_TIME_LIMIT = int(os.getenv('FEATURE_PAGE_STAGE_TIME_LIMIT_MS', 300000))
+FEATURE_TASKS_STAGE_TIME_LIMIT = int(os.getenv('FEATURE_TASKS_STAGE_TIME_LIMIT_MS', 300000))
+
+def update_feature_creation_task_log(task_id_str, updated_task_json):
+    """Update the feature creation task log, retrying once, and only warn if it can't be updated"""
+    for attempt in range(2):
+        try:
+            # The pooled client reconnects on its own, so it is safe to reuse after a long task
+            mongo_client = mongo.get_mongo_cloud_db_client()
+            mongo.update_document_in_mongo_by_document_id_str(mongo_client, FEATURE_CREATION_TASK_LOG_DB_NAME, FEATURE_CREATION_TASK_LOGS_COLLECTION_NAME, 'task_id', task_id_str, updated_task_json)
+            return
+        except Exception as e:
+            print(f"Warning: Could not update task status in MongoDB: {str(e)}")
+
+def _finish_feature_creation_task_log(task_message_dict, task_status, task_message):
+    task_end_time = int(time.time())
+    task_time_taken = int(task_end_time - int(task_message_dict['task_send_time']))
+    task_time_to_pickup = int(task_message_dict.get('task_time_to_pickup', 0))
+    update_feature_creation_task_log(task_message_dict['task_id'], {
+        'task_status': task_status,
+        'task_end_time': task_end_time,
+        'task_time_taken': task_time_taken,
+        'task_process_time': int(task_time_taken - task_time_to_pickup),
+        'task_message': task_message,
+    })
+
+@dramatiq.actor(queue_name="feature_creation_failed_task_queue", max_retries=3)
+def feature_creation_stage_failed_task(message_data, exception_data):
+    """
+    on_failure callback of the stage actors, marks the task failed once a stage has run out of retries
+    """
+    task_message_dict = json.loads(message_data['args'][0])
+    task_message = f"There was an error in {message_data['actor_name']}: {exception_data['message']}"
+    print(task_message)
+    _finish_feature_creation_task_log(task_message_dict, 'failed', task_message)
+
+@dramatiq.actor(queue_name="feature_creation_user_flows_task_queue", max_retries=2, time_limit=FEATURE_USER_FLOWS_STAGE_TIME_LIMIT)
+def feature_creation_user_flows_task(data):
+    """
+    Claim the task and generate the user flows and execution steps.
+
+    Returns:
+        str: The task JSON for the next stage, with the pickup time added, or None for a duplicate.
+    """
+    worker_id = task_lease.get_worker_id()
+    task_message_dict = json.loads(data)
+    task_id_str = task_message_dict['task_id']
+
+    task_pickup_time = int(time.time())
+    task_message_dict['task_pickup_time'] = task_pickup_time
+    task_message_dict['task_time_to_pickup'] = int(task_pickup_time - int(task_message_dict['task_send_time']))
+
+    claimed_task_json = {
+        'task_pickup_time': task_pickup_time,
+        'task_time_to_pickup': task_message_dict['task_time_to_pickup'],
+        'task_pickup_local_machine_public_ip': '127.0.0.1',
+        'task_pickup_worker_id': worker_id,
+        'task_stage': 'user_flows',
+    }
+    try:
+        mongo_client = mongo.get_mongo_cloud_db_client()
+        # The lease only covers this stage, once the task has moved on a redelivery must not start it again
+        can_process_task = task_lease.claim_task(mongo_client, FEATURE_CREATION_TASK_LOG_DB_NAME, FEATURE_CREATION_TASK_LOGS_COLLECTION_NAME, task_id_str, worker_id,
+                                                 claimed_task_json, claimable_task_stages=['user_flows'])
+    except dramatiq.Retry:
+        # Another worker holds the task, the message comes back once its lease could have lapsed
+        raise
+    except Exception as e:
+        print(f"Warning: Could not claim task in MongoDB: {str(e)}")
+        # Assume we can process the task if we can't connect to MongoDB
+        can_process_task = True
+        mongo_client = None
+
+    if not can_process_task:
+        print(f"Task ID: {task_id_str}, Worker ID: {worker_id} is a duplicate as the task has already moved past this stage")
+        # The design brief stage stops on None, so nothing downstream runs again
+        return None
+
+    feature_creation_input_metadata = task_message_dict['task_message_dict']['feature_creation_input_metadata']
+    with task_lease.TaskLeaseHeartbeat(mongo_client, FEATURE_CREATION_TASK_LOG_DB_NAME, FEATURE_CREATION_TASK_LOGS_COLLECTION_NAME, task_id_str, worker_id):
+        checkpoints = feature_management.get_feature_creation_checkpoints(feature_creation_input_metadata['feature_id'], feature_creation_input_metadata['conversation_id'])
+        feature_creation.run_user_flows_stage(feature_creation_input_metadata, checkpoints)
+
+    # Hand the task to the design brief stage before the lease lapses, so a redelivery of this message is refused
+    update_feature_creation_task_log(task_id_str, {'task_stage': 'design_brief'})
+    return json.dumps(task_message_dict)
+
+@dramatiq.actor(queue_name="feature_creation_design_brief_task_queue", max_retries=2, time_limit=FEATURE_DESIGN_BRIEF_STAGE_TIME_LIMIT)
+def feature_creation_design_brief_task(data):
+    """
+    Generate the design brief and fan the screens out to feature_creation_page_task.
+    """
+    if data is None:
+        # The user flows stage was a duplicate delivery
+        return
+    task_message_dict = json.loads(data)
+    feature_creation_input_metadata = task_message_dict['task_message_dict']['feature_creation_input_metadata']
+    update_feature_creation_task_log(task_message_dict['task_id'], {'task_stage': 'design_brief'})
+
+    checkpoints = feature_management.get_feature_creation_checkpoints(feature_creation_input_metadata['feature_id'], feature_creation_input_metadata['conversation_id'])
+    feature_details = feature_creation.run_design_brief_stage(feature_creation_input_metadata, checkpoints)
+
+    screen_briefs = [] if 'pages' in checkpoints else feature_creation.get_screen_design_briefs(feature_details)
+    tasks_message = feature_creation_tasks_task.message_with_options(args=(data, len(screen_briefs)), on_failure=feature_creation_stage_failed_task)
+    if not screen_briefs:
+        broker.enqueue(tasks_message)
+        return
+
+    update_feature_creation_task_log(task_message_dict['task_id'], {'task_stage': 'pages'})
+    pages_group = dramatiq.group([
+        feature_creation_page_task.message(data, screen_index, screen_design_brief)
+        for screen_index, screen_design_brief in enumerate(screen_briefs)
+    ])
+    pages_group.add_completion_callback(tasks_message)
+    pages_group.run()
+
+@dramatiq.actor(queue_name="feature_creation_pages_task_queue", max_retries=0, time_limit=FEATURE_PAGE_STAGE_TIME_LIMIT)
+def feature_creation_page_task(data, screen_index, screen_design_brief):
+    """
+    Generate the page for one screen. This never raises, a failed screen is saved as a failure,
+    because the group's completion callback only runs once every screen's message has succeeded.
+    """
+    task_message_dict = json.loads(data)
+    feature_creation_input_metadata = task_message_dict['task_message_dict']['feature_creation_input_metadata']
+    try:
+        feature_creation.run_screen_page_stage(feature_creation_input_metadata, screen_index, screen_design_brief)
+    except (Exception, TimeLimitExceeded) as e:
+        print(f"Error generating page for screen {screen_index}: {str(e)}")
+
+@dramatiq.actor(queue_name="feature_creation_tasks_task_queue", max_retries=2, time_limit=FEATURE_TASKS_STAGE_TIME_LIMIT)
+def feature_creation_tasks_task(data, screen_count):
+    """
+    Collect the generated pages, generate and assign the feature's tasks and complete the task log.
+    """
+    task_message_dict = json.loads(data)
+    feature_creation_input_metadata = task_message_dict['task_message_dict']['feature_creation_input_metadata']
+    project_metadata = task_message_dict['task_message_dict']['project_metadata']
+    update_feature_creation_task_log(task_message_dict['task_id'], {'task_stage': 'tasks'})
+
+    checkpoints = feature_management.get_feature_creation_checkpoints(feature_creation_input_metadata['feature_id'], feature_creation_input_metadata['conversation_id'])
+    if not checkpoints:
+        # Checkpoints are cleared when the feature is finished, this is a duplicate delivery
+        print(f"Task ID: {task_message_dict['task_id']} was already completed")
+        return
+    feature_creation.collect_screen_pages_stage(feature_creation_input_metadata, checkpoints, screen_count)
+    feature_creation.run_task_assignment_stage(feature_creation_input_metadata, project_metadata, checkpoints)
+
+    _finish_feature_creation_task_log(task_message_dict, 'completed', 'Task ran end to end successfully')
+    print(f"Task completed successfully for task ID: {task_message_dict['task_id']}")
+
+def build_feature_creation_pipeline(task_json):
+    """
+    Build the staged feature creation for a task, send it with .run().
+
+    Args:
+        task_json (str): The task JSON, as sent to generate_feature_details_e2e_one_shot_task.
+
+    Returns:
+        dramatiq.pipeline: The user flows and design brief stages, the design brief stage sends
+            the rest.
+    """
+    return dramatiq.pipeline([
+        feature_creation_user_flows_task.message_with_options(args=(task_json,), on_failure=feature_creation_stage_failed_task),
+        feature_creation_design_brief_task.message_with_options(on_failure=feature_creation_stage_failed_task),
+    ])
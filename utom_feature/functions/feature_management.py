@@ -25,15 +25,12 @@ def get_feature_by_id(feature_id):
         dict: Feature metadata dictionary or None if not found
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        feature = db.project_features.find_one({"feature_id": feature_id})
-        if feature:
-            feature['_id'] = str(feature['_id'])
-        return feature
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    feature = db.project_features.find_one({"feature_id": feature_id})
+    if feature:
+        feature['_id'] = str(feature['_id'])
+    return feature
 
 def get_project_features(project_id):
     """
@@ -46,15 +43,12 @@ def get_project_features(project_id):
         list: List of feature metadata dictionaries
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        features = list(db.project_features.find({"project_id": project_id}))
-        for feature in features:
-            feature['_id'] = str(feature['_id'])
-        return features
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    features = list(db.project_features.find({"project_id": project_id}))
+    for feature in features:
+        feature['_id'] = str(feature['_id'])
+    return features
 
 def get_user_features(user_id):
     """
@@ -67,15 +61,12 @@ def get_user_features(user_id):
         list: List of feature metadata dictionaries
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        features = list(db.project_features.find({"members": {"$in": [user_id]}}))
-        for feature in features:
-            feature['_id'] = str(feature['_id'])
-        return features
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    features = list(db.project_features.find({"members": {"$in": [user_id]}}))
+    for feature in features:
+        feature['_id'] = str(feature['_id'])
+    return features
 
 def add_feature_member(feature_id, user_id):
     """
@@ -89,16 +80,13 @@ def add_feature_member(feature_id, user_id):
         bool: True if successful, False if user already in team
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        result = db.project_features.update_one(
-            {"feature_id": feature_id},
-            {"$addToSet": {"feature_member_ids": user_id}}
-        )
-        return result.modified_count > 0
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$addToSet": {"feature_member_ids": user_id}}
+    )
+    return result.modified_count > 0
 
 def remove_feature_member(feature_id, user_id):
     """
@@ -112,16 +100,13 @@ def remove_feature_member(feature_id, user_id):
         bool: True if successful, False if user not in team
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        result = db.project_features.update_one(
-            {"feature_id": feature_id},
-            {"$pull": {"feature_member_ids": user_id}}
-        )
-        return result.modified_count > 0
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$pull": {"feature_member_ids": user_id}}
+    )
+    return result.modified_count > 0
 
 def delete_feature(feature_id):
     """
@@ -134,13 +119,10 @@ def delete_feature(feature_id):
         bool: True if successful, False if feature not found
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        result = db.project_features.delete_one({"feature_id": feature_id})
-        return result.deleted_count > 0
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.delete_one({"feature_id": feature_id})
+    return result.deleted_count > 0
 
 def update_feature(feature_metadata):
     """
@@ -161,20 +143,17 @@ def update_feature(feature_metadata):
         bool: True if successful, False if feature not found
     """
     from utom_databases.functions import mongo_utils as mongo
-    client = mongo.initialise_mongo_cloud_db_client()
-    try:
-        db = client['utom_features']
-        feature_id = feature_metadata.get('feature_id')
-        if not feature_id:
-            return False
-            
-        result = db.project_features.update_one(
-            {"feature_id": feature_id},
-            {"$set": feature_metadata}
-        )
-        return result.modified_count > 0
-    finally:
-        client.close()
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    feature_id = feature_metadata.get('feature_id')
+    if not feature_id:
+        return False
+        
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$set": feature_metadata}
+    )
+    return result.modified_count > 0
 
 def get_feature_design_brief(feature_id):
     """
@@ -232,3 +211,134 @@ def is_feature_fleshed_out(feature_id):
     # Then check if the flag is True
     return feature_metadata['feature_fleshed_out'] is True
 
+
+"""
+Feature creation checkpoints
+
+generate_feature_details_e2e_one_shot saves the output of each stage on the feature document as
+it finishes, under feature_creation_checkpoints, and marks the last finished stage in
+feature_creation_stage. A rerun after a failure picks the saved outputs back up and starts at
+the first stage without one. Checkpoints belong to the conversation they were generated from and
+are cleared once the feature is fleshed out.
+"""
+FEATURE_CREATION_STAGES = ['user_flows', 'design_brief', 'pages', 'tasks']
+
+def save_feature_creation_checkpoint(feature_id, stage, stage_output, conversation_id=None):
+    """
+    Saves the output of a finished feature creation stage
+    
+    Args:
+        feature_id (str): ID of the feature
+        stage (str): One of FEATURE_CREATION_STAGES
+        stage_output: The stage output to resume from
+        conversation_id (str, optional): The conversation the output was generated from
+        
+    Returns:
+        bool: True if successful, False if feature not found
+    """
+    if stage not in FEATURE_CREATION_STAGES:
+        raise ValueError(f"Unknown feature creation stage '{stage}'")
+    from utom_databases.functions import mongo_utils as mongo
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$set": {
+            f"feature_creation_checkpoints.stages.{stage}": stage_output,
+            "feature_creation_checkpoints.conversation_id": conversation_id,
+            "feature_creation_checkpoints.updated_at": int(time.time()),
+            "feature_creation_stage": stage
+        }}
+    )
+    return result.matched_count > 0
+
+def get_feature_creation_checkpoints(feature_id, conversation_id=None):
+    """
+    Retrieves the saved stage outputs for a feature
+    
+    Args:
+        feature_id (str): ID of the feature
+        conversation_id (str, optional): Only return checkpoints generated from this conversation
+        
+    Returns:
+        dict: Stage name to saved output, empty if there are none
+    """
+    from utom_databases.functions import mongo_utils as mongo
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    feature = db.project_features.find_one(
+        {"feature_id": feature_id},
+        {"feature_creation_checkpoints": 1}
+    )
+    checkpoints = (feature or {}).get('feature_creation_checkpoints') or {}
+    if conversation_id is not None and checkpoints.get('conversation_id') != conversation_id:
+        return {}
+    return checkpoints.get('stages') or {}
+
+def save_feature_screen_checkpoint(feature_id, screen_index, screen_output, conversation_id=None):
+    """
+    Saves the generated page for one screen while the pages stage runs on separate workers
+    
+    Args:
+        feature_id (str): ID of the feature
+        screen_index (int): Position of the screen in the design brief
+        screen_output (dict): The page metadata, or the failure, for the screen
+        conversation_id (str, optional): The conversation the page was generated from
+        
+    Returns:
+        bool: True if successful, False if feature not found
+    """
+    from utom_databases.functions import mongo_utils as mongo
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$set": {
+            f"feature_creation_checkpoints.screens.{int(screen_index)}": screen_output,
+            "feature_creation_checkpoints.conversation_id": conversation_id,
+            "feature_creation_checkpoints.updated_at": int(time.time())
+        }}
+    )
+    return result.matched_count > 0
+
+def get_feature_screen_checkpoints(feature_id, conversation_id=None):
+    """
+    Retrieves the pages saved by save_feature_screen_checkpoint()
+    
+    Args:
+        feature_id (str): ID of the feature
+        conversation_id (str, optional): Only return pages generated from this conversation
+        
+    Returns:
+        dict: Screen index (as a string) to saved output, empty if there are none
+    """
+    from utom_databases.functions import mongo_utils as mongo
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    feature = db.project_features.find_one(
+        {"feature_id": feature_id},
+        {"feature_creation_checkpoints.conversation_id": 1, "feature_creation_checkpoints.screens": 1}
+    )
+    checkpoints = (feature or {}).get('feature_creation_checkpoints') or {}
+    if conversation_id is not None and checkpoints.get('conversation_id') != conversation_id:
+        return {}
+    return checkpoints.get('screens') or {}
+
+def clear_feature_creation_checkpoints(feature_id):
+    """
+    Removes the saved stage outputs for a feature, the stage marker is kept
+    
+    Args:
+        feature_id (str): ID of the feature
+        
+    Returns:
+        bool: True if successful, False if feature not found
+    """
+    from utom_databases.functions import mongo_utils as mongo
+    client = mongo.get_mongo_cloud_db_client()
+    db = client['utom_features']
+    result = db.project_features.update_one(
+        {"feature_id": feature_id},
+        {"$unset": {"feature_creation_checkpoints": ""}}
+    )
+    return result.matched_count > 0
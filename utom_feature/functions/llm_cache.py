@@ -0,0 +1,220 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import json
+import time
+import hashlib
+import datetime
+
+"""
+LLM response cache
+
+Chat completion responses are cached by a hash of the whole request (model, messages,
+response_format, max_completion_tokens and any other parameters), so a retried task that sends
+the same prompts gets the earlier answers back instead of waiting minutes for them again.
+
+Caching is on unless LLM_CACHE_BACKEND is 'off', it picks the store: 'redis' (default), 'mongo'
+or 'off'. Callers whose prompts are meant to give a different answer each time (temperature above
+0), or that are retrying after a bad answer, pass use_cache=False to llm_client. Entries expire after
+LLM_CACHE_TTL_SECONDS, responses bigger than LLM_CACHE_MAX_ENTRY_BYTES are not cached and the
+least recently used entries are evicted past LLM_CACHE_MAX_BYTES.
+"""
+LLM_CACHE_KEY_PREFIX = 'llm_cache'
+
+def llm_cache_key(request):
+    """
+    Build the cache key for a chat completion request.
+
+    Args:
+        request (dict): The arguments for client.chat.completions.create().
+
+    Returns:
+        str: A hex digest of the request.
+    """
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+def get_llm_cache_options():
+    """
+    Read the cache settings from the environment.
+
+    Returns:
+        dict: ttl_seconds, max_entry_bytes and max_bytes.
+    """
+    return {
+        'ttl_seconds': int(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600)),
+        'max_entry_bytes': int(os.getenv('LLM_CACHE_MAX_ENTRY_BYTES', 1024 ** 2)),  # 1MB
+        'max_bytes': int(os.getenv('LLM_CACHE_MAX_BYTES', 256 * 1024 ** 2)),  # 256MB
+    }
+
+class RedisLLMCache:
+    """
+    Responses stored as Redis strings with a TTL. A sorted set of keys by last access and a hash
+    of entry sizes are used to evict the least recently used entries past max_bytes.
+    """
+    def __init__(self, redis_client=None, ttl_seconds=None, max_entry_bytes=None, max_bytes=None, clock=time.time):
+        if redis_client is None:
+            from utom_databases.functions import redis_utils
+            redis_client = redis_utils.get_pooled_redis_client()
+        options = get_llm_cache_options()
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds or options['ttl_seconds']
+        self.max_entry_bytes = max_entry_bytes or options['max_entry_bytes']
+        self.max_bytes = max_bytes or options['max_bytes']
+        self.clock = clock
+        self.lru_key = f"{LLM_CACHE_KEY_PREFIX}:lru"
+        self.sizes_key = f"{LLM_CACHE_KEY_PREFIX}:sizes"
+
+    def _entry_key(self, key):
+        return f"{LLM_CACHE_KEY_PREFIX}:entry:{key}"
+
+    def get(self, key):
+        value = self.redis_client.get(self._entry_key(key))
+        if value is None:
+            return None
+        self.redis_client.zadd(self.lru_key, {key: self.clock()})
+        return json.loads(value)
+
+    def put(self, key, value):
+        data = json.dumps(value, default=str)
+        if len(data) > self.max_entry_bytes:
+            return False
+
+        pipeline = self.redis_client.pipeline()
+        pipeline.set(self._entry_key(key), data, ex=self.ttl_seconds)
+        pipeline.zadd(self.lru_key, {key: self.clock()})
+        pipeline.hset(self.sizes_key, key, len(data))
+        pipeline.execute()
+        self.evict()
+        return True
+
+    def _remove(self, keys):
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        pipeline = self.redis_client.pipeline()
+        pipeline.delete(*[self._entry_key(key) for key in keys])
+        pipeline.zrem(self.lru_key, *keys)
+        pipeline.hdel(self.sizes_key, *keys)
+        pipeline.execute()
+
+    def evict(self):
+        """Drop index entries for expired responses, then the least recently used until the cache fits in max_bytes"""
+        expired_keys = self.redis_client.zrangebyscore(self.lru_key, '-inf', self.clock() - self.ttl_seconds)
+        if expired_keys:
+            self._remove(expired_keys)
+
+        sizes = self.redis_client.hvals(self.sizes_key)
+        total_bytes = sum(int(size) for size in sizes)
+        freed_bytes = 0
+        while total_bytes - freed_bytes > self.max_bytes:
+            oldest = self.redis_client.zrange(self.lru_key, 0, 9)
+            if not oldest:
+                break
+            for key in oldest:
+                if total_bytes - freed_bytes <= self.max_bytes:
+                    break
+                freed_bytes += int(self.redis_client.hget(self.sizes_key, key) or 0)
+                self._remove([key])
+        return freed_bytes
+
+class MongoLLMCache:
+    """
+    Responses stored in a Mongo collection. A TTL index on expires_at removes expired entries and
+    the least recently used are evicted past max_bytes, see mongo_utils.MongoCacheEvictor.
+    """
+    def __init__(self, mongo_client=None, db_name='utom_feature_db', collection_name='llm_response_cache',
+                 ttl_seconds=None, max_entry_bytes=None, max_bytes=None):
+        from utom_databases.functions import mongo_utils as mongo
+        if mongo_client is None:
+            mongo_client = mongo.get_mongo_cloud_db_client()
+        options = get_llm_cache_options()
+        self.collection = mongo_client[db_name][collection_name]
+        self.ttl_seconds = ttl_seconds or options['ttl_seconds']
+        self.max_entry_bytes = max_entry_bytes or options['max_entry_bytes']
+        self.max_bytes = max_bytes or options['max_bytes']
+        self.evictor = mongo.MongoCacheEvictor(self.collection, self.max_bytes)
+        self._indexes_created = False
+
+    def _create_indexes(self):
+        # Also in mongo_utils.MONGO_INDEX_REGISTRY, for workers that create them at boot
+        if not self._indexes_created:
+            # TTL indexes only work on dates, so expires_at is stored as one
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            self.collection.create_index('cache_key', unique=True)
+            self.collection.create_index('last_accessed_at')
+            self._indexes_created = True
+
+    def get(self, key):
+        now = datetime.datetime.utcnow()
+        # The TTL monitor only runs once a minute, so check the expiry here as well
+        doc = self.collection.find_one_and_update(
+            {'cache_key': key, 'expires_at': {'$gt': now}},
+            {'$set': {'last_accessed_at': int(time.time())}},
+            projection={'value': 1}
+        )
+        return doc['value'] if doc else None
+
+    def put(self, key, value):
+        size_bytes = len(json.dumps(value, default=str))
+        if size_bytes > self.max_entry_bytes:
+            return False
+
+        self._create_indexes()
+        self.collection.update_one(
+            {'cache_key': key},
+            {'$set': {
+                'value': value,
+                'size_bytes': size_bytes,
+                'last_accessed_at': int(time.time()),
+                'expires_at': datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl_seconds)
+            }},
+            upsert=True
+        )
+        self.evictor.record_put(size_bytes)
+        return True
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes, returns bytes freed"""
+        return self.evictor.evict()
+
+_llm_cache = None
+
+def get_llm_cache():
+    """
+    Get the process-wide LLM response cache configured by LLM_CACHE_BACKEND.
+
+    Returns:
+        The cache, or None when caching is turned off.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        backend = os.getenv('LLM_CACHE_BACKEND', 'redis').lower()
+        if backend == 'off':
+            return None
+        _llm_cache = MongoLLMCache() if backend == 'mongo' else RedisLLMCache()
+    return _llm_cache
+
+def is_cacheable_response(request, response):
+    """
+    Only cache complete answers: not truncated, not empty, and valid JSON when JSON was asked for,
+    so a retry after a bad answer asks the model again.
+    """
+    if not response.choices:
+        return False
+    choice = response.choices[0]
+    content = (choice.message.content or '').strip()
+    if choice.finish_reason != 'stop' or not content:
+        return False
+    if (request.get('response_format') or {}).get('type') in ('json_object', 'json_schema'):
+        try:
+            json.loads(content)
+        except ValueError:
+            return False
+    return True
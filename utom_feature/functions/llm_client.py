@@ -0,0 +1,236 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import asyncio
+import weakref
+import threading
+import httpx
+import openai
+from openai.types.chat import ChatCompletion
+from utom_feature.functions import llm_rate_limiter
+from utom_feature.functions import llm_cache
+
+"""
+LLM clients
+
+Building an OpenAI client per call means a new connection pool, a new TLS handshake and no
+keep-alive for every request. Instead every call site gets its client from here: one sync client
+and one async client (per event loop) per API key, per process, sharing tuned connection limits,
+timeouts and retries. Chat completions should go through create_chat_completion(), which also
+checks the response cache and waits for the shared rate limit.
+"""
+# Completion tokens counted against the rate limit when a call doesn't set a maximum
+DEFAULT_COMPLETION_TOKEN_ESTIMATE = 1000
+def get_llm_client_options():
+    """
+    Read the client settings from the environment.
+
+    Returns:
+        dict: timeout (seconds), max_retries, max_connections, max_keepalive_connections and
+            keepalive_expiry (seconds).
+    """
+    return {
+        'timeout': float(os.getenv('LLM_TIMEOUT_SECONDS', 300)),
+        'max_retries': int(os.getenv('LLM_MAX_RETRIES', 3)),
+        'max_connections': int(os.getenv('LLM_MAX_CONNECTIONS', 100)),
+        'max_keepalive_connections': int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', 20)),
+        'keepalive_expiry': float(os.getenv('LLM_KEEPALIVE_EXPIRY_SECONDS', 60)),
+    }
+
+def _client_kwargs(api_key, is_async):
+    options = get_llm_client_options()
+    limits = httpx.Limits(
+        max_connections=options['max_connections'],
+        max_keepalive_connections=options['max_keepalive_connections'],
+        keepalive_expiry=options['keepalive_expiry']
+    )
+    http_client_class = openai.DefaultAsyncHttpxClient if is_async else openai.DefaultHttpxClient
+    return {
+        'api_key': api_key,
+        'timeout': options['timeout'],
+        'max_retries': options['max_retries'],
+        'http_client': http_client_class(limits=limits, timeout=options['timeout']),
+    }
+
+def _default_api_key():
+    return os.getenv('OPENAI_API_KEY') or os.getenv('utom_openai_api_key')
+
+_llm_client_registry = {}
+# Async clients per event loop, dropped when the loop is garbage collected
+_async_llm_client_registry = weakref.WeakKeyDictionary()
+_llm_client_registry_lock = threading.Lock()
+
+def _reset_llm_client_registry_after_fork():
+    # Connections can't be shared with a forked child, it builds its own clients
+    global _llm_client_registry_lock
+    _llm_client_registry.clear()
+    _async_llm_client_registry.clear()
+    _llm_client_registry_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_llm_client_registry_after_fork)
+
+def get_openai_client(api_key=None):
+    """
+    Get the process-wide OpenAI client for an API key.
+
+    Args:
+        api_key (str, optional): The API key, defaults to OPENAI_API_KEY (or utom_openai_api_key).
+
+    Returns:
+        OpenAI: A client shared by every caller in this process. Don't close it.
+    """
+    api_key = api_key or _default_api_key()
+    key = ('sync', api_key)
+    client = _llm_client_registry.get(key)
+    if client is None:
+        with _llm_client_registry_lock:
+            client = _llm_client_registry.get(key)
+            if client is None:
+                client = openai.OpenAI(**_client_kwargs(api_key, is_async=False))
+                _llm_client_registry[key] = client
+    return client
+
+def get_async_openai_client(api_key=None):
+    """
+    Get the AsyncOpenAI client for an API key and the running event loop.
+
+    Async connections belong to the event loop they were opened on, so each loop gets its own
+    client.
+
+    Args:
+        api_key (str, optional): The API key, defaults to OPENAI_API_KEY (or utom_openai_api_key).
+
+    Returns:
+        AsyncOpenAI: A client shared by every caller on this event loop. Don't close it.
+    """
+    api_key = api_key or _default_api_key()
+    try:
+        registry = _async_llm_client_registry.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        # Not on a loop yet, the client will be used by whichever loop runs it
+        registry = _llm_client_registry
+    key = ('async', api_key)
+    client = registry.get(key)
+    if client is None:
+        with _llm_client_registry_lock:
+            client = registry.get(key)
+            if client is None:
+                client = openai.AsyncOpenAI(**_client_kwargs(api_key, is_async=True))
+                registry[key] = client
+    return client
+
+def close_llm_clients():
+    """Close the sync clients, e.g. when a worker shuts down. Async clients are dropped with their loop."""
+    with _llm_client_registry_lock:
+        for key, client in list(_llm_client_registry.items()):
+            if key[0] == 'sync':
+                try:
+                    client.close()
+                except Exception as e:
+                    print(f"Warning: Could not close LLM client: {str(e)}")
+        _llm_client_registry.clear()
+        _async_llm_client_registry.clear()
+
+def estimate_chat_completion_tokens(request):
+    """
+    Estimate the tokens a chat completion request counts against the rate limit: the prompt plus
+    the most it may generate.
+    """
+    from utom_feature.processors.transcript_map_reduce import count_tokens
+
+    model = request.get('model', 'gpt-4')
+    prompt_tokens = 0
+    for message in request.get('messages', []):
+        content = message.get('content') or ''
+        if not isinstance(content, str):
+            content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+        prompt_tokens += count_tokens(content, model) + 4
+    completion_tokens = request.get('max_completion_tokens') or request.get('max_tokens') or DEFAULT_COMPLETION_TOKEN_ESTIMATE
+    return prompt_tokens + completion_tokens
+
+def wait_for_rate_limit(model, tokens=0):
+    """Block until a call to the model fits in the shared rate limit, see llm_rate_limiter"""
+    rate_limiter = llm_rate_limiter.get_llm_rate_limiter()
+    if rate_limiter is not None:
+        rate_limiter.acquire(model, tokens)
+
+def _get_cached_chat_completion(request):
+    """
+    Look a request up in the response cache.
+
+    Returns:
+        tuple: (cache, key, cached response or None). cache and key are None when the cache is off
+            or unreachable.
+    """
+    cache = llm_cache.get_llm_cache()
+    if cache is None:
+        return None, None, None
+    try:
+        key = llm_cache.llm_cache_key(request)
+        cached_response = cache.get(key)
+        if cached_response is not None:
+            print(f"LLM cache hit for {request.get('model')}")
+            return cache, key, ChatCompletion.model_validate(cached_response)
+        return cache, key, None
+    except Exception as e:
+        print(f"Warning: LLM cache lookup failed: {str(e)}")
+        return None, None, None
+
+def _cache_chat_completion(cache, key, request, response):
+    if cache is None or not llm_cache.is_cacheable_response(request, response):
+        return
+    try:
+        cache.put(key, response.model_dump())
+    except Exception as e:
+        print(f"Warning: Could not cache LLM response: {str(e)}")
+
+def create_chat_completion(api_key=None, use_cache=True, **request):
+    """
+    Create a chat completion with the shared client. Returns the cached response for an identical
+    earlier request when there is one, otherwise waits for the rate limit and calls the API.
+
+    The cache is on by default (Redis, see llm_cache), so an identical request gets the same answer
+    back until it expires. Pass use_cache=False when retrying after an answer the caller rejected,
+    and for prompts that should vary between calls (temperature above 0).
+
+    Args:
+        api_key (str, optional): The API key, defaults to OPENAI_API_KEY (or utom_openai_api_key).
+        use_cache (bool, optional): Set to False to always call the API and not cache the answer.
+        **request: The arguments for client.chat.completions.create().
+
+    Returns:
+        ChatCompletion: The API response.
+    """
+    cache, key, cached_response = _get_cached_chat_completion(request) if use_cache else (None, None, None)
+    if cached_response is not None:
+        return cached_response
+
+    wait_for_rate_limit(request['model'], estimate_chat_completion_tokens(request))
+    response = get_openai_client(api_key).chat.completions.create(**request)
+
+    _cache_chat_completion(cache, key, request, response)
+    return response
+
+async def create_chat_completion_async(api_key=None, use_cache=True, **request):
+    """Async version of create_chat_completion()"""
+    cache, key, cached_response = _get_cached_chat_completion(request) if use_cache else (None, None, None)
+    if cached_response is not None:
+        return cached_response
+
+    rate_limiter = llm_rate_limiter.get_llm_rate_limiter()
+    if rate_limiter is not None:
+        await rate_limiter.acquire_async(request['model'], estimate_chat_completion_tokens(request))
+    response = await get_async_openai_client(api_key).chat.completions.create(**request)
+
+    _cache_chat_completion(cache, key, request, response)
+    return response
@@ -0,0 +1,148 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import json
+import time
+import random
+import asyncio
+from utom_databases.functions import redis_utils
+
+"""
+LLM rate limiting
+
+Every worker takes from the same pair of Redis token buckets per model before calling the API:
+one for requests and one for tokens, both refilled continuously at the per-minute limit. A call
+that doesn't fit waits until it does instead of being sent and failing with a 429.
+
+Limits are set per model with LLM_RATE_LIMITS, a JSON object like
+    {"gpt-4": {"requests_per_minute": 500, "tokens_per_minute": 30000}}
+which is merged over DEFAULT_LLM_RATE_LIMITS. Models without limits are not limited.
+"""
+DEFAULT_LLM_RATE_LIMITS = {
+    'gpt-4': {'requests_per_minute': 500, 'tokens_per_minute': 30000},
+    'o3-mini': {'requests_per_minute': 500, 'tokens_per_minute': 200000},
+    'whisper-1': {'requests_per_minute': 500},
+}
+LLM_RATE_LIMIT_KEY_PREFIX = 'llm_rate_limit'
+# Longest single sleep, so waiting callers notice freed capacity reasonably quickly
+MAX_RATE_LIMIT_SLEEP_SECONDS = 5.0
+
+def get_llm_rate_limits():
+    """
+    Read the per-model limits from the environment.
+
+    Returns:
+        dict: {model: {'requests_per_minute': int, 'tokens_per_minute': int}}, either limit may be missing.
+    """
+    rate_limits = {model: dict(limits) for model, limits in DEFAULT_LLM_RATE_LIMITS.items()}
+    configured_limits = os.getenv('LLM_RATE_LIMITS')
+    if configured_limits:
+        try:
+            for model, limits in json.loads(configured_limits).items():
+                rate_limits.setdefault(model, {}).update(limits)
+        except (ValueError, AttributeError) as e:
+            print(f"Warning: Could not parse LLM_RATE_LIMITS: {str(e)}")
+    return rate_limits
+
+class LLMRateLimiter:
+    """
+    Distributed requests/min and tokens/min limiter.
+
+    Example:
+        rate_limiter.acquire('gpt-4', tokens=2500)  # blocks until the call fits in the budget
+        response = client.chat.completions.create(model='gpt-4', ...)
+    """
+    def __init__(self, redis_client=None, rate_limits=None, clock=time.time, sleep=time.sleep):
+        self.redis_client = redis_client
+        self.rate_limits = rate_limits if rate_limits is not None else get_llm_rate_limits()
+        self.clock = clock
+        self.sleep = sleep
+
+    def _get_redis_client(self):
+        if self.redis_client is None:
+            self.redis_client = redis_utils.get_pooled_redis_client()
+        return self.redis_client
+
+    def _buckets(self, model, tokens):
+        limits = self.rate_limits.get(model) or {}
+        keys, capacities, refill_rates, amounts = [], [], [], []
+        for limit_name, amount in (('requests_per_minute', 1), ('tokens_per_minute', tokens)):
+            per_minute = limits.get(limit_name)
+            if per_minute and amount:
+                keys.append(f"{LLM_RATE_LIMIT_KEY_PREFIX}:{model}:{limit_name}")
+                capacities.append(per_minute)
+                refill_rates.append(per_minute / 60.0)
+                amounts.append(amount)
+        return keys, capacities, refill_rates, amounts
+
+    def try_acquire(self, model, tokens=0):
+        """
+        Take one request and some tokens from the model's budget if they fit right now.
+
+        Returns:
+            float: 0 if they were taken, otherwise the seconds until they would fit.
+        """
+        keys, capacities, refill_rates, amounts = self._buckets(model, tokens)
+        if not keys:
+            return 0.0
+        try:
+            return redis_utils.take_from_token_buckets(self._get_redis_client(), keys, capacities, refill_rates, amounts, self.clock())
+        except Exception as e:
+            # Without Redis we can't coordinate, so let the call through rather than stall every worker
+            print(f"Warning: LLM rate limiter unavailable, not limiting: {str(e)}")
+            return 0.0
+
+    def _next_sleep(self, wait):
+        # Jitter so workers that were waiting for the same refill don't all retry at once
+        return min(wait, MAX_RATE_LIMIT_SLEEP_SECONDS) * random.uniform(1.0, 1.1)
+
+    def acquire(self, model, tokens=0):
+        """
+        Block until one request and some tokens fit in the model's budget, then take them.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        waited = 0.0
+        wait = self.try_acquire(model, tokens)
+        while wait > 0:
+            sleep_seconds = self._next_sleep(wait)
+            self.sleep(sleep_seconds)
+            waited += sleep_seconds
+            wait = self.try_acquire(model, tokens)
+        if waited:
+            print(f"Waited {waited:.1f}s for the {model} rate limit")
+        return waited
+
+    async def acquire_async(self, model, tokens=0):
+        """Async version of acquire()"""
+        waited = 0.0
+        wait = self.try_acquire(model, tokens)
+        while wait > 0:
+            sleep_seconds = self._next_sleep(wait)
+            await asyncio.sleep(sleep_seconds)
+            waited += sleep_seconds
+            wait = self.try_acquire(model, tokens)
+        return waited
+
+_llm_rate_limiter = None
+
+def get_llm_rate_limiter():
+    """
+    Get the process-wide rate limiter, or None when LLM_RATE_LIMIT_ENABLED is off.
+    """
+    global _llm_rate_limiter
+    if os.getenv('LLM_RATE_LIMIT_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if _llm_rate_limiter is None:
+        _llm_rate_limiter = LLMRateLimiter()
+    return _llm_rate_limiter
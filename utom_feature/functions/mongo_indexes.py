@@ -0,0 +1,44 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import time
+import dramatiq
+from utom_databases.functions import mongo_utils as mongo
+
+"""
+Mongo indexes at worker boot
+
+Workers make sure the indexes their tasks query on exist as soon as they boot, see the index
+registry in mongo_utils. Processes that only send tasks never touch the indexes.
+"""
+
+class EnsureMongoIndexes(dramatiq.Middleware):
+    """
+    dramatiq middleware that runs mongo_utils.ensure_mongo_indexes() once per worker process.
+
+    Example:
+        broker.add_middleware(EnsureMongoIndexes(mongo.get_mongo_index_specs('task_logs', 'project_features')))
+    """
+    def __init__(self, index_specs=None, client=None):
+        self.index_specs = index_specs
+        self.client = client
+
+    def after_worker_boot(self, broker, worker):
+        if os.getenv('MONGO_ENSURE_INDEXES_AT_BOOT', 'true').lower() not in ('1', 'true', 'yes'):
+            return
+        start = time.time()
+        try:
+            result = mongo.ensure_mongo_indexes(self.index_specs, client=self.client)
+            print(f"Ensured {len(result['ensured'])} Mongo indexes in {time.time() - start:.1f}s, {len(result['failed'])} failed")
+        except Exception as e:
+            # Queries still work without the indexes, so the worker can still come up
+            print(f"Warning: Could not ensure Mongo indexes: {str(e)}")
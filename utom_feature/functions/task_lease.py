@@ -0,0 +1,171 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+## Derive the BASE_DIR based on the current file location
+import os
+import sys
+temp = os.path.dirname(os.path.abspath(__file__))
+vals = temp.split('/')
+BASE_DIR = '/'.join(vals[:-2])
+BASE_DIR = '%s/' % BASE_DIR
+sys.path.insert(0, BASE_DIR)
+
+import socket
+import threading
+import dramatiq
+from dramatiq.middleware import CurrentMessage
+from utom_databases.functions import mongo_utils as mongo
+
+"""
+Task leases
+
+A dramatiq message can be delivered to more than one worker (e.g. a redelivery after a lost ack).
+Workers claim the task log atomically before doing any work, hold the claim as a lease that a
+heartbeat keeps extending, and a task whose lease has lapsed can be reclaimed by another worker.
+"""
+# How long a claim is valid for without a heartbeat, and how often the heartbeat extends it
+DEFAULT_TASK_LEASE_SECONDS = 120
+DEFAULT_TASK_LEASE_HEARTBEAT_SECONDS = 30
+# A task log in one of these will never be claimed again, so its messages can be acked
+TASK_TERMINAL_STATUSES = ('completed', 'failed')
+# How many times a message waits for another worker's lease without it counting against the
+# actor's max_retries, past this the waits are counted like failures
+MAX_TASK_LEASE_WAITS = 10
+
+def get_worker_id():
+    """
+    Build an id that is unique to the current worker thread.
+
+    Returns:
+        str: '<hostname>:<pid>:<thread id>'
+    """
+    return '%s:%s:%s' % (socket.gethostname(), os.getpid(), threading.get_ident())
+
+def claim_task(mongo_client, db_name, collection_name, task_id_str, worker_id, claimed_task_json=None, lease_seconds=DEFAULT_TASK_LEASE_SECONDS,
+               heartbeat_seconds=DEFAULT_TASK_LEASE_HEARTBEAT_SECONDS, claimable_task_stages=None):
+    """
+    Claim a task log for this worker, see mongo_utils.claim_task_log_lease().
+
+    When the task can't be claimed, a finished task is a duplicate delivery that can be acked,
+    but a task held by another worker's live lease is retried once that lease could have lapsed:
+    if the other worker crashed, the retry reclaims the task instead of the message being dropped.
+    Up to MAX_TASK_LEASE_WAITS of these retries are counted in the message's task_lease_waits
+    option instead of its retries, so waiting for a lease can't use up the actor's max_retries.
+
+    Args:
+        mongo_client (MongoClient): A MongoDB client instance.
+        db_name (str): The name of the MongoDB database.
+        collection_name (str): The name of the task logs collection.
+        task_id_str (str): The task id to claim.
+        worker_id (str): The id of the claiming worker.
+        claimed_task_json (dict, optional): Extra fields to set on the task log when it is claimed.
+        lease_seconds (int, optional): How long the claim is valid for without a heartbeat.
+        heartbeat_seconds (int, optional): How often the lease holder extends its lease.
+        claimable_task_stages (list, optional): The task stages the lease covers. A task that has
+            moved on to another stage is treated like a finished one, see mongo_utils.claim_task_log_lease().
+
+    Returns:
+        bool: True if this worker now owns the task, False if the task is already finished, has moved
+            past claimable_task_stages or has no task log.
+
+    Raises:
+        dramatiq.Retry: If another worker holds the task, so the message is retried later.
+    """
+    claimed_task = mongo.claim_task_log_lease(mongo_client, db_name, collection_name, task_id_str, worker_id, lease_seconds, claimed_task_json,
+                                              claimable_task_stages=claimable_task_stages)
+    if claimed_task is not None:
+        return True
+
+    task_log = mongo_client[db_name][collection_name].find_one({'task_id': task_id_str}, {'task_status': 1, 'task_stage': 1, 'task_lease_worker_id': 1})
+    if task_log is None or task_log.get('task_status') in TASK_TERMINAL_STATUSES:
+        return False
+    if claimable_task_stages is not None and task_log.get('task_stage') not in [None] + list(claimable_task_stages):
+        return False
+
+    message = CurrentMessage.get_current_message()
+    if message is not None and message.options.get('task_lease_waits', 0) < MAX_TASK_LEASE_WAITS:
+        message.options['task_lease_waits'] = message.options.get('task_lease_waits', 0) + 1
+        # The Retries middleware counts this retry, so take it back off
+        message.options['retries'] = message.options.get('retries', 0) - 1
+    raise dramatiq.Retry(
+        'Task ID %s is held by worker ID %s' % (task_id_str, task_log.get('task_lease_worker_id')),
+        delay=(lease_seconds + heartbeat_seconds) * 1000
+    )
+
+def finish_task(mongo_client, db_name, collection_name, task_id_str, worker_id, updated_task_json, heartbeat=None):
+    """
+    Write the final status and results of a claimed task, unless this worker lost its lease.
+
+    Args:
+        mongo_client (MongoClient): A MongoDB client instance.
+        db_name (str): The name of the MongoDB database.
+        collection_name (str): The name of the task logs collection.
+        task_id_str (str): The claimed task id.
+        worker_id (str): The id of the worker that claimed the task.
+        updated_task_json (dict): The fields to set on the task log.
+        heartbeat (TaskLeaseHeartbeat, optional): The heartbeat that kept the lease while the task ran.
+
+    Returns:
+        bool: True if the task log was updated.
+    """
+    if heartbeat is not None and heartbeat.lease_lost:
+        print(f"Warning: Worker ID {worker_id} lost the lease for task ID {task_id_str}, not writing its results")
+        return False
+
+    for attempt in range(2):
+        try:
+            # The pooled client reconnects on its own, so it is safe to reuse after a long task
+            if mongo.update_task_log_if_lease_held(mongo_client, db_name, collection_name, task_id_str, worker_id, updated_task_json):
+                return True
+            print(f"Warning: Worker ID {worker_id} no longer holds the lease for task ID {task_id_str}, not writing its results")
+            return False
+        except Exception as e:
+            print(f"Warning: Could not update task status in MongoDB: {str(e)}")
+    return False
+
+class TaskLeaseHeartbeat:
+    """
+    Context manager that keeps extending a task lease from a background thread while the task runs.
+
+    Example:
+        with TaskLeaseHeartbeat(mongo_client, db_name, collection_name, task_id_str, worker_id):
+            run_the_task()
+    """
+    def __init__(self, mongo_client, db_name, collection_name, task_id_str, worker_id,
+                 lease_seconds=DEFAULT_TASK_LEASE_SECONDS, heartbeat_seconds=DEFAULT_TASK_LEASE_HEARTBEAT_SECONDS):
+        self.mongo_client = mongo_client
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.task_id_str = task_id_str
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease_lost = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.heartbeat_seconds):
+            try:
+                extended = mongo.extend_task_log_lease(self.mongo_client, self.db_name, self.collection_name, self.task_id_str, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"Warning: Could not extend the lease for task ID {self.task_id_str}: {str(e)}")
+                continue
+
+            if not extended:
+                self.lease_lost = True
+                print(f"Warning: Worker ID {self.worker_id} no longer holds the lease for task ID {self.task_id_str}")
+                return
+
+    def __enter__(self):
+        # Without a mongo client there is no lease to keep alive
+        if self.mongo_client is not None:
+            self._thread = threading.Thread(target=self._run, name='task-lease-heartbeat-%s' % self.task_id_str, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        return False
@@ -144,11 +144,6 @@ def process_video_task(task_id: str) -> Dict[str, Any]:
             )
             
         return {"success": False, "error": str(e)}
-        
-    finally:
-        # Close MongoDB connection
-        if "mongodb_client" in locals():
-            mongodb_client.close()
 
 """
 Running
@@ -22,6 +22,10 @@ from utom_utils.functions import env_utils
 from utom_utils.functions import dramatiq_task_funcs as dram_task
 from utom_databases.functions import rabbitmq_utils as rabbit_mq
 from utom_databases.functions import mongo_utils as mongo
+from utom_feature.functions import task_lease
+from utom_feature.functions import llm_client
+from utom_feature.functions import claim_check
+from utom_feature.functions.mongo_indexes import EnsureMongoIndexes
 from utom_feature.processors.video import process_video, cleanup_files
 from utom_feature.processors.transcription import transcribe_audio
 from utom_feature.processors.action_points import extract_action_points, format_action_points
@@ -36,17 +40,19 @@ env_utils.load_in_env_vars()
 rabbitmq_server_ip_address = '95.216.155.137'
 rabbitmq_server_username = 'utom'
 rabbitmq_server_password = 'utom2024'
-broker = RabbitmqBroker(url="amqp://%s:%s@%s:5672" % (rabbitmq_server_username, rabbitmq_server_password, rabbitmq_server_ip_address))
+# confirm_delivery makes send() wait for the broker to accept the message
+broker = RabbitmqBroker(url="amqp://%s:%s@%s:5672" % (rabbitmq_server_username, rabbitmq_server_password, rabbitmq_server_ip_address), confirm_delivery=True)
 
 # Initialise rabbitmq and mongo connections
-mongo_client = mongo.initialise_mongo_cloud_db_client()
+mongo_client = mongo.get_mongo_cloud_db_client()
 channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
 print('Initialised rabbitmq and mongo connections')
 rabbit_mq.check_if_rabbitmq_server_is_active()
 
 # Function to be called at application shutdown
 def close_connections():
-    mongo_client.close()
+    mongo.close_pooled_mongo_clients()
+    llm_client.close_llm_clients()
     channel.close()
 
 # Register the function to be called at exit
@@ -54,7 +60,11 @@ atexit.register(close_connections)
 
 # Set the dramatiq broker and add messaging
 dramatiq.set_broker(broker)
+# Large message payloads go through Mongo/S3 instead of RabbitMQ, senders import this module too
+claim_check.install_claim_check_encoder()
 dramatiq.get_broker().add_middleware(CurrentMessage())
+# Index the task log lookup keys when a worker boots
+dramatiq.get_broker().add_middleware(EnsureMongoIndexes(mongo.get_mongo_index_specs('video_task_logs', 'transcription_cache', 'llm_response_cache')))
 
 # Define your task
 @dramatiq.actor(queue_name="utom_video_processing_task_queue", max_retries=1, time_limit=1200000) # 20 minutes timeout
@@ -62,122 +72,103 @@ def process_video_task(data):
     """
     Get the task worker and message details
     """
-    worker_id = '111'
+    worker_id = task_lease.get_worker_id()
     local_machine_public_ip = '127.0.0.1'  # Use localhost for local testing
     
     msg = CurrentMessage.get_current_message()
     args_tuple = msg.args
     task_message_dict = json.loads(args_tuple[0])
 
-    # - Get task details
+    task_id_str = task_message_dict['task_id']
+    task_log_service_mongo_db_name = 'utom_video_processing_db'  # New database for video processing
+    task_logs_collection_name = 'video_task_logs'  # New collection for video tasks
+    task_started_count_collection_name = 'video_task_started_count'  # New collection for tracking started tasks
+
+    """
+    Calculate initial time params on the task
+    """
+    # Get send time
+    task_send_time = int(task_message_dict['task_send_time'])
+    
+    # Get params at the start of the task
+    task_pickup_time = int(time.time())
+    task_time_to_pickup = int(task_pickup_time - task_send_time)
+
+    """   
+    Claim the task, this atomically moves it from sent to started so duplicate deliveries are skipped
+    """
+    claimed_task_json = {
+        'task_pickup_time': task_pickup_time,
+        'task_time_to_pickup': task_time_to_pickup,
+        'task_pickup_local_machine_public_ip': local_machine_public_ip,
+        'task_pickup_worker_id': worker_id,
+    }
     try:
-        mongo_client = mongo.initialise_mongo_cloud_db_client()
-        task_id_str = task_message_dict['task_id']
-        task_log_service_mongo_db_name = 'utom_video_processing_db'  # New database for video processing
-        task_logs_collection_name = 'video_task_logs'  # New collection for video tasks
-        task_started_count_collection_name = 'video_task_started_count'  # New collection for tracking started tasks
-        
-        # Try to get task from MongoDB
-        try:
-            filter_criteria = {
-                'task_id': task_id_str
-            }
-            db_task_message_dict = mongo.get_documents_by_filter_criteria(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, filter_criteria)[0]
-            db_task_status = db_task_message_dict['task_status']
-            
-            if db_task_status == 'sent':
-                can_process_task = True
-            else:
-                can_process_task = False
-        except Exception as e:
-            print(f"Warning: Could not get task from MongoDB: {str(e)}")
-            # Assume we can process the task if we can't check MongoDB
-            can_process_task = True
+        mongo_client = mongo.get_mongo_cloud_db_client()
+        can_process_task = task_lease.claim_task(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id, claimed_task_json)
+    except dramatiq.Retry:
+        # Another worker holds the task, the message comes back once its lease could have lapsed
+        raise
     except Exception as e:
-        print(f"Warning: Could not connect to MongoDB: {str(e)}")
+        print(f"Warning: Could not claim task in MongoDB: {str(e)}")
         # Assume we can process the task if we can't connect to MongoDB
         can_process_task = True
         mongo_client = None
 
     if can_process_task:
-        """
-        Calculate initial time params on the task
-        """
-        # Get send time
-        task_send_time = int(task_message_dict['task_send_time'])
-        
-        # Get params at the start of the task
-        task_pickup_time = int(time.time())
-        task_time_to_pickup = int(task_pickup_time - task_send_time)
-
-        """   
-        Update the task logs that the task has been picked up
-        """
         if mongo_client:
-            task_status = 'started'
-            updated_task_json = {
-                'task_status': task_status,
-                'task_pickup_time': task_pickup_time,
-                'task_time_to_pickup': task_time_to_pickup,
-                'task_pickup_local_machine_public_ip': local_machine_public_ip,
-                'task_pickup_worker_id': worker_id,
-            }
-            
-            task_id_key_name = 'task_id'
-            
             try:
-                mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-                
                 # Update the task started count
                 dram_task.update_task_started_count(mongo_client, task_log_service_mongo_db_name, task_started_count_collection_name, task_id_str)
             except Exception as e:
-                print(f"Warning: Could not update task status in MongoDB: {str(e)}")
+                print(f"Warning: Could not update task started count in MongoDB: {str(e)}")
 
         """
         Execute on the task
         """
-        try:
-            print(f"Starting video processing task for task ID: {task_id_str}")
+        with task_lease.TaskLeaseHeartbeat(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id) as heartbeat:
+            try:
+                print(f"Starting video processing task for task ID: {task_id_str}")
             
-            # Get video URL from task data
-            video_url = task_message_dict.get('video_url')
-            if not video_url:
-                raise ValueError("No video URL provided in task data")
+                # Get video URL from task data
+                video_url = task_message_dict.get('video_url')
+                if not video_url:
+                    raise ValueError("No video URL provided in task data")
             
-            # Process video
-            video_result = process_video(video_url)
-            if not video_result.get("success"):
-                raise Exception(video_result.get("error", "Failed to process video"))
+                # Process video
+                video_result = process_video(video_url)
+                if not video_result.get("success"):
+                    raise Exception(video_result.get("error", "Failed to process video"))
                 
-            video_path = video_result["video_path"]
-            audio_path = video_result["audio_path"]
+                video_path = video_result["video_path"]
+                audio_path = video_result["audio_path"]
             
-            try:
-                # Transcribe audio
-                transcription_result = transcribe_audio(audio_path)
-                if not transcription_result.get("success"):
-                    raise Exception(transcription_result.get("error", "Failed to transcribe audio"))
+                try:
+                    # Transcribe audio
+                    transcription_result = transcribe_audio(audio_path)
+                    if not transcription_result.get("success"):
+                        raise Exception(transcription_result.get("error", "Failed to transcribe audio"))
                     
-                # Extract action points
-                action_points_result = extract_action_points(transcription_result)
-                if not action_points_result.get("success"):
-                    raise Exception(action_points_result.get("error", "Failed to extract action points"))
+                    # Extract action points
+                    action_points_result = extract_action_points(transcription_result)
+                    if not action_points_result.get("success"):
+                        raise Exception(action_points_result.get("error", "Failed to extract action points"))
                     
-                # Format results
-                formatted_points = format_action_points(action_points_result)
+                    # Format results
+                    formatted_points = format_action_points(action_points_result)
                 
-                task_message = 'Video processing task completed successfully'
-                task_status = 'completed'
-                print(f"Task completed successfully for task ID: {task_id_str}")
+                    task_message = 'Video processing task completed successfully'
+                    task_status = 'completed'
+                    print(f"Task completed successfully for task ID: {task_id_str}")
                 
-            finally:
-                # Clean up temporary files
-                cleanup_files(video_path, audio_path)
+                finally:
+                    # Clean up temporary files
+                    cleanup_files(video_path, audio_path)
                 
-        except Exception as e:
-            task_message = f'There was an error: {str(e)}'
-            print(task_message)
-            task_status = 'failed'
+            except Exception as e:
+                task_message = f'There was an error: {str(e)}'
+                print(task_message)
+                task_status = 'failed'
     
         """
         Calculate post process time params
@@ -214,19 +205,11 @@ def process_video_task(data):
         Update the task logs
         """
         if mongo_client:
-            try:
-                # Given how long the processing takes, we reinitialize the mongo_client at this point
-                mongo_client = mongo.initialise_mongo_cloud_db_client()
-                mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-            except Exception as e:
-                print(f"Warning: Could not update task status in MongoDB: {str(e)}")
-                try:
-                    mongo_client = mongo.initialise_mongo_cloud_db_client()
-                    mongo.update_document_in_mongo_by_document_id_str(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_id_key_name, task_id_str, updated_task_json)
-                except Exception as e:
-                    print(f"Warning: Could not update task status in MongoDB after retry: {str(e)}")
+            # Only written while this worker still holds the lease, a worker that lost it must not
+            # overwrite the status and results of the worker that reclaimed the task
+            task_lease.finish_task(mongo.get_mongo_cloud_db_client(), task_log_service_mongo_db_name, task_logs_collection_name, task_id_str, worker_id, updated_task_json, heartbeat)
 
     if can_process_task:
         print(f"Task ID: {task_id_str}, Worker ID: {worker_id} was able to be processed and completed successfully")
     else:
-        print(f"Task ID: {task_id_str}, Worker ID: {worker_id} seems to be a duplicate as the task was already started by another worker") 
\ No newline at end of file
+        print(f"Task ID: {task_id_str}, Worker ID: {worker_id} is a duplicate as the task was already finished") 
\ No newline at end of file
@@ -23,8 +23,8 @@ def send_video_processing_task(video_url: str, webhook_url: Optional[str] = None
         # Load environment variables
         env_utils.load_in_env_vars()
         
-        # Initialize MongoDB client
-        mongo_client = mongo.initialise_mongo_cloud_db_client()
+        # Get the pooled MongoDB client
+        mongo_client = mongo.get_mongo_cloud_db_client()
         
         # Generate task ID and timestamp
         task_id = str(uuid.uuid4())
@@ -57,15 +57,8 @@ def send_video_processing_task(video_url: str, webhook_url: Optional[str] = None
         # Insert task log into MongoDB
         mongo.insert_document_into_mongo(mongo_client, task_log_service_mongo_db_name, task_logs_collection_name, task_log)
         
-        # Initialize RabbitMQ channel
-        channel = rabbit_mq.initialize_rabbitmq_client_and_create_channel()
-        
-        # Send task to queue
-        channel.basic_publish(
-            exchange='',
-            routing_key="utom_video_processing_task_queue",
-            body=task_message_json
-        )
+        # Send task to queue over the shared publisher
+        rabbit_mq.get_rabbitmq_publisher().publish("utom_video_processing_task_queue", task_message_json)
         
         # Update task status to sent
         mongo.update_document_in_mongo_by_document_id_str(
@@ -107,10 +100,4 @@ def send_video_processing_task(video_url: str, webhook_url: Optional[str] = None
             "success": False,
             "error": str(e)
         }
-        
-    finally:
-        # Close connections
-        if "mongo_client" in locals():
-            mongo_client.close()
-        if "channel" in locals():
-            channel.close() 
\ No newline at end of file
+ 
\ No newline at end of file
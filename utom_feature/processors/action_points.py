@@ -1,8 +1,9 @@
 import os
 import json
 import logging
-import openai
 from dotenv import load_dotenv
+from utom_feature.functions import llm_client
+from utom_feature.processors.transcript_map_reduce import chunk_transcript, map_chunks, dedupe_items
 
 # Load environment variables
 load_dotenv()
@@ -11,12 +12,11 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_action_points(transcription: str) -> dict:
-    """Extract detailed action points and tasks from video transcription"""
-    try:
-        logger.info("Extracting action points from transcription...")
-        
-        prompt = f"""
+PRIORITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+
+def _extract_chunk_action_points(transcription: str) -> dict:
+    """Extract action points, key points and risks from one transcript chunk"""
+    prompt = f"""
         Analyze the following video transcription and extract detailed, specific, and actionable tasks.
         Break down each task into clear, executable steps with assigned responsibilities.
 
@@ -73,21 +73,80 @@ def extract_action_points(transcription: str) -> dict:
         - Timelines should be REALISTIC and SPECIFIC
         - Success criteria must be MEASURABLE
         """
+
+    response = llm_client.create_chat_completion(
+        model="gpt-4",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are an expert project manager and business analyst, skilled at converting information into actionable tasks and strategic insights."
+            },
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        use_cache=False
+    )
+    
+    return json.loads(response.choices[0].message.content)
+
+def _merge_duplicate_action_points(kept: dict, duplicate: dict) -> dict:
+    """Keep the higher of the two priorities when the same task comes up in two chunks"""
+    if PRIORITY_ORDER.get(duplicate.get("priority"), 1) < PRIORITY_ORDER.get(kept.get("priority"), 1):
+        return dict(kept, priority=duplicate["priority"])
+    return kept
+
+def reduce_action_points(chunk_points: list) -> dict:
+    """
+    Merge the results for each transcript chunk into one, in chunk order.
+
+    Tasks, key points and risks that came up in more than one chunk are only kept once, the
+    chunk summaries are joined and the context of the first chunk is used.
+    """
+    if len(chunk_points) == 1:
+        return chunk_points[0]
+
+    risk_assessment = {}
+    for points in chunk_points:
+        for risk_type, risks in (points.get("risk_assessment") or {}).items():
+            risk_assessment.setdefault(risk_type, []).extend(risks)
+
+    return {
+        "action_points": dedupe_items(
+            [action for points in chunk_points for action in points.get("action_points", [])],
+            key_func=lambda action: action.get("task", ""),
+            merge_func=_merge_duplicate_action_points
+        ),
+        "key_points": dedupe_items(
+            [key_point for points in chunk_points for key_point in points.get("key_points", [])],
+            key_func=lambda key_point: key_point.get("insight", "")
+        ),
+        "context": next((points["context"] for points in chunk_points if points.get("context")), ""),
+        "summary": " ".join(points["summary"] for points in chunk_points if points.get("summary")),
+        "risk_assessment": {risk_type: dedupe_items(risks) for risk_type, risks in risk_assessment.items()}
+    }
+
+def extract_action_points(transcription) -> dict:
+    """
+    Extract detailed action points and tasks from video transcription.
+
+    Long transcripts are split into chunks on segment boundaries, the chunks are analysed
+    concurrently, and the results are merged with duplicates removed.
+
+    Args:
+        transcription: The transcript text, or a transcription result with 'text' and 'segments'.
+    """
+    try:
+        chunks = chunk_transcript(transcription)
+        logger.info(f"Extracting action points from transcription in {len(chunks)} chunks...")
         
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert project manager and business analyst, skilled at converting information into actionable tasks and strategic insights."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        result = json.loads(response.choices[0].message.content)
+        chunk_results = map_chunks(chunks, _extract_chunk_action_points)
+        failures = [chunk_result["error"] for chunk_result in chunk_results if not chunk_result["success"]]
+        if len(failures) == len(chunk_results):
+            raise Exception(failures[0] if failures else "Transcription is empty")
+        if failures:
+            logger.warning(f"{len(failures)} of {len(chunk_results)} transcript chunks failed, continuing with the rest")
+
+        result = reduce_action_points([chunk_result["result"] for chunk_result in chunk_results if chunk_result["success"]])
         logger.info("Successfully extracted action points and tasks")
         return {"success": True, "points": result}
         
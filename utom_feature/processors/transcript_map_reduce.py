@@ -0,0 +1,126 @@
+import os
+import re
+import logging
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Union, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Configure logging to match organization's style
+logger = logging.getLogger(__name__)
+
+# Transcript chunks are kept well under the model context so the prompt and answer fit alongside
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv('TRANSCRIPT_CHUNK_TOKENS', 3000))
+# How many chunks are sent to the LLM at the same time
+TRANSCRIPT_MAP_CONCURRENCY = int(os.getenv('TRANSCRIPT_MAP_CONCURRENCY', 8))
+# Items whose normalized text is at least this similar are treated as the same item
+DUPLICATE_SIMILARITY = 0.85
+
+def count_tokens(text: str, model: str = 'gpt-4') -> int:
+    """Count tokens with tiktoken when it is installed, otherwise estimate ~4 characters a token"""
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(model).encode(text))
+        except KeyError:
+            return len(tiktoken.get_encoding('cl100k_base').encode(text))
+    return max(1, len(text) // 4)
+
+def _transcript_units(transcription: Union[str, Dict[str, Any]]) -> List[str]:
+    """Split a transcript into the pieces chunks are built from: segments when we have them, otherwise sentences"""
+    if isinstance(transcription, dict):
+        segments = transcription.get('segments') or []
+        if segments:
+            return [segment['text'].strip() for segment in segments if segment.get('text', '').strip()]
+        transcription = transcription.get('text', '')
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', transcription.strip()) if sentence]
+
+def chunk_transcript(transcription: Union[str, Dict[str, Any]], max_tokens: int = TRANSCRIPT_CHUNK_TOKENS, model: str = 'gpt-4') -> List[str]:
+    """
+    Split a transcript into chunks of at most max_tokens, only breaking between segments (or
+    sentences for plain text). A single segment longer than max_tokens is split between words.
+
+    Args:
+        transcription: The transcript text, or a transcription result with 'segments'.
+        max_tokens: The token budget for each chunk.
+        model: The model whose tokenizer is used for counting.
+
+    Returns:
+        list: The transcript chunks, in order.
+    """
+    chunks = []
+    current_units = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current_units, current_tokens
+        if current_units:
+            chunks.append(' '.join(current_units))
+        current_units, current_tokens = [], 0
+
+    for unit in _transcript_units(transcription):
+        unit_tokens = count_tokens(unit, model)
+        if unit_tokens > max_tokens:
+            flush()
+            words = unit.split()
+            words_per_chunk = max(1, len(words) * max_tokens // unit_tokens)
+            for i in range(0, len(words), words_per_chunk):
+                chunks.append(' '.join(words[i:i + words_per_chunk]))
+            continue
+
+        if current_tokens + unit_tokens > max_tokens:
+            flush()
+        current_units.append(unit)
+        current_tokens += unit_tokens
+    flush()
+
+    return chunks
+
+def map_chunks(chunks: List[str], map_func: Callable[[str], Any], max_concurrency: int = TRANSCRIPT_MAP_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    Run map_func over every chunk with at most max_concurrency calls in flight.
+
+    Returns:
+        list: One {'success': True, 'result': ...} or {'success': False, 'error': ...} per chunk, in
+            chunk order, so one failing chunk doesn't lose the others.
+    """
+    def run(chunk):
+        try:
+            return {'success': True, 'result': map_func(chunk)}
+        except Exception as e:
+            logger.error(f"Error processing transcript chunk: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    if len(chunks) == 1:
+        return [run(chunks[0])]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks)))) as executor:
+        return list(executor.map(run, chunks))
+
+def normalize_item_text(text: str) -> str:
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(text).lower()).split())
+
+def dedupe_items(items: List[Any], key_func: Callable[[Any], str] = str,
+                 merge_func: Optional[Callable[[Any, Any], Any]] = None) -> List[Any]:
+    """
+    Drop items that repeat an earlier one, e.g. an action point mentioned in two chunks.
+
+    Two items are duplicates when their key texts match after normalizing case, punctuation and
+    whitespace, or are at least DUPLICATE_SIMILARITY similar. merge_func(kept, duplicate) can
+    return a combined item to keep in place of the first one.
+    """
+    kept_items = []
+    kept_keys = []
+    for item in items:
+        key = normalize_item_text(key_func(item))
+        for i, kept_key in enumerate(kept_keys):
+            if key == kept_key or SequenceMatcher(None, key, kept_key).ratio() >= DUPLICATE_SIMILARITY:
+                if merge_func is not None:
+                    kept_items[i] = merge_func(kept_items[i], item)
+                break
+        else:
+            kept_items.append(item)
+            kept_keys.append(key)
+    return kept_items
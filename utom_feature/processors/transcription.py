@@ -1,7 +1,8 @@
 import os
-from openai import OpenAI
 import logging
 from typing import Dict, Any
+from utom_feature.functions import llm_client
+from utom_feature.processors.transcription_cache import cached_transcription
 
 # Configure logging to match organization's style
 logger = logging.getLogger(__name__)
@@ -22,26 +23,39 @@ def transcribe_audio(audio_path: str) -> Dict[str, Any]:
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
             
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Get the shared OpenAI client
+        client = llm_client.get_openai_client(api_key)
         
-        # Open audio file and transcribe using Whisper API
-        logger.info(f"Transcribing audio file: {audio_path}")
-        with open(audio_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="verbose_json"
-            )
-        
-        # Extract transcription text and metadata
-        transcription = {
-            "success": True,
-            "text": response.text,
-            "language": getattr(response, 'language', 'unknown'),
-            "duration": getattr(response, 'duration', 0),
-            "segments": getattr(response, 'segments', [])
-        }
+        def transcribe_with_api():
+            # Open audio file and transcribe using Whisper API
+            logger.info(f"Transcribing audio file: {audio_path}")
+            llm_client.wait_for_rate_limit("whisper-1")
+            with open(audio_path, "rb") as audio_file:
+                response = client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file,
+                    response_format="verbose_json"
+                )
+            
+            # Extract transcription text and metadata, segments are converted to plain dicts so the result can be cached
+            segments = getattr(response, 'segments', None) or []
+            return {
+                "success": True,
+                "text": response.text,
+                "language": getattr(response, 'language', 'unknown'),
+                "duration": getattr(response, 'duration', 0),
+                "segments": [segment.model_dump() if hasattr(segment, 'model_dump') else segment for segment in segments]
+            }
+
+        # Reuse the cached result for audio we have seen before
+        transcription = cached_transcription(
+            audio_path,
+            "whisper-1",
+            None,
+            {"response_format": "verbose_json"},
+            transcribe_with_api,
+            is_cacheable=lambda result: result.get("success", False)
+        )
         
         logger.info(f"Successfully transcribed {len(transcription['text'])} characters")
         return transcription
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import wave
+import fcntl
+import hashlib
+import logging
+import tempfile
+import subprocess
+from typing import Dict, Any, Optional, Callable
+
+# Configure logging to match organization's style
+logger = logging.getLogger(__name__)
+
+# Transcription models work on 16kHz mono PCM, so that is what the fingerprint is taken over
+FINGERPRINT_SAMPLE_RATE = 16000
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+def audio_fingerprint(audio_path: str) -> str:
+    """
+    Hash the decoded 16kHz mono PCM of an audio file.
+
+    Two files with the same audio but a different container, codec or metadata get the same
+    fingerprint. WAVs that are already 16kHz mono 16-bit are hashed directly, anything else is
+    decoded with ffmpeg first.
+    """
+    digest = hashlib.sha256()
+
+    try:
+        with wave.open(audio_path, 'rb') as wav_file:
+            if (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) == (FINGERPRINT_SAMPLE_RATE, 1, 2):
+                frames_per_chunk = FINGERPRINT_CHUNK_SIZE // 2
+                while True:
+                    frames = wav_file.readframes(frames_per_chunk)
+                    if not frames:
+                        break
+                    digest.update(frames)
+                return digest.hexdigest()
+    except (wave.Error, EOFError):
+        pass
+
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-i', audio_path,
+        '-vn', '-acodec', 'pcm_s16le', '-ar', str(FINGERPRINT_SAMPLE_RATE), '-ac', '1',
+        '-f', 's16le', 'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    for chunk in iter(lambda: process.stdout.read(FINGERPRINT_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    process.stdout.close()
+    if process.wait() != 0:
+        raise ValueError(f"Could not decode audio for fingerprinting: {audio_path}")
+
+    return digest.hexdigest()
+
+def transcription_cache_key(fingerprint: str, model_name: str, language: Optional[str], options: Optional[Dict[str, Any]] = None) -> str:
+    """Build the cache key for a transcription of some audio with a given model and decoding options"""
+    key_parts = {
+        'fingerprint': fingerprint,
+        'model': model_name,
+        'language': language,
+        'options': options or {},
+    }
+    return hashlib.sha256(json.dumps(key_parts, sort_keys=True, default=str).encode()).hexdigest()
+
+class LocalTranscriptionCache:
+    """Transcriptions stored as JSON files on local disk, evicting the least recently used past max_bytes"""
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        if cache_dir is None:
+            cache_dir = os.getenv('TRANSCRIPTION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'utom_transcription_cache'))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', 500 * 1024 ** 2))  # 500MB
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path, None)
+            return value
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete the least recently used entries until the cache fits in max_bytes, returns bytes freed"""
+        with open(os.path.join(self.cache_dir, '.evict.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            freed_bytes = 0
+            for _, size, name in entries:
+                if total_bytes - freed_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    freed_bytes += size
+                except FileNotFoundError:
+                    pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        return freed_bytes
+
+class MongoTranscriptionCache:
+    """
+    Transcriptions stored in a Mongo collection, evicting the least recently used past max_bytes.
+    See mongo_utils.MongoCacheEvictor for how the size is tracked.
+    """
+    def __init__(self, mongo_client=None, db_name: str = 'utom_video_processing_db', collection_name: str = 'transcription_cache', max_bytes: Optional[int] = None):
+        from utom_databases.functions import mongo_utils as mongo
+        if mongo_client is None:
+            mongo_client = mongo.get_mongo_cloud_db_client()
+        if max_bytes is None:
+            max_bytes = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', 500 * 1024 ** 2))  # 500MB
+        self.collection = mongo_client[db_name][collection_name]
+        self.max_bytes = max_bytes
+        self.evictor = mongo.MongoCacheEvictor(self.collection, max_bytes)
+        self._indexes_created = False
+
+    def _create_indexes(self):
+        # Also in mongo_utils.MONGO_INDEX_REGISTRY, for workers that create them at boot
+        if not self._indexes_created:
+            self.collection.create_index('cache_key', unique=True)
+            self.collection.create_index('last_accessed_at')
+            self._indexes_created = True
+
+    def get(self, key: str) -> Optional[Any]:
+        doc = self.collection.find_one_and_update(
+            {'cache_key': key},
+            {'$set': {'last_accessed_at': int(time.time())}},
+            projection={'value': 1}
+        )
+        return doc['value'] if doc else None
+
+    def put(self, key: str, value: Any) -> None:
+        size_bytes = len(json.dumps(value, default=str))
+        now = int(time.time())
+        self._create_indexes()
+        self.collection.update_one(
+            {'cache_key': key},
+            {'$set': {'value': value, 'size_bytes': size_bytes, 'last_accessed_at': now}, '$setOnInsert': {'created_at': now}},
+            upsert=True
+        )
+        self.evictor.record_put(size_bytes)
+
+    def evict(self) -> int:
+        """Delete the least recently used entries until the cache fits in max_bytes, returns bytes freed"""
+        return self.evictor.evict()
+
+_transcription_cache = None
+
+def get_transcription_cache():
+    """
+    Get the process-wide transcription cache configured by TRANSCRIPTION_CACHE_BACKEND
+    ('local' (default), 'mongo' or 'off').
+
+    Returns:
+        The cache, or None when caching is turned off.
+    """
+    global _transcription_cache
+    if _transcription_cache is None:
+        backend = os.getenv('TRANSCRIPTION_CACHE_BACKEND', 'local').lower()
+        if backend == 'off':
+            return None
+        _transcription_cache = MongoTranscriptionCache() if backend == 'mongo' else LocalTranscriptionCache()
+    return _transcription_cache
+
+def cached_transcription(audio_path: str, model_name: str, language: Optional[str], options: Optional[Dict[str, Any]],
+                         transcribe_func: Callable[[], Any], is_cacheable: Callable[[Any], bool] = bool) -> Any:
+    """
+    Return the cached transcription for this audio, model, language and options, or run
+    transcribe_func() and cache its result.
+
+    Args:
+        audio_path: Path to the audio file that is being transcribed.
+        model_name: The transcription model, part of the cache key.
+        language: The transcription language, part of the cache key.
+        options: Any decoding options that change the output, part of the cache key.
+        transcribe_func: Runs the actual transcription on a cache miss.
+        is_cacheable: Decides whether a result is worth caching (e.g. not a failure).
+
+    Returns:
+        The transcription result.
+    """
+    cache = get_transcription_cache()
+    if cache is None:
+        return transcribe_func()
+
+    key = None
+    try:
+        key = transcription_cache_key(audio_fingerprint(audio_path), model_name, language, options)
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            logger.info(f"Transcription cache hit for {audio_path}")
+            return cached_result
+    except Exception as e:
+        logger.warning(f"Transcription cache lookup failed: {str(e)}")
+
+    result = transcribe_func()
+
+    if key is not None and is_cacheable(result):
+        try:
+            cache.put(key, result)
+        except Exception as e:
+            logger.warning(f"Could not cache transcription: {str(e)}")
+
+    return result
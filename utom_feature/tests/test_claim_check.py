@@ -0,0 +1,118 @@
+import json
+import pytest
+import dramatiq
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.message import Message
+from utom_feature.functions import claim_check
+
+class DictClaimCheckStore:
+    """In-memory store that counts puts, and fails the first get_failures gets"""
+    def __init__(self, fail=False, get_failures=0):
+        self.payloads = {}
+        self.puts = 0
+        self.fail = fail
+        self.get_failures = get_failures
+
+    def put(self, key, payload):
+        if self.fail:
+            raise ConnectionError('store is down')
+        self.puts += 1
+        self.payloads[key] = payload
+
+    def get(self, key):
+        if self.get_failures:
+            self.get_failures -= 1
+            raise ConnectionError('store is down')
+        return self.payloads[key]
+
+@pytest.fixture
+def encoder():
+    """Install a ClaimCheckEncoder with a 1KB threshold for the test"""
+    previous_encoder = dramatiq.get_encoder()
+    encoder = claim_check.ClaimCheckEncoder(DictClaimCheckStore(), threshold_bytes=1024)
+    dramatiq.set_encoder(encoder)
+    yield encoder
+    dramatiq.set_encoder(previous_encoder)
+
+def make_message(payload_size, **options):
+    task_json = json.dumps({'task_id': 'abc', 'project_metadata': {'description': 'x' * payload_size}})
+    return Message(queue_name='default', actor_name='run_task', args=(task_json,), kwargs={}, options=options)
+
+def test_large_payload_is_sent_as_a_claim_check(encoder):
+    """Only a small envelope goes through the broker and the consumer gets the full arguments back"""
+    message = make_message(100000, pipe_target={'args': ['y' * 5000]})
+
+    data = message.encode()
+
+    assert len(data) < 1024
+    assert encoder.store.puts == 1
+    decoded = Message.decode(data)
+    assert decoded.args == message.args
+    assert decoded.options['pipe_target'] == {'args': ['y' * 5000]}
+
+def test_small_payload_is_sent_inline(encoder):
+    message = make_message(10)
+
+    data = message.encode()
+
+    assert encoder.store.puts == 0
+    assert 'claim_check' not in json.loads(data)['options']
+    assert Message.decode(data).args == message.args
+
+def test_retry_reuses_the_stored_payload(encoder):
+    """A retried message only changes its options, so it is stored under the same key"""
+    decoded = Message.decode(make_message(100000).encode())
+
+    retried = decoded.copy(options=dict(decoded.options, retries=1))
+    Message.decode(retried.encode())
+
+    assert len(encoder.store.payloads) == 1
+
+def test_resend_after_the_payload_expired_stores_it_again(encoder):
+    """The same payload sent again after the store dropped it is stored again instead of skipped"""
+    message = make_message(100000)
+    message.encode()
+    encoder.store.payloads.clear()
+
+    assert Message.decode(message.encode()).args == message.args
+
+def test_payload_read_is_retried_while_the_store_is_down(encoder, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(claim_check.time, 'sleep', sleeps.append)
+    message = make_message(100000)
+    data = message.encode()
+    encoder.store.get_failures = 2
+
+    assert Message.decode(data).args == message.args
+    assert sleeps == [0.5, 1.0]
+
+    encoder.store.get_failures = encoder.get_attempts
+    with pytest.raises(dramatiq.errors.DecodeError):
+        Message.decode(data)
+
+def test_payload_is_sent_inline_when_the_store_is_down():
+    previous_encoder = dramatiq.get_encoder()
+    dramatiq.set_encoder(claim_check.ClaimCheckEncoder(DictClaimCheckStore(fail=True), threshold_bytes=1024))
+    try:
+        message = make_message(100000)
+        assert Message.decode(message.encode()).args == message.args
+    finally:
+        dramatiq.set_encoder(previous_encoder)
+
+def test_actor_receives_rehydrated_arguments(encoder):
+    broker = StubBroker()
+    received = []
+
+    @dramatiq.actor(broker=broker)
+    def run_task(task_json):
+        received.append(task_json)
+
+    message = make_message(100000)
+    run_task.send(*message.args)
+    worker = dramatiq.Worker(broker, worker_timeout=100)
+    worker.start()
+    broker.join(run_task.queue_name)
+    worker.join()
+    worker.stop()
+
+    assert received == list(message.args)
@@ -0,0 +1,115 @@
+import copy
+import pytest
+from unittest.mock import MagicMock, patch
+from utom_feature.functions import feature_management
+
+@pytest.fixture
+def mock_collection():
+    """Patch the mongo client so project_features resolves to a mock collection"""
+    collection = MagicMock()
+    mongo_client = MagicMock()
+    mongo_client.__getitem__.return_value.project_features = collection
+    with patch('utom_databases.functions.mongo_utils.get_mongo_cloud_db_client', return_value=mongo_client):
+        yield collection
+
+def test_save_checkpoint_sets_stage_output_and_marker(mock_collection):
+    """A stage is saved with a single $set of its output and the stage marker"""
+    mock_collection.update_one.return_value.matched_count = 1
+
+    saved = feature_management.save_feature_creation_checkpoint('feature-1', 'design_brief', {'design_brief': 'brief'}, 'convo-1')
+
+    assert saved is True
+    query, update = mock_collection.update_one.call_args.args
+    assert query == {'feature_id': 'feature-1'}
+    assert update['$set']['feature_creation_checkpoints.stages.design_brief'] == {'design_brief': 'brief'}
+    assert update['$set']['feature_creation_checkpoints.conversation_id'] == 'convo-1'
+    assert update['$set']['feature_creation_stage'] == 'design_brief'
+
+    with pytest.raises(ValueError):
+        feature_management.save_feature_creation_checkpoint('feature-1', 'nope', {})
+
+def test_checkpoints_from_another_conversation_are_ignored(mock_collection):
+    """A rerun for a changed conversation starts over instead of reusing stale outputs"""
+    mock_collection.find_one.return_value = {
+        'feature_creation_checkpoints': {'conversation_id': 'convo-1', 'stages': {'user_flows': {'user_flows': []}}}
+    }
+
+    assert feature_management.get_feature_creation_checkpoints('feature-1', 'convo-1') == {'user_flows': {'user_flows': []}}
+    assert feature_management.get_feature_creation_checkpoints('feature-1', 'convo-2') == {}
+
+    mock_collection.find_one.return_value = None
+    assert feature_management.get_feature_creation_checkpoints('feature-1', 'convo-1') == {}
+
+def test_screen_checkpoints_are_saved_per_screen(mock_collection):
+    """Each page worker writes only its own screen, without moving the stage marker"""
+    mock_collection.update_one.return_value.matched_count = 1
+
+    feature_management.save_feature_screen_checkpoint('feature-1', 2, {'page_metadata': None, 'failure': {'error': 'boom'}}, 'convo-1')
+
+    update = mock_collection.update_one.call_args.args[1]
+    assert update['$set']['feature_creation_checkpoints.screens.2'] == {'page_metadata': None, 'failure': {'error': 'boom'}}
+    assert 'feature_creation_stage' not in update['$set']
+
+    mock_collection.find_one.return_value = {
+        'feature_creation_checkpoints': {'conversation_id': 'convo-1', 'screens': {'2': {'page_metadata': None}}}
+    }
+    assert feature_management.get_feature_screen_checkpoints('feature-1', 'convo-1') == {'2': {'page_metadata': None}}
+    assert feature_management.get_feature_screen_checkpoints('feature-1', 'convo-2') == {}
+
+class FakeFeatureStore:
+    """A single feature document with the feature_management functions the stages use"""
+    def __init__(self):
+        self.feature = {
+            '_id': 'object-id', 'feature_id': 'feature-1', 'feature_creation_stage': None,
+            'feature_details': {key: key for key in ['feature_name', 'feature_description', 'priority', 'dependencies', 'integration_points', 'user_flow_reviewed']},
+        }
+        self.stages = {}
+        self.saved_stage_markers = []
+
+    def get_feature_by_id(self, feature_id):
+        return copy.deepcopy(dict(self.feature, feature_creation_checkpoints={'stages': self.stages}))
+
+    def update_feature(self, feature_metadata):
+        self.saved_stage_markers.append(feature_metadata.get('feature_creation_stage'))
+        self.feature.update(copy.deepcopy(feature_metadata))
+
+    def get_feature_creation_checkpoints(self, feature_id, conversation_id=None):
+        return copy.deepcopy(self.stages)
+
+    def save_feature_creation_checkpoint(self, feature_id, stage, output, conversation_id=None):
+        self.stages[stage] = copy.deepcopy(output)
+        self.feature['feature_creation_stage'] = stage
+        return True
+
+    def clear_feature_creation_checkpoints(self, feature_id):
+        self.stages.clear()
+
+def test_rerun_after_a_task_stage_failure_skips_the_earlier_stages():
+    feature_creation = pytest.importorskip('utom_feature.functions.feature_creation')
+    store = FakeFeatureStore()
+    stage_functions = {
+        'generate_user_flows_and_execution_steps_from_feature_creation_conversation': MagicMock(return_value={'user_flows': ['flow'], 'execution_steps': ['step']}),
+        'generate_detailed_design_brief': MagicMock(side_effect=lambda details: dict(details, design_brief='brief')),
+        'generate_pages_for_feature_from_design_brief': MagicMock(side_effect=lambda metadata, details: (dict(details, failed_pages=[]), [{'page': 1}])),
+    }
+    generate_tasks = MagicMock(side_effect=[RuntimeError('tasks failed'), ['task']])
+    input_metadata = {'workspace_id': 'w', 'project_id': 'p', 'creator_id': 'c', 'feature_id': 'feature-1', 'conversation_id': 'convo-1'}
+
+    with patch.multiple(feature_creation.feature_management, **{name: getattr(store, name) for name in [
+            'get_feature_by_id', 'update_feature', 'get_feature_creation_checkpoints', 'save_feature_creation_checkpoint', 'clear_feature_creation_checkpoints']}), \
+            patch.multiple(feature_creation, **stage_functions), \
+            patch.object(feature_creation.task_creation, 'generate_and_assign_tasks', generate_tasks):
+        with pytest.raises(RuntimeError):
+            feature_creation.generate_feature_details_e2e_one_shot(input_metadata, {})
+        assert store.feature['feature_creation_stage'] == 'pages'
+
+        feature_metadata = feature_creation.generate_feature_details_e2e_one_shot(input_metadata, {})
+
+    assert all(stage_function.call_count == 1 for stage_function in stage_functions.values())
+    assert generate_tasks.call_count == 2
+    assert feature_metadata['feature_details']['feature_tasks'] == ['task']
+    assert feature_metadata['feature_details']['design_brief'] == 'brief'
+    # Only the final save sets the stage marker, the interim saves never roll it back
+    assert store.saved_stage_markers == [None, 'tasks']
+    assert store.feature['feature_creation_stage'] == 'tasks'
+    assert store.stages == {}
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import pytest
+import dramatiq
+from unittest.mock import MagicMock, patch
+from dramatiq.brokers.stub import StubBroker
+
+fakeredis = pytest.importorskip('fakeredis')
+
+STAGE_QUEUE_NAMES = [
+    'feature_creation_user_flows_task_queue',
+    'feature_creation_design_brief_task_queue',
+    'feature_creation_pages_task_queue',
+    'feature_creation_tasks_task_queue',
+    'feature_creation_failed_task_queue',
+]
+
+@pytest.fixture(scope='module')
+def app():
+    """Import the dramatiq app on a StubBroker, with a fake Redis behind the group callbacks"""
+    pytest.importorskip('utom_utils.functions.general')
+    pytest.importorskip('utom_feature.functions.feature_creation')
+    previous_broker = dramatiq.broker.global_broker
+    # No claim check store and no index creation when the worker boots
+    with patch.dict(os.environ, {'CLAIM_CHECK_STORE': 'off', 'MONGO_ENSURE_INDEXES_AT_BOOT': 'false'}):
+        with patch('dramatiq.brokers.rabbitmq.RabbitmqBroker', lambda **kwargs: StubBroker()), \
+                patch('utom_databases.functions.rabbitmq_utils.initialize_rabbitmq_client_and_create_channel'), \
+                patch('utom_databases.functions.rabbitmq_utils.check_if_rabbitmq_server_is_active'), \
+                patch('utom_databases.functions.redis_utils.get_pooled_redis_client', return_value=fakeredis.FakeRedis()):
+            from utom_feature.functions import feature_creation_dramatiq_app
+        yield feature_creation_dramatiq_app
+    if previous_broker is not None:
+        dramatiq.set_broker(previous_broker)
+
+def test_tasks_stage_runs_once_after_every_page_even_when_a_screen_fails(app):
+    screen_briefs = [{'screen_name': f'screen_{i}'} for i in range(4)]
+    pages_run = []
+    pages_run_before_tasks = []
+
+    def run_screen_page_stage(feature_creation_input_metadata, screen_index, screen_design_brief):
+        pages_run.append(screen_index)
+        if screen_index == 2:
+            raise RuntimeError('page generation failed')
+
+    collect_screen_pages_stage = MagicMock(side_effect=lambda *args: pages_run_before_tasks.append(sorted(pages_run)))
+    run_task_assignment_stage = MagicMock()
+    task_json = json.dumps({
+        'task_id': 'task-1',
+        'task_send_time': int(time.time()),
+        'task_message_dict': {
+            'feature_creation_input_metadata': {'feature_id': 'feature-1', 'conversation_id': 'convo-1'},
+            'project_metadata': {},
+        },
+    })
+
+    with patch.object(app.task_lease, 'claim_task', return_value=True), \
+            patch.object(app.task_lease, 'TaskLeaseHeartbeat', MagicMock()), \
+            patch.object(app, 'update_feature_creation_task_log'), \
+            patch.object(app.feature_management, 'get_feature_creation_checkpoints', return_value={'design_brief': {}}), \
+            patch.multiple(app.feature_creation, run_user_flows_stage=MagicMock(), run_design_brief_stage=MagicMock(return_value={}),
+                           get_screen_design_briefs=MagicMock(return_value=screen_briefs), run_screen_page_stage=run_screen_page_stage,
+                           collect_screen_pages_stage=collect_screen_pages_stage, run_task_assignment_stage=run_task_assignment_stage):
+        app.build_feature_creation_pipeline(task_json).run()
+        worker = dramatiq.Worker(app.broker, worker_timeout=100)
+        worker.start()
+        try:
+            # The pages are enqueued by the design brief stage and the tasks stage by the last page
+            for queue_name in STAGE_QUEUE_NAMES:
+                app.broker.join(queue_name, timeout=10000)
+            worker.join()
+        finally:
+            worker.stop()
+
+    assert pages_run_before_tasks == [[0, 1, 2, 3]]
+    assert collect_screen_pages_stage.call_args.args[2] == len(screen_briefs)
+    run_task_assignment_stage.assert_called_once()
+    assert app.broker.dead_letters == []
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import Mock, patch
+from openai.types.chat import ChatCompletion
+from utom_feature.functions import llm_cache, llm_client
+
+fakeredis = pytest.importorskip('fakeredis')
+
+def make_completion(content, finish_reason='stop'):
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'o3-mini',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+    })
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv('LLM_RATE_LIMIT_ENABLED', 'false')
+    cache = llm_cache.RedisLLMCache(fakeredis.FakeRedis(), ttl_seconds=3600, max_entry_bytes=1000, max_bytes=2500)
+    with patch.object(llm_cache, '_llm_cache', cache):
+        yield cache
+
+@pytest.fixture
+def openai_client():
+    client = Mock()
+    with patch.object(llm_client, 'get_openai_client', return_value=client):
+        yield client
+
+REQUEST = {
+    'model': 'o3-mini',
+    'messages': [{'role': 'user', 'content': 'Write a design brief'}],
+    'max_completion_tokens': 15000,
+    'response_format': {'type': 'json_object'},
+}
+
+def test_identical_requests_are_served_from_the_cache(cache, openai_client):
+    openai_client.chat.completions.create.return_value = make_completion('{"brief": 1}')
+
+    first = llm_client.create_chat_completion(**REQUEST)
+    second = llm_client.create_chat_completion(**REQUEST)
+
+    assert openai_client.chat.completions.create.call_count == 1
+    assert second.choices[0].message.content == first.choices[0].message.content == '{"brief": 1}'
+
+    # Any change to the request params is a different entry
+    llm_client.create_chat_completion(**dict(REQUEST, max_completion_tokens=10000))
+    assert openai_client.chat.completions.create.call_count == 2
+
+def test_opt_out_skips_the_cache(cache, openai_client):
+    openai_client.chat.completions.create.return_value = make_completion('{"brief": 1}')
+    llm_client.create_chat_completion(use_cache=False, **REQUEST)
+    llm_client.create_chat_completion(use_cache=False, **REQUEST)
+    assert openai_client.chat.completions.create.call_count == 2
+    assert cache.get(llm_cache.llm_cache_key(REQUEST)) is None
+
+def test_bad_answers_are_not_cached(cache, openai_client):
+    """A retry after invalid JSON or a truncated answer asks the model again"""
+    openai_client.chat.completions.create.side_effect = [
+        make_completion('{"brief": '),
+        make_completion('{"brief": 1}', finish_reason='length'),
+        make_completion('{"brief": 1}'),
+    ]
+    for _ in range(3):
+        llm_client.create_chat_completion(**REQUEST)
+    assert openai_client.chat.completions.create.call_count == 3
+
+def test_size_limits(cache):
+    assert cache.put('too-big', {'content': 'x' * 2000}) is False
+    assert cache.get('too-big') is None
+
+    for i in range(4):
+        cache.put(f'entry-{i}', {'content': 'x' * 800})
+        cache.get('entry-0')
+    # Over max_bytes the least recently used entries go first, entry-0 was just read
+    assert cache.get('entry-0') is not None
+    assert cache.get('entry-1') is None
+    assert cache.get('entry-3') is not None
+
+def test_mongo_cache_indexes_last_access_and_does_not_sum_on_every_put():
+    collection = Mock()
+    collection.aggregate.return_value = [{'total_bytes': 0}]
+    cache = llm_cache.MongoLLMCache({'db': {'cache': collection}}, 'db', 'cache', ttl_seconds=3600, max_entry_bytes=1000, max_bytes=2500)
+
+    for i in range(5):
+        cache.put(f'key_{i}', {'content': 'x' * 100})
+
+    assert collection.aggregate.call_count == 1
+    assert [call.args[0] for call in collection.create_index.call_args_list] == ['expires_at', 'cache_key', 'last_accessed_at']
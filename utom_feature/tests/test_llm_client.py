@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from utom_feature.functions import llm_client
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    llm_client.close_llm_clients()
+    yield
+    llm_client.close_llm_clients()
+
+def test_sync_client_is_shared_per_api_key(monkeypatch):
+    monkeypatch.setenv('LLM_MAX_RETRIES', '5')
+    monkeypatch.setenv('LLM_TIMEOUT_SECONDS', '42')
+
+    client = llm_client.get_openai_client('key-a')
+    assert llm_client.get_openai_client('key-a') is client
+    assert llm_client.get_openai_client('key-b') is not client
+    assert client.max_retries == 5
+    assert client.timeout == 42
+
+def test_default_api_key(monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('utom_openai_api_key', 'utom-key')
+    assert llm_client.get_openai_client().api_key == 'utom-key'
+
+def test_async_client_is_shared_per_event_loop():
+    async def get_clients():
+        return llm_client.get_async_openai_client('key-a'), llm_client.get_async_openai_client('key-a')
+
+    first, same = asyncio.run(get_clients())
+    other_loop, _ = asyncio.run(get_clients())
+
+    assert first is same
+    assert other_loop is not first
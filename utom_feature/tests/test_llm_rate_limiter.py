@@ -0,0 +1,67 @@
+import pytest
+from utom_feature.functions.llm_rate_limiter import LLMRateLimiter
+
+fakeredis = pytest.importorskip('fakeredis')
+
+class FakeClock:
+    """Simulated time, sleeping just moves the clock forward"""
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+RATE_LIMITS = {'gpt-4': {'requests_per_minute': 60, 'tokens_per_minute': 10000}}
+
+def test_calls_wait_instead_of_exceeding_the_budget(redis_client):
+    clock = FakeClock()
+    rate_limiter = LLMRateLimiter(redis_client, RATE_LIMITS, clock=clock.time, sleep=clock.sleep)
+
+    # The full bucket lets the first 10000 tokens through straight away
+    assert rate_limiter.acquire('gpt-4', tokens=5000) == 0
+    assert rate_limiter.acquire('gpt-4', tokens=5000) == 0
+    # The next 5000 tokens take 30s to refill at 10000/min
+    assert rate_limiter.try_acquire('gpt-4', tokens=5000) == pytest.approx(30, abs=0.01)
+    waited = rate_limiter.acquire('gpt-4', tokens=5000)
+    assert 30 <= waited <= 34
+
+def test_models_without_limits_are_not_limited(redis_client):
+    rate_limiter = LLMRateLimiter(redis_client, RATE_LIMITS)
+    assert all(rate_limiter.try_acquire('some-other-model', tokens=10 ** 6) == 0 for _ in range(100))
+
+def test_simulated_workers_stay_at_the_limit(redis_client):
+    """Several workers sharing the buckets get the account's throughput, never more"""
+    clock = FakeClock()
+    workers = [LLMRateLimiter(redis_client, RATE_LIMITS, clock=clock.time, sleep=clock.sleep) for _ in range(5)]
+    start = clock.now
+    calls = []
+
+    # Round robin over the workers, each call blocks until it fits
+    for i in range(400):
+        workers[i % len(workers)].acquire('gpt-4', tokens=500)
+        calls.append(clock.now)
+
+    minutes = (clock.now - start) / 60
+    tokens = len(calls) * 500
+    # Past the initial full bucket, throughput runs at the tokens/min limit
+    assert (tokens - 10000) / minutes == pytest.approx(10000, rel=0.1)
+    # No sliding minute ever goes over the bucket size plus one minute of refill
+    for i, call_time in enumerate(calls):
+        in_window = sum(1 for other in calls[i:] if other < call_time + 60)
+        assert in_window * 500 <= 2 * 10000
+
+def test_requests_per_minute_limit(redis_client):
+    clock = FakeClock()
+    rate_limiter = LLMRateLimiter(redis_client, {'whisper-1': {'requests_per_minute': 60}}, clock=clock.time, sleep=clock.sleep)
+    start = clock.now
+    for _ in range(120):
+        rate_limiter.acquire('whisper-1')
+    # 60 from the full bucket, then one a second
+    assert clock.now - start == pytest.approx(60, rel=0.1)
@@ -0,0 +1,109 @@
+import os
+import datetime
+import pytest
+from unittest.mock import MagicMock
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+from utom_databases.functions import mongo_utils as mongo
+from utom_feature.functions import task_lease
+from utom_feature.functions.mongo_indexes import EnsureMongoIndexes
+
+@pytest.fixture
+def mock_client():
+    """Mock mongo client that hands out one mock collection per db and collection name"""
+    collections = {}
+    client = MagicMock()
+    client.__getitem__.side_effect = lambda db_name: MagicMock(
+        __getitem__=lambda _, collection_name: collections.setdefault((db_name, collection_name), MagicMock())
+    )
+    return client, collections
+
+def test_registry_creates_unique_plain_and_ttl_indexes(mock_client):
+    client, collections = mock_client
+
+    result = mongo.ensure_mongo_indexes(client=client)
+
+    assert result['failed'] == []
+    assert len(result['ensured']) == len(mongo.MONGO_INDEX_REGISTRY)
+    task_logs = collections[('utom_task_log_service', 'task_logs')].create_index.call_args_list
+    assert [(call.args, call.kwargs) for call in task_logs] == [
+        (([('task_id', 1)],), {'unique': True}),
+        (([('task_log_expires_at', 1)],), {'expireAfterSeconds': 0}),
+    ]
+    features = collections[('utom_features', 'project_features')].create_index.call_args_list
+    assert [(call.args[0][0][0], call.kwargs['unique']) for call in features] == [('feature_id', True), ('project_id', False), ('members', False)]
+
+def test_an_index_that_fails_does_not_stop_the_others(mock_client):
+    """A unique index over existing duplicates is reported and the next indexes are still created"""
+    client, collections = mock_client
+    features = collections.setdefault(('utom_features', 'project_features'), MagicMock())
+    features.create_index.side_effect = [OperationFailure('E11000 duplicate key error', code=11000), None, None]
+
+    result = mongo.ensure_mongo_indexes(mongo.get_mongo_index_specs('project_features'), client=client)
+
+    assert [name for name, _ in result['failed']] == ['utom_features.project_features.feature_id_1']
+    assert len(result['ensured']) == 2
+
+def test_middleware_does_not_stop_the_worker_when_mongo_is_down():
+    client = MagicMock()
+    client.__getitem__.side_effect = ConnectionError('mongo is down')
+
+    EnsureMongoIndexes(mongo.get_mongo_index_specs('project_features'), client=client).after_worker_boot(None, None)
+
+def test_claimed_task_logs_get_a_ttl_date(monkeypatch):
+    """The TTL index only expires dates, so the claim stores a datetime rather than a unix int"""
+    collection = MagicMock()
+    client = MagicMock()
+    client.__getitem__.return_value.__getitem__.return_value = collection
+    monkeypatch.setattr(mongo, 'TASK_LOG_RETENTION_DAYS', 7)
+
+    task_lease.claim_task(client, 'db', 'task_logs', 'abc', 'worker-1')
+
+    expires_at = collection.find_one_and_update.call_args.args[1]['$set']['task_log_expires_at']
+    assert isinstance(expires_at, datetime.datetime)
+    assert expires_at - datetime.datetime.utcnow() > datetime.timedelta(days=6)
+
+    monkeypatch.setattr(mongo, 'TASK_LOG_RETENTION_DAYS', 0)
+    task_lease.claim_task(client, 'db', 'task_logs', 'abc', 'worker-1')
+    assert 'task_log_expires_at' not in collection.find_one_and_update.call_args.args[1]['$set']
+
+def winning_plan_stages(plan):
+    """All the stage names in a query plan, from the root down"""
+    stages = [plan.get('stage')]
+    for child_key in ('inputStage', 'queryPlan'):
+        if child_key in plan:
+            stages += winning_plan_stages(plan[child_key])
+    for child in plan.get('inputStages', []):
+        stages += winning_plan_stages(child)
+    return stages
+
+@pytest.mark.skipif(not os.environ.get('MONGODB_TEST_URI'), reason='set MONGODB_TEST_URI to run against a MongoDB server')
+def test_lookups_use_the_indexes():
+    """Each registered lookup is an index scan instead of a collection scan"""
+    client = MongoClient(os.environ['MONGODB_TEST_URI'])
+    index_specs = [dict(index_spec, db_name='utom_index_test_' + index_spec['db_name']) for index_spec in mongo.MONGO_INDEX_REGISTRY]
+    try:
+        assert mongo.ensure_mongo_indexes(index_specs, client=client)['failed'] == []
+        # Running it again is a no-op
+        assert mongo.ensure_mongo_indexes(index_specs, client=client)['failed'] == []
+
+        lookups = [
+            ('task_logs', {'task_id': 'abc'}),
+            ('video_task_logs', {'task_id': 'abc'}),
+            ('project_features', {'feature_id': 'abc'}),
+            ('project_features', {'project_id': 'abc'}),
+            ('project_features', {'members': {'$in': ['user-1']}}),
+            ('video_metadata', {'video_id': 'abc'}),
+            ('transcription_cache', {'cache_key': 'abc'}),
+            ('llm_response_cache', {'cache_key': 'abc'}),
+        ]
+        for collection_name, query in lookups:
+            index_spec = next(spec for spec in index_specs if spec['collection_name'] == collection_name)
+            explain = client[index_spec['db_name']][collection_name].find(query).explain()
+            stages = winning_plan_stages(explain['queryPlanner']['winningPlan'])
+            # Newer servers report unique lookups as EXPRESS_IXSCAN
+            assert any(stage and 'IXSCAN' in stage for stage in stages) and 'COLLSCAN' not in stages, (collection_name, query, stages)
+    finally:
+        for db_name in {index_spec['db_name'] for index_spec in index_specs}:
+            client.drop_database(db_name)
+        client.close()
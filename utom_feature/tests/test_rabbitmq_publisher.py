@@ -0,0 +1,195 @@
+import threading
+import time
+import pika
+import pytest
+from pika.exceptions import StreamLostError, AMQPConnectionError
+from utom_databases.functions.rabbitmq_utils import RabbitMQPublisher
+
+def confirm_frame(method_class, delivery_tag, multiple):
+    return pika.frame.Method(1, method_class(delivery_tag=delivery_tag, multiple=multiple))
+
+class FakeImplChannel:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.channel.on_confirm = ack_nack_callback
+        self.channel.connection.pending_callbacks.append(lambda: callback(pika.frame.Method(1, pika.spec.Confirm.SelectOk())))
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.on_confirm = None
+        self.delivery_tag = 0
+        self.unconfirmed = []
+        self.in_use = False
+        self._impl = FakeImplChannel(self)
+
+    def confirm(self):
+        """Ack, or nack, every message published since the last confirm with one frame"""
+        broker = self.connection.broker
+        broker.confirm_waits += 1
+        if broker.nack_batches:
+            broker.nack_batches -= 1
+            self.on_confirm(confirm_frame(pika.spec.Basic.Nack, self.delivery_tag, True))
+        else:
+            broker.published.extend(self.unconfirmed)
+            self.on_confirm(confirm_frame(pika.spec.Basic.Ack, self.delivery_tag, True))
+        self.unconfirmed = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        # pika channels must not be used from two threads at once
+        assert not self.in_use, 'channel used concurrently'
+        self.in_use = True
+        try:
+            if self.connection.broker.publishes_before_failure:
+                self.connection.broker.publishes_before_failure -= 1
+            elif self.connection.broker.fail_publishes:
+                self.connection.broker.fail_publishes -= 1
+                self.is_open = self.connection.is_open = False
+                raise StreamLostError('connection lost')
+            time.sleep(0.001)
+            self.connection.broker.properties.append(properties)
+            if self.on_confirm is None:
+                self.connection.broker.published.append((routing_key, body))
+            else:
+                self.delivery_tag += 1
+                self.unconfirmed.append((routing_key, body))
+        finally:
+            self.in_use = False
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.channels = []
+        self.pending_callbacks = []
+
+    def channel(self):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def process_data_events(self, time_limit=None):
+        while self.pending_callbacks:
+            self.pending_callbacks.pop(0)()
+        for channel in self.channels:
+            if channel.unconfirmed:
+                channel.confirm()
+
+    def close(self):
+        self.is_open = False
+
+class FakeBroker:
+    """Connection factory that records connections and published messages"""
+    def __init__(self, fail_connects=0, fail_publishes=0, publishes_before_failure=0, nack_batches=0):
+        self.connections = []
+        self.published = []
+        self.properties = []
+        self.confirm_waits = 0
+        self.nack_batches = nack_batches
+        self.fail_connects = fail_connects
+        self.fail_publishes = fail_publishes
+        self.publishes_before_failure = publishes_before_failure
+        self.lock = threading.Lock()
+
+    def __call__(self, parameters):
+        if self.fail_connects:
+            self.fail_connects -= 1
+            raise AMQPConnectionError('connection refused')
+        with self.lock:
+            connection = FakeConnection(self)
+            self.connections.append(connection)
+        return connection
+
+def make_publisher(broker, **kwargs):
+    sleeps = []
+    publisher = RabbitMQPublisher(connection_parameters=object(), connection_factory=broker, sleep=sleeps.append, **kwargs)
+    return publisher, sleeps
+
+def test_connections_are_reused_across_sends():
+    broker = FakeBroker()
+    publisher, _ = make_publisher(broker, pool_size=2)
+
+    for i in range(20):
+        publisher.publish_dict('task_queue', {'task_id': i})
+    publisher.send_many('task_queue', ['a', 'b', 'c'])
+
+    assert len(broker.connections) == 1
+    assert len(broker.published) == 23
+    assert broker.published[0] == ('task_queue', '{"task_id": 0}')
+
+def test_batches_are_confirmed_with_one_wait():
+    """The broker is waited on once per batch rather than once per message"""
+    broker = FakeBroker()
+    publisher, _ = make_publisher(broker, pool_size=1, batch_size=100)
+
+    assert publisher.send_many('task_queue', [str(i) for i in range(250)]) == 250
+
+    assert broker.confirm_waits == 3
+    assert [body for _, body in broker.published] == [str(i) for i in range(250)]
+
+def test_reconnects_with_backoff_and_resends_from_the_failed_message():
+    broker = FakeBroker(fail_connects=2, fail_publishes=1)
+    publisher, sleeps = make_publisher(broker, pool_size=1, backoff_seconds=1, max_backoff_seconds=10)
+
+    assert publisher.send_many('task_queue', ['a', 'b', 'c']) == 3
+
+    assert [body for _, body in broker.published] == ['a', 'b', 'c']
+    # Two refused connects and one lost connection, each waiting longer than the one before
+    assert len(sleeps) == 3
+    assert sleeps[0] <= 1 and 1 <= sleeps[1] <= 2 and 2 <= sleeps[2] <= 4
+    assert len(broker.connections) == 2
+
+def test_messages_are_persistent_by_default():
+    broker = FakeBroker()
+    publisher, _ = make_publisher(broker, pool_size=1)
+
+    publisher.publish('task_queue', 'a')
+    publisher.publish('task_queue', 'b', properties=pika.BasicProperties(delivery_mode=pika.DeliveryMode.Transient))
+
+    assert [properties.delivery_mode for properties in broker.properties] == [2, 1]
+
+def test_a_batch_lost_before_it_is_confirmed_is_sent_again():
+    """The connection drops after the first message of the second batch, that batch is sent again in full"""
+    broker = FakeBroker(fail_publishes=1, publishes_before_failure=3)
+    publisher, _ = make_publisher(broker, pool_size=1, batch_size=2)
+
+    assert publisher.send_many('task_queue', ['a', 'b', 'c', 'd']) == 4
+
+    assert [body for _, body in broker.published] == ['a', 'b', 'c', 'd']
+    assert broker.confirm_waits == 2
+
+def test_a_nacked_batch_is_sent_again():
+    broker = FakeBroker(nack_batches=1)
+    publisher, sleeps = make_publisher(broker, pool_size=1, batch_size=2)
+
+    assert publisher.send_many('task_queue', ['a', 'b', 'c']) == 3
+
+    assert [body for _, body in broker.published] == ['a', 'b', 'c']
+    assert len(sleeps) == 1
+
+def test_gives_up_after_max_retries():
+    broker = FakeBroker(fail_connects=10)
+    publisher, sleeps = make_publisher(broker, pool_size=1, max_retries=2)
+
+    with pytest.raises(AMQPConnectionError):
+        publisher.publish('task_queue', 'a')
+    assert len(sleeps) == 2
+    # The slot is returned to the pool so the next publish can try again
+    broker.fail_connects = 0
+    assert publisher.publish('task_queue', 'a') == 1
+
+def test_threads_never_share_a_channel():
+    broker = FakeBroker()
+    publisher, _ = make_publisher(broker, pool_size=3)
+
+    threads = [threading.Thread(target=publisher.send_many, args=('task_queue', [str(i)] * 20)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(broker.published) == 160
+    assert len(broker.connections) <= 3
@@ -0,0 +1,109 @@
+import time
+import pytest
+import dramatiq
+from unittest.mock import MagicMock, patch
+from utom_feature.functions import task_lease
+
+@pytest.fixture
+def mock_collection():
+    """Mock mongo client whose collections all resolve to the same mock collection"""
+    collection = MagicMock()
+    mongo_client = MagicMock()
+    mongo_client.__getitem__.return_value.__getitem__.return_value = collection
+    return mongo_client, collection
+
+def test_claim_task_is_a_single_atomic_update(mock_collection):
+    """Claiming only matches sent tasks or lapsed leases and never reads first"""
+    mongo_client, collection = mock_collection
+    collection.find_one_and_update.return_value = {'task_id': 'abc', 'task_status': 'started'}
+
+    claimed = task_lease.claim_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-1', {'task_pickup_time': 1}, lease_seconds=60)
+
+    assert claimed is True
+    collection.find.assert_not_called()
+    query, update = collection.find_one_and_update.call_args.args
+    assert query['task_id'] == 'abc'
+    assert {'task_status': 'sent'} in query['$or']
+    lapsed = [q for q in query['$or'] if q['task_status'] == 'started'][0]
+    assert lapsed['task_lease_expires_at']['$lt'] <= int(time.time())
+    assert update['$set']['task_status'] == 'started'
+    assert update['$set']['task_lease_worker_id'] == 'worker-1'
+    assert update['$set']['task_pickup_time'] == 1
+
+def test_claim_task_returns_false_for_duplicates(mock_collection):
+    """A task that is already finished is not claimed again and its message can be acked"""
+    mongo_client, collection = mock_collection
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {'task_id': 'abc', 'task_status': 'completed'}
+
+    assert task_lease.claim_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-2') is False
+
+def test_claim_task_retries_while_another_worker_holds_the_lease(mock_collection):
+    """A redelivery during a live lease comes back after the lease could have lapsed, it is not dropped"""
+    mongo_client, collection = mock_collection
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {'task_id': 'abc', 'task_status': 'started', 'task_lease_worker_id': 'worker-1'}
+
+    with pytest.raises(dramatiq.Retry) as retry:
+        task_lease.claim_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-2', lease_seconds=60, heartbeat_seconds=10)
+    assert retry.value.delay == 70000
+
+def test_lease_waits_do_not_use_up_the_retries(mock_collection):
+    """A message waiting for a lease is counted in task_lease_waits, not retries, up to MAX_TASK_LEASE_WAITS"""
+    mongo_client, collection = mock_collection
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {'task_id': 'abc', 'task_status': 'started', 'task_lease_worker_id': 'worker-1'}
+    message = MagicMock(options={'retries': 1})
+
+    with patch.object(task_lease.CurrentMessage, 'get_current_message', return_value=message):
+        for _ in range(task_lease.MAX_TASK_LEASE_WAITS + 1):
+            with pytest.raises(dramatiq.Retry):
+                task_lease.claim_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-2')
+            # What the Retries middleware does with the retry
+            message.options['retries'] += 1
+
+    assert message.options['task_lease_waits'] == task_lease.MAX_TASK_LEASE_WAITS
+    assert message.options['retries'] == 2
+
+def test_claim_task_refuses_a_task_past_its_claimable_stages(mock_collection):
+    """Later stages run without the lease, so a redelivery of an earlier stage must not start the task again"""
+    mongo_client, collection = mock_collection
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {'task_id': 'abc', 'task_status': 'started', 'task_stage': 'pages'}
+
+    assert task_lease.claim_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-2', claimable_task_stages=['user_flows']) is False
+    query, _ = collection.find_one_and_update.call_args.args
+    assert query['task_stage'] == {'$in': [None, 'user_flows']}
+
+def test_finish_task_only_writes_while_the_lease_is_held(mock_collection):
+    """A worker that lost its lease never overwrites the results of the worker that reclaimed the task"""
+    mongo_client, collection = mock_collection
+    collection.update_one.return_value = MagicMock(matched_count=1)
+
+    assert task_lease.finish_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-1', {'task_status': 'completed'}) is True
+    query, update = collection.update_one.call_args.args
+    assert query == {'task_id': 'abc', 'task_lease_worker_id': 'worker-1'}
+    assert update == {'$set': {'task_status': 'completed'}}
+
+    collection.update_one.return_value = MagicMock(matched_count=0)
+    assert task_lease.finish_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-1', {'task_status': 'completed'}) is False
+
+    heartbeat = MagicMock(lease_lost=True)
+    collection.update_one.reset_mock()
+    assert task_lease.finish_task(mongo_client, 'db', 'task_logs', 'abc', 'worker-1', {'task_status': 'completed'}, heartbeat) is False
+    collection.update_one.assert_not_called()
+
+def test_heartbeat_extends_lease_until_it_is_lost(mock_collection):
+    """The heartbeat keeps extending the lease and stops once another worker holds it"""
+    mongo_client, collection = mock_collection
+    collection.update_one.side_effect = [MagicMock(matched_count=1), MagicMock(matched_count=0)]
+
+    with task_lease.TaskLeaseHeartbeat(mongo_client, 'db', 'task_logs', 'abc', 'worker-1', lease_seconds=60, heartbeat_seconds=0.01) as heartbeat:
+        deadline = time.time() + 2
+        while not heartbeat.lease_lost and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert heartbeat.lease_lost is True
+    assert collection.update_one.call_count == 2
+    query = collection.update_one.call_args.args[0]
+    assert query['task_lease_worker_id'] == 'worker-1'
@@ -0,0 +1,64 @@
+import time
+import threading
+from utom_feature.processors import transcript_map_reduce
+from utom_feature.processors.transcript_map_reduce import chunk_transcript, map_chunks, dedupe_items
+from utom_feature.processors.action_points import reduce_action_points
+
+def test_chunks_break_on_segment_boundaries(monkeypatch):
+    monkeypatch.setattr(transcript_map_reduce, 'count_tokens', lambda text, model='gpt-4': len(text.split()))
+    transcription = {'text': '', 'segments': [
+        {'text': ' one two three'},
+        {'text': ' four five'},
+        {'text': ' six seven eight nine'},
+        {'text': ' ten'},
+    ]}
+
+    assert chunk_transcript(transcription, max_tokens=5) == ['one two three four five', 'six seven eight nine ten']
+    # A segment that is too long on its own is split between words
+    assert chunk_transcript('a b c d e f g.', max_tokens=3) == ['a b c', 'd e f', 'g.']
+    assert chunk_transcript('') == []
+
+def test_map_chunks_is_bounded_and_keeps_order():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def map_func(chunk):
+        with lock:
+            in_flight.append(chunk)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(chunk)
+        if chunk == 'bad':
+            raise ValueError('no response')
+        return chunk.upper()
+
+    results = map_chunks(['a', 'b', 'bad', 'c', 'd', 'e'], map_func, max_concurrency=2)
+
+    assert max(peak) <= 2
+    assert [result.get('result') for result in results] == ['A', 'B', None, 'C', 'D', 'E']
+    assert results[2] == {'success': False, 'error': 'no response'}
+
+def test_dedupe_items_catches_near_duplicates():
+    items = ['Send the contract to legal.', 'send the contract to legal', 'Send contract to legal', 'Book the venue']
+    assert dedupe_items(items) == ['Send the contract to legal.', 'Book the venue']
+
+def test_reduce_merges_chunk_results():
+    chunk_points = [
+        {'action_points': [{'task': 'Ship the beta', 'priority': 'Medium'}],
+         'key_points': [{'insight': 'Users want exports'}],
+         'context': 'Planning call', 'summary': 'First half.',
+         'risk_assessment': {'technical_risks': ['Export is slow']}},
+        {'action_points': [{'task': 'Ship the beta!', 'priority': 'High'}, {'task': 'Hire a designer', 'priority': 'Low'}],
+         'key_points': [{'insight': 'Users want exports'}],
+         'context': 'Planning call, continued', 'summary': 'Second half.',
+         'risk_assessment': {'technical_risks': ['Export is slow', 'No tests']}},
+    ]
+    result = reduce_action_points(chunk_points)
+
+    assert result['action_points'] == [{'task': 'Ship the beta', 'priority': 'High'}, {'task': 'Hire a designer', 'priority': 'Low'}]
+    assert result['key_points'] == [{'insight': 'Users want exports'}]
+    assert result['context'] == 'Planning call'
+    assert result['summary'] == 'First half. Second half.'
+    assert result['risk_assessment'] == {'technical_risks': ['Export is slow', 'No tests']}
@@ -0,0 +1,113 @@
+import os
+import wave
+import pytest
+from unittest.mock import Mock, patch
+from utom_feature.processors import transcription_cache
+
+def write_wav(path, frames, sample_rate=16000):
+    """Write 16-bit mono PCM frames to a WAV file"""
+    with wave.open(str(path), 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames)
+    return str(path)
+
+@pytest.fixture
+def local_cache(tmp_path):
+    """Point the process-wide cache at a temporary directory"""
+    cache = transcription_cache.LocalTranscriptionCache(cache_dir=str(tmp_path / 'cache'), max_bytes=10000)
+    with patch.object(transcription_cache, '_transcription_cache', cache):
+        yield cache
+
+def test_fingerprint_is_taken_over_pcm(tmp_path):
+    """Same samples give the same fingerprint, different samples a different one"""
+    first = write_wav(tmp_path / 'first.wav', b'\x01\x00' * 1000)
+    same = write_wav(tmp_path / 'same.wav', b'\x01\x00' * 1000)
+    other = write_wav(tmp_path / 'other.wav', b'\x02\x00' * 1000)
+
+    assert transcription_cache.audio_fingerprint(first) == transcription_cache.audio_fingerprint(same)
+    assert transcription_cache.audio_fingerprint(first) != transcription_cache.audio_fingerprint(other)
+
+def test_cache_key_includes_model_and_options():
+    """The same audio transcribed with another model or options is a different entry"""
+    key = transcription_cache.transcription_cache_key('abc', 'base', 'en', {'fp16': False})
+    assert key == transcription_cache.transcription_cache_key('abc', 'base', 'en', {'fp16': False})
+    assert key != transcription_cache.transcription_cache_key('abc', 'small', 'en', {'fp16': False})
+    assert key != transcription_cache.transcription_cache_key('abc', 'base', 'fr', {'fp16': False})
+    assert key != transcription_cache.transcription_cache_key('abc', 'base', 'en', {'fp16': True})
+
+def test_cached_transcription_runs_once(tmp_path, local_cache):
+    """A second transcription of the same audio comes from the cache"""
+    audio_path = write_wav(tmp_path / 'audio.wav', b'\x01\x00' * 1000)
+    transcribe = Mock(return_value={'success': True, 'text': 'hello'})
+
+    for _ in range(2):
+        result = transcription_cache.cached_transcription(audio_path, 'base', 'en', {}, transcribe, is_cacheable=lambda r: r['success'])
+
+    assert result == {'success': True, 'text': 'hello'}
+    transcribe.assert_called_once()
+
+def test_failed_transcriptions_are_not_cached(tmp_path, local_cache):
+    """Results rejected by is_cacheable are recomputed next time"""
+    audio_path = write_wav(tmp_path / 'audio.wav', b'\x01\x00' * 1000)
+    transcribe = Mock(return_value={'success': False, 'error': 'boom'})
+
+    for _ in range(2):
+        transcription_cache.cached_transcription(audio_path, 'base', 'en', {}, transcribe, is_cacheable=lambda r: r['success'])
+
+    assert transcribe.call_count == 2
+
+def test_local_cache_evicts_least_recently_used(tmp_path):
+    """Entries are evicted oldest first once the cache is over its size cap"""
+    cache = transcription_cache.LocalTranscriptionCache(cache_dir=str(tmp_path / 'cache'), max_bytes=250)
+    cache.put('old', {'text': 'x' * 100})
+    os.utime(os.path.join(cache.cache_dir, 'old.json'), (0, 0))
+    cache.put('new', {'text': 'y' * 100})
+    cache.put('newest', {'text': 'z' * 100})
+
+    assert cache.get('old') is None
+    assert cache.get('newest') == {'text': 'z' * 100}
+
+class FakeCacheCollection:
+    """The part of a Mongo collection the transcription cache uses, counting the size aggregations"""
+    def __init__(self):
+        self.docs = {}
+        self.aggregations = 0
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query['cache_key'], {'_id': query['cache_key'], **update.get('$setOnInsert', {})})
+        doc.update(update['$set'])
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        return [{'total_bytes': sum(doc['size_bytes'] for doc in self.docs.values())}] if self.docs else []
+
+    def find(self, query, projection):
+        cursor = Mock()
+        cursor.sort.side_effect = lambda key, direction: sorted(self.docs.values(), key=lambda doc: doc[key])
+        return cursor
+
+    def delete_many(self, query):
+        for _id in query['_id']['$in']:
+            del self.docs[_id]
+
+def test_mongo_cache_only_sums_sizes_when_it_may_be_full():
+    """Puts under the cap use the running total, the collection is summed again once it may be over"""
+    collection = FakeCacheCollection()
+    mongo_client = {'db': {'cache': collection}}
+    cache = transcription_cache.MongoTranscriptionCache(mongo_client, 'db', 'cache', max_bytes=1000)
+    with patch.object(transcription_cache.time, 'time', side_effect=range(100)):
+        for i in range(5):
+            cache.put(f'key_{i}', 'x' * 100)
+        assert collection.aggregations == 1
+
+        for i in range(5, 12):
+            cache.put(f'key_{i}', 'x' * 100)
+
+    assert sum(doc['size_bytes'] for doc in collection.docs.values()) <= 1000
+    assert 'key_0' not in collection.docs and 'key_11' in collection.docs
+    assert collection.aggregations < 12
@@ -2,11 +2,12 @@ import os
 from typing import Dict, Any
 from pymongo import MongoClient
 import pika
+from utom_databases.functions.mongo_utils import get_pooled_mongo_client
 
 def get_mongodb_client() -> MongoClient:
-    """Get MongoDB client using environment variables"""
+    """Get the shared, pooled MongoDB client using environment variables (do not close it)"""
     mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-    return MongoClient(mongo_uri)
+    return get_pooled_mongo_client(mongo_uri)
 
 def get_rabbitmq_channel():
     """Get RabbitMQ channel using environment variables"""
@@ -2,20 +2,28 @@ import os
 from pytube import YouTube
 from moviepy.editor import VideoFileClip
 import tempfile
-import whisper
-import openai
 from dotenv import load_dotenv
 import dramatiq
 import boto3
+from processors.model_preloading import ModelPreloader
+from utom_feature.functions import llm_client
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv('OPENAI_API_KEY')
 
-# Initialize Whisper model
-print("Loading Whisper model (base)...")
-model = whisper.load_model("base", device="cpu")
-print("Initialized Whisper model (base)")
+# The Whisper model is loaded on first use, or when a worker boots
+model = None
+
+def load_whisper_model():
+    """Load the Whisper model once per process"""
+    global model
+    if model is None:
+        import whisper
+
+        print("Loading Whisper model (base)...")
+        model = whisper.load_model("base", device="cpu")
+        print("Initialized Whisper model (base)")
+    return model
 
 def download_video(url: str, output_path: str = None) -> str:
     """Download video from URL"""
@@ -38,7 +46,7 @@ def transcribe_audio(audio_path: str) -> str:
     """Transcribe audio using Whisper"""
     print(f"Transcribing audio file: {audio_path}")
     try:
-        result = model.transcribe(audio_path, language="en")
+        result = load_whisper_model().transcribe(audio_path, language="en")
         return result["text"]
     except Exception as e:
         print(f"Error during transcription: {str(e)}")
@@ -60,7 +68,7 @@ def extract_action_points(transcription: str) -> list:
     Please provide the action points in a clear, structured format.
     """
     
-    response = openai.chat.completions.create(
+    response = llm_client.create_chat_completion(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are an expert at analyzing transcripts and identifying actionable items."},
@@ -122,6 +130,8 @@ def process_from_metadata_api(metadata_url: str = None):
     # For now, this is a placeholder for that integration
     pass
 
+dramatiq.get_broker().add_middleware(ModelPreloader(load_whisper_model))
+
 @dramatiq.actor(queue_name="video_processing")
 def process_video_task(video_id: str):
     """Dramatiq actor for processing videos"""
@@ -199,9 +209,6 @@ def process_video_task(video_id: str):
                 {"$set": {"status": "error", "error": str(e)}}
             )
         raise
-    finally:
-        if 'client' in locals():
-            client.close()
 
 if __name__ == "__main__":
     # Example usage - using a short TED-Ed video